@@ -6,65 +6,108 @@ from google.genai import types
 import sys
 import os
 import asyncio
+import time
 import uuid 
 from typing import List, Dict, Any
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 root_path = os.path.abspath(os.path.join(current_dir, "..", ".."))
+src_path = os.path.abspath(os.path.join(current_dir, ".."))
 if root_path not in sys.path:
     sys.path.append(root_path)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from observability import AgentRun, metrics, span
+from runtime import blocking_pool, budget_for, model_for, rate_limit_after_model, rate_limit_before_model, request_memoized, resilient_model, run_with_budget, upstream
+
+from RAGEmails.index import load_index, search_emails
+from rag.hybrid import hybrid_search
 
 try:
     from rag.config import rag, rag_corpus
+    from rag.embedding import resolver_ids_async
 except ImportError:
     print("\n⚠️ AVISO: Não foi possível importar 'rag.config'.")
-    rag, rag_corpus = None, None
+    rag, rag_corpus, resolver_ids_async = None, None, None
+
+# Mesmo pool limitado do RAG de compliance: o SDK do Vertex é síncrono.
+_RAG_POOL = blocking_pool("rag", default_workers=8)
+_VERTEX_RAG = upstream("vertex_rag")
+RAG_TIMEOUT_S = float(os.getenv("RAG_TIMEOUT_S", "20"))
+RAG_VECTOR_DISTANCE_THRESHOLD = float(os.getenv("RAG_VECTOR_DISTANCE_THRESHOLD", "0.5"))
+
+async def _vector_search(text: str, files: List[str], top_k: int) -> List[Dict[str, Any]]:
+    """Braço vetorial (Vertex RAG)."""
+    if not resolver_ids_async:
+        raise RuntimeError("RAG offline")
+    ids = await resolver_ids_async(files)
+    if not ids:
+        raise RuntimeError("Arquivo emails.txt não encontrado no corpus")
+
+    rag_retrieval_config = rag.RagRetrievalConfig(
+        top_k=top_k, 
+        filter=rag.Filter(vector_distance_threshold=RAG_VECTOR_DISTANCE_THRESHOLD),
+    )
 
-def resolver_ids_por_nome(nomes_desejados):
-    if not rag or not rag_corpus:
-        return []
-    try:
-        files = rag.list_files(rag_corpus.name)
-        ids = []
-        for f in files:
-            if f.display_name in nomes_desejados:
-                ids.append(f.name.split("/ragFiles/")[-1])
-        return ids
-    except Exception as e:
-        print(f"❌ Erro ao listar arquivos: {e}")
-        return []
+    start = time.perf_counter()
+    with span("rag.retrieval", **{"rag.top_k": top_k, "rag.files": files}) as s:
+        response = await _VERTEX_RAG.call(
+            lambda: _RAG_POOL.run(
+                rag.retrieval_query,
+                rag_resources=[rag.RagResource(rag_corpus=rag_corpus.name, rag_file_ids=ids)],
+                text=text,
+                rag_retrieval_config=rag_retrieval_config,
+            ),
+            op="retrieval",
+            pool=_RAG_POOL,
+        )
+        s.set_attribute("rag.chunks", len(response.contexts.contexts))
+    metrics.RAG_RETRIEVAL_DURATION.labels(source="emails").observe(
+        time.perf_counter() - start
+    )
 
-def make_embedding(text: str, files: List[str] = ["emails.txt"]) -> Dict[str, Any]:
-    """Recupera trechos relevantes do corpus."""
+    results = []
+    for ctx in response.contexts.contexts:
+        results.append({
+            "text": ctx.text,
+            "score": float(ctx.score),
+            "source": ctx.source_display_name,
+        })
+    results.sort(key=lambda x: x["score"], reverse=True)
+    return results
+
+def _email_chunk(email: Dict[str, Any]) -> Dict[str, Any]:
+    """E-mail do índice no mesmo formato do log original."""
+    return {
+        "text": f"From: {email['from']}\nTo: {email['to']}\nDate: {email['date']}\nSubject: {email['subject']}\n{email['text']}",
+        "score": email["score"],
+        "source": "emails.txt",
+    }
+
+
+async def _email_bm25(text: str, top_k: int) -> List[Dict[str, Any]]:
+    """Braço lexical: índice local de e-mails (um documento por e-mail)."""
+    index = await load_index()
+    return [_email_chunk(e) for e in index.search(text, top_k=top_k) if e["score"] > 0]
+
+
+@request_memoized
+async def make_embedding(text: str, files: List[str] = ["emails.txt"]) -> Dict[str, Any]:
+    """Recupera trechos relevantes do corpus (vetorial + BM25, fundidos por RRF)."""
     print(f"\n🔎 [RAG BUSCA ATIVA] Consultando Vector Store por: '{text}'") 
 
     try:
-        ids = resolver_ids_por_nome(files)
-        if not ids:
-            return {"error": "RAG offline ou arquivo emails.txt não encontrado"}
-
-        rag_retrieval_config = rag.RagRetrievalConfig(
-            top_k=7, 
-            filter=rag.Filter(vector_distance_threshold=0.5),
-        )
-
-        response = rag.retrieval_query(
-            rag_resources=[rag.RagResource(rag_corpus=rag_corpus.name, rag_file_ids=ids)],
-            text=text,
-            rag_retrieval_config=rag_retrieval_config,
+        result = await hybrid_search(
+            text,
+            files,
+            vector_search=lambda n: _vector_search(text, files, n),
+            lexical=_email_bm25 if files == ["emails.txt"] else None,
+            top_k=7,
+            timeout=RAG_TIMEOUT_S,
         )
-
-        results = []
-        for ctx in response.contexts.contexts:
-            results.append({
-                "text": ctx.text,
-                "score": float(ctx.score),
-                "source": ctx.source_display_name,
-            })
-        
+        results = result["chunks"]
         print(f"   ✅ Encontrados {len(results)} trechos relevantes.")
-        
-        results.sort(key=lambda x: x["score"], reverse=True)
         return {"query": text, "chunks": results}
 
     except Exception as e:
@@ -72,10 +115,12 @@ def make_embedding(text: str, files: List[str] = ["emails.txt"]) -> Dict[str, An
         return {"error": str(e)}
 
 root_agent = Agent(
-    model="gemini-2.5-flash", 
+    model=resilient_model(model_for("profiler_agent")),
     name="profiler_agent",
+    before_model_callback=rate_limit_before_model,
+    after_model_callback=rate_limit_after_model,
     description="Analista Forense Multi-disciplinar",
-    tools=[make_embedding],
+    tools=[search_emails, make_embedding],
     instruction="""
     <system_instructions>
     <role>
@@ -101,8 +146,15 @@ root_agent = Agent(
            - **O que buscar:** Responda exatamente o que o usuário perguntou (ex: "Quem trouxe bolo?", "Quem comprou mágica?").
     </investigation_modes>
 
+    <tool_selection>
+        - **`search_emails(query, sender, date_from, date_to)`**: use quando a pergunta citar QUEM escreveu e/ou QUANDO
+          (ex: "o que o Michael escreveu em maio de 2008" -> sender="Michael", date_from="2008-05-01", date_to="2008-05-31").
+          Filtra por remetente/período antes de ranquear; `query` pode ficar vazio.
+        - **`make_embedding(text)`**: busca semântica livre, quando não há remetente/período definidos.
+    </tool_selection>
+
     <critical_constraints>
-        1. **GROUNDING TOTAL:** Se a informação não estiver no retorno da ferramenta `make_embedding`, ELA NÃO EXISTE. Responda "Dados insuficientes".
+        1. **GROUNDING TOTAL:** Se a informação não estiver no retorno das ferramentas (`search_emails` / `make_embedding`), ELA NÃO EXISTE. Responda "Dados insuficientes".
         2. **ANTI-ALUCINAÇÃO:** Os logs são de **2008**. Datas atuais (2023/2024/2025) são proibidas.
         3. **IDIOMA:** Se o usuário perguntar em Português, responda em Português.
     </critical_constraints>
@@ -127,6 +179,7 @@ root_agent = Agent(
     """,
 )
 
+@request_memoized
 async def run_investigation_tool(foco: str) -> str:
     print(f"\n🕵️ [Profiler] Iniciando investigação. Foco: {foco.upper()}...")
     
@@ -155,18 +208,18 @@ async def run_investigation_tool(foco: str) -> str:
     user_prompt = f"Analise os e-mails com foco em: {foco}. {prompt_suffix} Use a ferramenta de busca."
     
     user_msg = types.Content(role="user", parts=[types.Part(text=user_prompt)])
-    final_text = "Sem resposta."
-
     try:
-        async for event in runner.run_async(
-            user_id="orchestrator_internal_user", 
-            session_id=session_id,
-            new_message=user_msg
-        ):
-            if event.content and event.content.parts:
-                final_text = event.content.parts[0].text
-        
-        return final_text
+        with AgentRun(root_agent.name, entrypoint="run_investigation_tool", foco=foco) as run:
+            return await run_with_budget(
+                run,
+                runner.run_async(
+                    user_id="orchestrator_internal_user", 
+                    session_id=session_id,
+                    new_message=user_msg
+                ),
+                budget_for(root_agent.name),
+                default_text="Sem resposta.",
+            )
     except Exception as e:
         print(f"❌ Erro Crítico no Profiler: {e}")
         return f"Erro técnico: {str(e)}"
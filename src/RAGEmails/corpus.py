@@ -0,0 +1,279 @@
+"""
+Corpus de e-mails estruturado: parser do emails.txt + extração de entidades.
+
+O log tem o formato:
+
+    From: Ryan Howard
+    To: Kelly Kapoor
+    Date: 2008-04-09
+    Subject: WUPHF
+    Vou lançar $5,000 como 'consultoria de servidor' ...
+
+O parse e a extração (funcionários citados, datas e valores em dólar) rodam
+UMA vez por versão do arquivo e ficam em cache/emails_entities_<hash>.json.
+
+Uso (a partir de src/):
+    python -m RAGEmails.corpus          # ingestão (parse + entidades + índice)
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import fsspec
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+project_root = os.path.abspath(os.path.join(src_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from observability import metrics, span
+from runtime import blocking_pool
+
+EMAILS_PATH = os.getenv("EMAILS_PATH", "gs://dunder-data/data/emails.txt")
+CORPUS_CACHE_DIR = os.getenv("EMAILS_CACHE_DIR", os.path.join(project_root, "cache"))
+ENTITIES_SCHEMA_VERSION = 1
+
+_GCS_POOL = blocking_pool("gcs", default_workers=4)
+
+EMAILS_REFRESH_S = float(os.getenv("EMAILS_REFRESH_S", "300"))
+
+# hash -> corpus já carregado neste processo
+_corpus_cache: Dict[str, Dict[str, Any]] = {}
+# (path, nomes) -> (expira_em, hash): evita baixar o arquivo a cada consulta só para conferir a versão
+_version_by_path: Dict[tuple, tuple] = {}
+
+_HEADER_RE = re.compile(r"^(From|To|Date|Subject):\s*(.*)$", re.IGNORECASE)
+_AMOUNT_RE = re.compile(
+    r"(?:US)?\$\s?(\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d{1,2})?)(\s?(?:mil|k)\b)?",
+    re.IGNORECASE,
+)
+_ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_BR_DATE_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")
+
+
+def _norm(value: str) -> str:
+    return unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode().casefold().strip()
+
+
+# ---------------------------------------------------------------------------
+# Parser
+# ---------------------------------------------------------------------------
+
+
+def parse_emails(text: str) -> List[Dict[str, Any]]:
+    """Quebra o log em registros {id, date, sender, recipients, subject, body}."""
+    records: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    in_body = False
+
+    def _flush():
+        if current and (current["sender"] or current["body"]):
+            current["body"] = "\n".join(current["body"]).strip()
+            current["id"] = f"email_{len(records)}"
+            records.append(current)
+
+    for line in text.splitlines():
+        header = _HEADER_RE.match(line.strip())
+        if header and header.group(1).lower() == "from":
+            _flush()
+            current = {"date": None, "sender": "", "recipients": [], "subject": "", "body": []}
+            in_body = False
+
+        if current is None:
+            continue
+
+        if header and not in_body:
+            key, value = header.group(1).lower(), header.group(2).strip()
+            if key == "from":
+                current["sender"] = value
+            elif key == "to":
+                current["recipients"] = [r.strip() for r in re.split(r"[;,]", value) if r.strip()]
+            elif key == "date":
+                iso = _ISO_DATE_RE.search(value)
+                current["date"] = iso.group(0) if iso else value or None
+            elif key == "subject":
+                current["subject"] = value
+                in_body = True
+            continue
+
+        in_body = True
+        current["body"].append(line)
+
+    _flush()
+    return records
+
+
+# ---------------------------------------------------------------------------
+# Entidades
+# ---------------------------------------------------------------------------
+
+
+def parse_amount(raw: str, suffix: str = "") -> Optional[float]:
+    """'$5,000' -> 5000, '$1.000' -> 1000, '$12.50' -> 12.5, '$5 mil' -> 5000."""
+    digits = raw.strip()
+    if "," in digits and "." in digits:
+        decimal = "," if digits.rfind(",") > digits.rfind(".") else "."
+        thousands = "." if decimal == "," else ","
+        digits = digits.replace(thousands, "").replace(decimal, ".")
+    elif re.fullmatch(r"\d{1,3}([.,]\d{3})+", digits):
+        digits = re.sub(r"[.,]", "", digits)
+    else:
+        digits = digits.replace(",", ".")
+
+    try:
+        value = float(digits)
+    except ValueError:
+        return None
+    if suffix.strip().lower() in ("mil", "k"):
+        value *= 1000
+    return value
+
+
+def _name_patterns(known_names: List[str]) -> List[tuple]:
+    """(regex, nome canônico). Primeiro nome só vale se não for ambíguo."""
+    first_names: Dict[str, List[str]] = {}
+    for name in known_names:
+        first_names.setdefault(_norm(name).split()[0], []).append(name)
+
+    patterns = [(re.compile(rf"\b{re.escape(_norm(n))}\b"), n) for n in known_names]
+    patterns += [
+        (re.compile(rf"\b{re.escape(first)}\b"), names[0])
+        for first, names in first_names.items()
+        if len(names) == 1
+    ]
+    return patterns
+
+
+def extract_entities(record: Dict[str, Any], known_names: List[str]) -> Dict[str, Any]:
+    """Funcionários citados, valores e datas de um e-mail."""
+    body = record["body"]
+    patterns = _name_patterns(known_names)
+
+    def _resolve(name: str) -> Optional[str]:
+        normalized = _norm(name)
+        return next((canon for rx, canon in patterns if rx.search(normalized)), None)
+
+    people = set()
+    for rx, canon in patterns:
+        if rx.search(_norm(f"{record['subject']}\n{body}")):
+            people.add(canon)
+
+    amounts = []
+    for m in _AMOUNT_RE.finditer(body):
+        value = parse_amount(m.group(1), m.group(2) or "")
+        if value is not None:
+            amounts.append({"value": value, "text": m.group(0).strip()})
+
+    email_year = int(record["date"][:4]) if record.get("date") and record["date"][:4].isdigit() else None
+    dates = []
+    for m in _ISO_DATE_RE.finditer(body):
+        dates.append(m.group(0))
+    for m in _BR_DATE_RE.finditer(body):
+        day, month, year = int(m.group(1)), int(m.group(2)), m.group(3)
+        year = int(year) + (2000 if year and len(year) == 2 else 0) if year else email_year
+        try:
+            dates.append(date(year, month, day).isoformat())
+        except (TypeError, ValueError):
+            continue
+
+    return {
+        "sender": _resolve(record["sender"]) or record["sender"],
+        "recipients": [_resolve(r) or r for r in record["recipients"]],
+        "people": sorted(people),
+        "amounts": amounts,
+        "dates": sorted(set(dates)),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Ingestão com cache
+# ---------------------------------------------------------------------------
+
+
+def _read_text(path: str) -> str:
+    with span("emails.read", **{"emails.path": path}):
+        with fsspec.open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+def _corpus_hash(text: str, known_names: List[str]) -> str:
+    payload = json.dumps(
+        {"v": ENTITIES_SCHEMA_VERSION, "text": text, "names": sorted(known_names)}, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def build_corpus(text: str, known_names: List[str]) -> Dict[str, Any]:
+    """Parse + entidades, sem cache (bloqueante)."""
+    with span("emails.ingest") as s:
+        records = parse_emails(text)
+        for record in records:
+            record["entities"] = extract_entities(record, known_names)
+        s.set_attribute("emails.count", len(records))
+    return {"version": _corpus_hash(text, known_names), "emails": records}
+
+
+def load_corpus_sync(known_names: List[str], path: str = "") -> Dict[str, Any]:
+    """Corpus da versão atual do arquivo (memória -> disco -> ingestão)."""
+    path = path or EMAILS_PATH
+    key = (path, tuple(sorted(known_names)))
+    recent = _version_by_path.get(key)
+    if recent and recent[0] > time.monotonic() and recent[1] in _corpus_cache:
+        metrics.record_cache("emails_corpus", hit=True)
+        return _corpus_cache[recent[1]]
+
+    text = _read_text(path)
+    version = _corpus_hash(text, known_names)
+    _version_by_path[key] = (time.monotonic() + EMAILS_REFRESH_S, version)
+
+    if version in _corpus_cache:
+        metrics.record_cache("emails_corpus", hit=True)
+        return _corpus_cache[version]
+
+    cache_path = os.path.join(CORPUS_CACHE_DIR, f"emails_entities_{version}.json")
+    if os.path.exists(cache_path):
+        metrics.record_cache("emails_corpus", hit=True)
+        with open(cache_path, "r", encoding="utf-8") as f:
+            corpus = json.load(f)
+    else:
+        metrics.record_cache("emails_corpus", hit=False)
+        print(f"📨 [Emails] Ingerindo {path}...")
+        corpus = build_corpus(text, known_names)
+        os.makedirs(CORPUS_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(corpus, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+        print(f"💾 [Emails] {len(corpus['emails'])} e-mails indexados em {cache_path}")
+
+    _corpus_cache[version] = corpus
+    return corpus
+
+
+async def load_corpus(known_names: List[str], path: str = "") -> Dict[str, Any]:
+    return await _GCS_POOL.run(load_corpus_sync, known_names, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestão do corpus de e-mails")
+    parser.add_argument("--path", default=EMAILS_PATH)
+    args = parser.parse_args()
+
+    from agentPandas.tools import _get_gs_path, _load_dataframe
+
+    names = sorted(_load_dataframe(_get_gs_path())["funcionario"].dropna().unique())
+    corpus = load_corpus_sync(names, args.path)
+
+    from RAGEmails.index import load_index_sync
+
+    load_index_sync(corpus)
+    with_amounts = sum(1 for e in corpus["emails"] if e["entities"]["amounts"])
+    print(f"✅ {len(corpus['emails'])} e-mails, {with_amounts} com valores em dólar (versão {corpus['version']}).")
@@ -0,0 +1,247 @@
+"""
+Índice local do corpus de e-mails: metadados colunares + índice invertido.
+
+Gerado a partir do corpus (RAGEmails/corpus.py) e gravado em
+cache/emails_index_<versão>/:
+
+    metadata.parquet   id, date, sender, recipients, subject, body
+    postings.npz       vocabulário + postings em CSR (doc, tf) + tamanho dos docs
+
+A busca filtra primeiro por remetente/intervalo de datas (máscara vetorizada
+sobre as colunas) e só então ranqueia por BM25 os e-mails que sobraram.
+"""
+import json
+import os
+import re
+import shutil
+import sys
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from observability import metrics, span
+from rag.hybrid import tokenize
+from RAGEmails.corpus import CORPUS_CACHE_DIR, load_corpus
+from runtime import blocking_pool, request_memoized
+
+_BM25_K1, _BM25_B = 1.5, 0.75
+
+_GCS_POOL = blocking_pool("gcs", default_workers=4)
+
+# versão do corpus -> índice carregado
+_index_cache: Dict[str, "EmailIndex"] = {}
+
+
+def _norm(value: str) -> str:
+    return unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode().casefold().strip()
+
+
+class EmailIndex:
+    def __init__(self, meta: pd.DataFrame, vocab: Dict[str, int], indptr: np.ndarray,
+                 doc_ids: np.ndarray, tfs: np.ndarray, doc_len: np.ndarray, version: str):
+        self.meta = meta
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.version = version
+        self.avgdl = float(doc_len.mean()) if len(doc_len) else 0.0
+        self._sender_norm = meta["sender"].fillna("").map(_norm)
+        self._recipients_norm = meta["recipients"].fillna("").map(_norm)
+
+    # ------------------------------------------------------------------
+    # Construção / persistência
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, corpus: Dict[str, Any]) -> "EmailIndex":
+        emails = corpus["emails"]
+        meta = pd.DataFrame({
+            "id": [e["id"] for e in emails],
+            "date": pd.to_datetime([e.get("date") for e in emails], errors="coerce"),
+            "sender": [e["sender"] for e in emails],
+            "recipients": ["; ".join(e["recipients"]) for e in emails],
+            "subject": [e["subject"] for e in emails],
+            "body": [e["body"] for e in emails],
+        })
+
+        postings: Dict[str, Dict[int, int]] = {}
+        doc_len = np.zeros(len(emails), dtype=np.int32)
+        for doc, email in enumerate(emails):
+            tokens = tokenize(f"{email['subject']} {email['sender']} {email['body']}")
+            doc_len[doc] = len(tokens)
+            for token in tokens:
+                bucket = postings.setdefault(token, {})
+                bucket[doc] = bucket.get(doc, 0) + 1
+
+        terms = sorted(postings)
+        vocab = {t: i for i, t in enumerate(terms)}
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(postings[t]) for t in terms])
+        doc_ids = np.fromiter((d for t in terms for d in postings[t]), dtype=np.int32, count=indptr[-1])
+        tfs = np.fromiter((c for t in terms for c in postings[t].values()), dtype=np.int32, count=indptr[-1])
+        return cls(meta, vocab, indptr, doc_ids, tfs, doc_len, corpus["version"])
+
+    def save(self, directory: str) -> None:
+        tmp_dir = f"{directory}.tmp{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        self.meta.to_parquet(os.path.join(tmp_dir, "metadata.parquet"), index=False)
+        np.savez_compressed(
+            os.path.join(tmp_dir, "postings.npz"),
+            terms=np.array(list(self.vocab), dtype=object).astype(str),
+            indptr=self.indptr, doc_ids=self.doc_ids, tfs=self.tfs, doc_len=self.doc_len,
+        )
+        with open(os.path.join(tmp_dir, "version.json"), "w") as f:
+            json.dump({"version": self.version}, f)
+        try:
+            os.replace(tmp_dir, directory)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # outro processo já gravou a mesma versão
+
+    @classmethod
+    def load(cls, directory: str) -> "EmailIndex":
+        meta = pd.read_parquet(os.path.join(directory, "metadata.parquet"))
+        data = np.load(os.path.join(directory, "postings.npz"))
+        with open(os.path.join(directory, "version.json")) as f:
+            version = json.load(f)["version"]
+        vocab = {t: i for i, t in enumerate(data["terms"].tolist())}
+        return cls(meta, vocab, data["indptr"], data["doc_ids"], data["tfs"], data["doc_len"], version)
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def filter_mask(self, sender: str = "", recipient: str = "",
+                    date_from: str = "", date_to: str = "") -> np.ndarray:
+        mask = np.ones(len(self.meta), dtype=bool)
+        if sender:
+            mask &= self._sender_norm.str.contains(re.escape(_norm(sender))).to_numpy()
+        if recipient:
+            mask &= self._recipients_norm.str.contains(re.escape(_norm(recipient))).to_numpy()
+        if date_from:
+            mask &= (self.meta["date"] >= pd.Timestamp(date_from)).to_numpy()
+        if date_to:
+            mask &= (self.meta["date"] <= pd.Timestamp(date_to)).to_numpy()
+        return mask
+
+    def bm25(self, query: str, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Score BM25 de cada documento (0 fora da máscara)."""
+        n_docs = len(self.meta)
+        scores = np.zeros(n_docs, dtype=np.float64)
+        norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * self.doc_len / max(self.avgdl, 1e-9))
+
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs, tf = self.doc_ids[start:end], self.tfs[start:end]
+            idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (_BM25_K1 + 1) / (tf + norm[docs])
+
+        if mask is not None:
+            scores[~mask] = 0.0
+        return scores
+
+    def search(self, query: str = "", sender: str = "", recipient: str = "",
+               date_from: str = "", date_to: str = "", top_k: int = 10) -> List[Dict[str, Any]]:
+        mask = self.filter_mask(sender, recipient, date_from, date_to)
+        scores = self.bm25(query, mask) if query.strip() else np.zeros(len(self.meta))
+
+        if query.strip():
+            # Nenhum termo casou: sem resultado (e-mails sem relação não viram "acerto").
+            candidates = np.flatnonzero(scores > 0)
+            order = candidates[np.argsort(-scores[candidates], kind="stable")][:top_k]
+        else:
+            # Só filtros: os mais recentes do recorte.
+            candidates = np.flatnonzero(mask)
+            order = candidates[np.argsort(-self.meta["date"].to_numpy()[candidates].astype("int64"))][:top_k]
+
+        results = []
+        for doc in order:
+            row = self.meta.iloc[doc]
+            results.append({
+                "id": row["id"],
+                "date": row["date"].strftime("%Y-%m-%d") if pd.notna(row["date"]) else None,
+                "from": row["sender"],
+                "to": row["recipients"],
+                "subject": row["subject"],
+                "text": row["body"],
+                "score": round(float(scores[doc]), 4),
+            })
+        return results
+
+
+def load_index_sync(corpus: Dict[str, Any]) -> EmailIndex:
+    version = corpus["version"]
+    if version in _index_cache:
+        metrics.record_cache("emails_index", hit=True)
+        return _index_cache[version]
+
+    directory = os.path.join(CORPUS_CACHE_DIR, f"emails_index_{version}")
+    if os.path.exists(directory):
+        metrics.record_cache("emails_index", hit=True)
+        index = EmailIndex.load(directory)
+    else:
+        metrics.record_cache("emails_index", hit=False)
+        with span("emails.index.build", **{"emails.count": len(corpus["emails"])}):
+            index = EmailIndex.build(corpus)
+            index.save(directory)
+        print(f"🗂️ [Emails] Índice ({len(index.vocab)} termos) gravado em {directory}")
+
+    _index_cache[version] = index
+    return index
+
+
+async def load_index(known_names: Optional[List[str]] = None) -> EmailIndex:
+    if known_names is None:
+        from agentPandas.tools import _get_gs_path, load_dataframe_async
+
+        df = await load_dataframe_async(_get_gs_path())
+        known_names = sorted(df["funcionario"].dropna().astype(str).unique()) if "funcionario" in df.columns else []
+    corpus = await load_corpus(known_names)
+    return await _GCS_POOL.run(load_index_sync, corpus)
+
+
+@request_memoized
+async def search_emails(
+    query: str = "",
+    sender: str = "",
+    date_from: str = "",
+    date_to: str = "",
+    top_k: int = 10,
+) -> Dict[str, Any]:
+    """
+    Busca e-mails no índice local, filtrando por remetente e período ANTES de ranquear.
+
+    Args:
+        query: Termos a buscar no assunto/corpo (pode ser vazio para listar só pelos filtros).
+        sender: Opcional. Nome (ou parte) de quem enviou, ex: "Michael".
+        date_from: Opcional. Data inicial YYYY-MM-DD (inclusive).
+        date_to: Opcional. Data final YYYY-MM-DD (inclusive).
+        top_k: Máximo de e-mails retornados.
+
+    Returns:
+        Dict com os e-mails encontrados (data, remetente, destinatários, assunto, texto, score).
+    """
+    print(f"\n📇 [Índice de E-mails] query='{query}' sender='{sender}' período={date_from or '*'}..{date_to or '*'}")
+    try:
+        index = await load_index()
+        with span("emails.search", **{"emails.sender": sender, "emails.query": query}) as s:
+            results = index.search(query, sender=sender, date_from=date_from, date_to=date_to, top_k=top_k)
+            s.set_attribute("emails.results", len(results))
+        if not results:
+            message = "Nenhum e-mail do recorte contém esses termos." if query.strip() else "Nenhum e-mail no recorte pedido."
+            return {"query": query, "emails": [], "message": message}
+        return {"query": query, "emails": results}
+    except Exception as e:
+        print(f"❌ Erro no índice de e-mails: {e}")
+        return {"error": str(e)}
@@ -0,0 +1,201 @@
+"""
+Junção determinística e-mail -> transação (evidência do "triângulo da fraude").
+
+Para cada e-mail do corpus (RAGEmails/corpus.py) as entidades viram "pistas"
+(pessoa, data, valor). As pistas são cruzadas com o extrato usando índices
+sobre `valor` (ordenado, busca binária com tolerância), `funcionario`
+(posições por nome) e `data` (janela em dias), sem nenhuma chamada ao LLM.
+"""
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from agentPandas.tools import _get_gs_path, load_dataframe_async
+from observability import span
+from RAGEmails.corpus import load_corpus
+from runtime import request_memoized
+
+# Pesos do score (somam 1.0)
+_W_AMOUNT, _W_DATE, _W_PERSON = 0.4, 0.3, 0.3
+_PERSON_WEIGHT = {"sender": 1.0, "recipient": 0.7, "mentioned": 0.7}
+
+
+class TransactionIndex:
+    """Índices do extrato para a junção (montados uma vez por DataFrame)."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.dates = pd.to_datetime(df["data"], errors="coerce").to_numpy(dtype="datetime64[D]")
+        amounts = pd.to_numeric(df["valor"], errors="coerce").to_numpy(dtype=float)
+        self.amount_order = np.argsort(amounts, kind="stable")
+        self.amount_sorted = amounts[self.amount_order]
+        self.amounts = amounts
+        self.by_employee: Dict[str, np.ndarray] = (
+            df.groupby("funcionario", sort=False).indices if "funcionario" in df.columns else {}
+        )
+
+    def by_amount(self, value: float, tolerance: float) -> np.ndarray:
+        lo = np.searchsorted(self.amount_sorted, value - tolerance, side="left")
+        hi = np.searchsorted(self.amount_sorted, value + tolerance, side="right")
+        return self.amount_order[lo:hi]
+
+    def within_days(self, rows: np.ndarray, day: np.datetime64, window: int) -> np.ndarray:
+        delta = np.abs((self.dates[rows] - day).astype("timedelta64[D]").astype(float))
+        return rows[delta <= window]
+
+
+_index_cache: Dict[str, Any] = {"df_id": None, "index": None}
+
+
+def _transaction_index(df: pd.DataFrame) -> TransactionIndex:
+    if _index_cache["df_id"] != id(df):
+        _index_cache.update({"df_id": id(df), "index": TransactionIndex(df)})
+    return _index_cache["index"]
+
+
+def _email_people(email: Dict[str, Any]) -> Dict[str, str]:
+    """nome -> papel no e-mail (remetente > destinatário > citado)."""
+    entities = email["entities"]
+    people = {name: "mentioned" for name in entities["people"]}
+    people.update({name: "recipient" for name in entities["recipients"]})
+    people[entities["sender"]] = "sender"
+    return people
+
+
+def link_emails(
+    corpus: Dict[str, Any],
+    index: TransactionIndex,
+    employee: str = "",
+    date_window_days: int = 7,
+    amount_tolerance_pct: float = 5.0,
+    min_score: float = 0.5,
+) -> List[Dict[str, Any]]:
+    """Pares (e-mail, transação) ordenados por score."""
+    df = index.df
+    best: Dict[tuple, Dict[str, Any]] = {}
+    employee_filter = employee.strip().casefold()
+
+    for email in corpus["emails"]:
+        if not email.get("date"):
+            continue
+        entities = email["entities"]
+        people = _email_people(email)
+        lead_days = [np.datetime64(d, "D") for d in [email["date"], *entities["dates"]]]
+
+        candidates: List[tuple] = []  # (linhas, valor citado | None)
+        for amount in entities["amounts"]:
+            tolerance = max(1.0, amount["value"] * amount_tolerance_pct / 100)
+            candidates.append((index.by_amount(amount["value"], tolerance), amount))
+        # Sem valor: só pessoa + data explícita no corpo (janela de 1 dia).
+        if not entities["amounts"] and entities["dates"]:
+            for name in people:
+                rows = index.by_employee.get(name)
+                if rows is not None:
+                    candidates.append((rows, None))
+
+        for rows, amount in candidates:
+            window = date_window_days if amount else min(1, date_window_days)
+            days = lead_days if amount else lead_days[1:]
+            for day in days:
+                for row in index.within_days(rows, day, window):
+                    tx = df.iloc[row]
+                    role = people.get(tx.get("funcionario"))
+                    if amount is None and role is None:
+                        continue
+                    if employee_filter and employee_filter not in str(tx.get("funcionario", "")).casefold() \
+                            and not any(employee_filter in p.casefold() for p in people):
+                        continue
+
+                    days_apart = int(abs((index.dates[row] - day).astype(int)))
+                    score = _W_DATE * (1 - days_apart / (window + 1))
+                    matched_on = ["data"]
+                    if amount:
+                        tolerance = max(1.0, amount["value"] * amount_tolerance_pct / 100)
+                        closeness = 1 - abs(index.amounts[row] - amount["value"]) / (tolerance * 2)
+                        # Valor comum ($35) casa com dezenas de linhas: vale menos.
+                        specificity = min(1.0, 3 / max(1, len(rows)))
+                        score += _W_AMOUNT * closeness * specificity
+                        matched_on.append("valor")
+                    if role:
+                        score += _W_PERSON * _PERSON_WEIGHT[role]
+                        matched_on.append("funcionario")
+                    if score < min_score:
+                        continue
+
+                    key = (email["id"], tx.get("id_transacao", row))
+                    if key in best and best[key]["score"] >= score:
+                        continue
+                    best[key] = {
+                        "score": round(float(score), 3),
+                        "matched_on": matched_on,
+                        "person_role": role,
+                        "amount_mentioned": amount["text"] if amount else None,
+                        "days_apart": days_apart,
+                        "email": {
+                            "id": email["id"],
+                            "date": email["date"],
+                            "from": email["sender"],
+                            "to": email["recipients"],
+                            "subject": email["subject"],
+                            "excerpt": email["body"][:300],
+                        },
+                        "transaction": {
+                            k: (v.item() if hasattr(v, "item") else v)
+                            for k, v in tx.to_dict().items()
+                        },
+                    }
+
+    return sorted(best.values(), key=lambda p: p["score"], reverse=True)
+
+
+@request_memoized
+async def link_email_evidence(
+    employee: str = "",
+    date_window_days: int = 7,
+    amount_tolerance_pct: float = 5.0,
+    max_results: int = 20,
+) -> Dict[str, Any]:
+    """
+    Cruza TODOS os e-mails com o extrato bancário e retorna os pares casados.
+
+    Cada par liga um e-mail (quem escreveu, data, valor citado) a uma transação
+    real pelo funcionário, pela data (janela em dias) e pelo valor (tolerância %).
+
+    Args:
+        employee: Opcional. Restringe a um funcionário (ex: "Ryan Howard").
+        date_window_days: Distância máxima entre o e-mail e a transação.
+        amount_tolerance_pct: Diferença máxima entre o valor citado e o lançado.
+        max_results: Quantos pares retornar (maior score primeiro).
+
+    Returns:
+        Dict com os pares {email, transaction, matched_on, score}.
+    """
+    print(f"🔗 [Linkage] Cruzando e-mails x extrato (funcionário='{employee or '*'}')...")
+    try:
+        df = await load_dataframe_async(_get_gs_path())
+        names = sorted(df["funcionario"].dropna().astype(str).unique()) if "funcionario" in df.columns else []
+        corpus = await load_corpus(names)
+
+        with span("emails.linkage", **{"emails.version": corpus["version"]}) as s:
+            pairs = link_emails(
+                corpus,
+                _transaction_index(df),
+                employee=employee,
+                date_window_days=date_window_days,
+                amount_tolerance_pct=amount_tolerance_pct,
+            )
+            s.set_attribute("emails.pairs", len(pairs))
+
+        if not pairs:
+            return {"message": "Nenhum e-mail casou com transações do extrato.", "pairs": []}
+        return {"total_pairs": len(pairs), "pairs": pairs[:max_results]}
+    except Exception as e:
+        return {"error": f"Falha no cruzamento e-mails x extrato: {e}"}
@@ -5,7 +5,7 @@ from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google import genai
 from google.genai import types
-import sys, os, uuid, asyncio
+import sys, os, uuid, asyncio, json, re
 import vertexai
 
 # AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA TESTE TESTE TESTE
@@ -27,8 +27,14 @@ except ImportError:
     print("⚠️ AVISO: Não foi possível importar make_embedding. O agente pode falhar.")
     make_embedding = None 
 
+from agentCompliance.policy import PolicyDocument, policy_for_context
+from observability import AgentRun, metrics
+from runtime import budget_for, model_for, rate_limit_after_model, rate_limit_before_model, request_memoized, resilient_model, run_escalating, run_with_budget
+
 # --- CONFIGURAÇÕES ---
 APP_NAME = "dunderai"
+# Abaixo disso o veredito é refeito no modelo de escalonamento (runtime/models.py).
+COMPLIANCE_MIN_CONFIDENCE = float(os.getenv("COMPLIANCE_MIN_CONFIDENCE", "0.6"))
 # Configura o Vertex AI (ajuste projeto/local se necessário)
 try:
     vertexai.init(project="dunderai", location="us-west1")
@@ -66,6 +72,7 @@ You must ALWAYS return a STRICT JSON object and NOTHING ELSE.
 {
   "query": string,
   "following_compliance": boolean,
+  "confidence": number between 0 and 1 (how clearly the retrieved rules answer the question),
   "evidences": [
     {
       "subject": string,
@@ -82,6 +89,49 @@ You must ALWAYS return a STRICT JSON object and NOTHING ELSE.
 </system_prompt>
 """
 
+# Modo política-em-contexto (agentCompliance/policy.py): a política inteira vai
+# no fim do system prompt e o agente não tem ferramentas.
+CONTEXT_PROMPT = """<system_prompt> <role>
+You are "Toby's Compliance Assistant", an AI auditor specialized in the Dunder Mifflin compliance policy.
+
+
+    <anti_hallucination_policy>
+        **ZERO TOLERANCE FOR FABRICATION.**
+        - You must **NEVER** invent, guess, or assume rules that are not explicitly written in the policy document below.
+        - Always cite the section or sentence of the policy that supports your conclusion.
+        - If the policy is silent or ambiguous about the question, say so. Do not fill the gap.
+    </anti_hallucination_policy>
+
+The FULL policy (politica_compliance.txt) is provided below inside <policy_document>.
+It is your only source. You have no tools.
+</role>
+
+<input_format>
+- You will always receive a natural language question from a user.
+</input_format>
+
+<output_schema>
+You must ALWAYS return a STRICT JSON object and NOTHING ELSE.
+{
+  "query": string,
+  "following_compliance": boolean,
+  "confidence": number between 0 and 1 (how clearly the policy answers the question),
+  "evidences": [
+    {
+      "subject": string,
+      "source": "politica_compliance.txt"
+    }
+  ]
+}
+</output_schema>
+
+<safety_and_limitations>
+- When a rule can be interpreted in multiple ways, adopt the interpretation that best protects the company (conservative).
+- If the policy does not cover the question, set "following_compliance": false and explain.
+</safety_and_limitations>
+</system_prompt>
+"""
+
 # --- DEFINIÇÃO DAS FERRAMENTAS ---
 # Criamos a Tool corretamente para o Agente usar
 tools_list = []
@@ -92,13 +142,67 @@ if make_embedding:
     tools_list.append(rag_tool)
 
 agent_compliance = Agent(
-    model="gemini-2.5-flash", 
+    model=resilient_model(model_for("agent_compliance")),
     name="agent_compliance",
+    before_model_callback=rate_limit_before_model,
+    after_model_callback=rate_limit_after_model,
     description="Agente responsável por conferir políticas de compliance",
     instruction=SYSTEM_PROMPT,
     tools=tools_list
 )
 
+# versão da política -> cópia do agente com a política no prompt
+_context_agents = {}
+
+
+def _agent_with_policy(policy: PolicyDocument) -> Agent:
+    """Mesmo agente, sem ferramentas e com a política no prompt (um por versão)."""
+    if policy.version not in _context_agents:
+        prompt = (
+            f"{CONTEXT_PROMPT}\n<policy_document source=\"politica_compliance.txt\" version=\"{policy.version}\">\n"
+            f"{policy.text}\n</policy_document>\n"
+        )
+        # Instrução como função: o ADK não tenta injetar estado em {chaves} do texto da política.
+        _context_agents[policy.version] = agent_compliance.model_copy(
+            update={"instruction": lambda _ctx: prompt, "tools": []}
+        )
+    return _context_agents[policy.version]
+
+
+async def _select_agent():
+    """(agente, modo): política no prompt quando cabe, senão retrieval."""
+    policy, reason = await policy_for_context()
+    mode = "context" if policy else "retrieval"
+    metrics.COMPLIANCE_POLICY_MODE.labels(mode=mode, reason=reason).inc()
+    return (_agent_with_policy(policy) if policy else agent_compliance), mode
+
+
+def parse_verdict(text: str):
+    """Veredito STRICT JSON do agente como dict (None se não veio um veredito válido)."""
+    cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", (text or "").strip())
+    match = re.search(r"\{.*\}", cleaned, re.DOTALL)
+    try:
+        verdict = json.loads(match.group(0)) if match else None
+    except json.JSONDecodeError:
+        verdict = None
+    if not isinstance(verdict, dict) or not isinstance(verdict.get("following_compliance"), bool):
+        return None
+    return verdict
+
+
+def _verdict_problem(text: str):
+    """Motivo para refazer o veredito num modelo mais forte (None = resposta aceita)."""
+    if text.startswith("⚠️"):
+        return None  # orçamento estourado: refazer só dobraria o custo
+    verdict = parse_verdict(text)
+    if verdict is None:
+        return "json_invalido"
+    confidence = verdict.get("confidence")
+    if isinstance(confidence, (int, float)) and confidence < COMPLIANCE_MIN_CONFIDENCE:
+        return "confianca_baixa"
+    return None
+
+@request_memoized
 async def run_compliance_tool(query: str) -> str:
     """
     Função assíncrona que o Orquestrador chama como ferramenta.
@@ -108,36 +212,45 @@ async def run_compliance_tool(query: str) -> str:
     """
     print(f"⚖️ [Compliance] Verificando regra para: '{query}'")
     
-    session_service = InMemorySessionService()
-    session_id = str(uuid.uuid4())
-    user_id = "orchestrator_internal_user"
-    
-    await session_service.create_session(
-        app_name=APP_NAME,
-        user_id=user_id,
-        session_id=session_id
-    )
-    
-    runner = Runner(
-        agent=agent_compliance,
-        app_name=APP_NAME,
-        session_service=session_service
-    )
-    
     content = types.Content(role="user", parts=[types.Part(text=query)])
-    
-    final_text = "Sem resposta."
 
-    try:
-        async for event in runner.run_async(
+    async def _run_once(agent) -> str:
+        session_service = InMemorySessionService()
+        session_id = str(uuid.uuid4())
+        user_id = "orchestrator_internal_user"
+
+        await session_service.create_session(
+            app_name=APP_NAME,
             user_id=user_id,
-            session_id=session_id,
-            new_message=content
-        ):
-            if event.content and event.content.parts:
-                final_text = event.content.parts[0].text
-        
-        return final_text
+            session_id=session_id
+        )
+
+        runner = Runner(
+            agent=agent,
+            app_name=APP_NAME,
+            session_service=session_service
+        )
+
+        with AgentRun(
+            agent.name,
+            entrypoint="run_compliance_tool",
+            model=str(getattr(agent.model, "model", agent.model)),
+            policy_mode=mode,
+        ) as run:
+            return await run_with_budget(
+                run,
+                runner.run_async(
+                    user_id=user_id,
+                    session_id=session_id,
+                    new_message=content
+                ),
+                budget_for(agent.name),
+                default_text="Sem resposta.",
+            )
+
+    try:
+        agent, mode = await _select_agent()
+        return await run_escalating(agent, _run_once, _verdict_problem)
         
     except Exception as e:
         return f"❌ Erro no Compliance Agent: {str(e)}"
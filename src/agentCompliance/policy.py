@@ -0,0 +1,145 @@
+"""
+Política de compliance inteira no contexto do agente (sem retrieval).
+
+`politica_compliance.txt` é um documento pequeno: em vez de uma ida ao Vertex
+RAG por pergunta para pegar 3 trechos, o agente de compliance recebe a
+política completa no system prompt. O prompt (instruções + política) é
+montado uma vez por versão da política (hash do conteúdo) e fica idêntico
+entre as chamadas, então o prefixo é reaproveitado pelo cache implícito de
+contexto do Gemini.
+
+A política é lida da origem e guardada em cache/compliance_policy.json.
+Depois do TTL só os metadados da origem (tamanho, md5/etag) são conferidos e
+o texto é relido apenas se mudou; com a origem fora do ar, vale a última
+cópia local. Políticas maiores que COMPLIANCE_POLICY_MAX_TOKENS (ou sem cópia
+disponível) voltam para o modo retrieval (`make_embedding`).
+
+Configuração via env:
+    COMPLIANCE_POLICY_PATH=gs://dunder-data/data/politica_compliance.txt
+    COMPLIANCE_POLICY_MODE=auto | context | retrieval   (context ignora o limite de tokens)
+    COMPLIANCE_POLICY_MAX_TOKENS=12000
+    COMPLIANCE_POLICY_TTL_S=300
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Tuple
+
+import fsspec
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+project_root = os.path.abspath(os.path.join(src_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from observability import metrics, span
+from runtime import blocking_pool, file_fingerprint
+from runtime.ratelimit import CHARS_PER_TOKEN
+
+POLICY_PATH = os.getenv(
+    "COMPLIANCE_POLICY_PATH", "gs://dunder-data/data/politica_compliance.txt"
+)
+COMPLIANCE_POLICY_MODE = os.getenv("COMPLIANCE_POLICY_MODE", "auto").lower()
+COMPLIANCE_POLICY_MAX_TOKENS = int(os.getenv("COMPLIANCE_POLICY_MAX_TOKENS", "12000"))
+COMPLIANCE_POLICY_TTL_S = float(os.getenv("COMPLIANCE_POLICY_TTL_S", "300"))
+COMPLIANCE_POLICY_TIMEOUT_S = float(os.getenv("COMPLIANCE_POLICY_TIMEOUT_S", "10"))
+POLICY_CACHE_PATH = os.path.join(
+    os.getenv("COMPLIANCE_RULES_CACHE_DIR", os.path.join(project_root, "cache")), "compliance_policy.json"
+)
+
+_GCS_POOL = blocking_pool("gcs", default_workers=4)
+
+# path -> (expira_em, documento ou None se indisponível)
+_policy_cache: Dict[str, Tuple[float, Optional["PolicyDocument"]]] = {}
+
+
+@dataclass(frozen=True)
+class PolicyDocument:
+    path: str
+    text: str
+    version: str  # hash do conteúdo
+    fingerprint: str  # metadados da origem quando o texto foi lido
+
+    @property
+    def tokens(self) -> int:
+        return max(1, len(self.text) // CHARS_PER_TOKEN)
+
+
+def _read_policy(path: str) -> str:
+    with span("compliance.policy.read", **{"policy.path": path}):
+        with fsspec.open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+def _local_copy(path: str) -> Optional[PolicyDocument]:
+    try:
+        with open(POLICY_CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return PolicyDocument(**data) if data.get("path") == path else None
+
+
+def _save_local(doc: PolicyDocument) -> None:
+    os.makedirs(os.path.dirname(POLICY_CACHE_PATH), exist_ok=True)
+    tmp_path = f"{POLICY_CACHE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(asdict(doc), f, ensure_ascii=False)
+    os.replace(tmp_path, POLICY_CACHE_PATH)
+
+
+def _fetch_policy(path: str, refresh: bool = False) -> PolicyDocument:
+    """Cópia local se a origem não mudou; senão relê a origem e atualiza a cópia."""
+    fingerprint = file_fingerprint(path)
+    local = _local_copy(path)
+    if not refresh and local and local.fingerprint == fingerprint and not fingerprint.endswith(":?"):
+        metrics.record_cache("compliance_policy", hit=True)
+        return local
+
+    metrics.record_cache("compliance_policy", hit=False)
+    text = _read_policy(path)
+    doc = PolicyDocument(
+        path=path,
+        text=text,
+        version=hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+        fingerprint=fingerprint,
+    )
+    if local is None or local.version != doc.version or local.fingerprint != fingerprint:
+        _save_local(doc)
+        print(f"📜 [Compliance] Política {doc.version} ({doc.tokens} tokens) salva em {POLICY_CACHE_PATH}")
+    return doc
+
+
+async def load_policy(refresh: bool = False) -> Optional[PolicyDocument]:
+    """Política atual (memória -> cópia local -> origem); None se não há nenhuma cópia."""
+    cached = _policy_cache.get(POLICY_PATH)
+    if not refresh and cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    try:
+        doc = await _GCS_POOL.run(_fetch_policy, POLICY_PATH, refresh, timeout=COMPLIANCE_POLICY_TIMEOUT_S)
+    except Exception as e:
+        doc = _local_copy(POLICY_PATH)
+        state = f"usando a cópia local {doc.version}" if doc else "sem cópia local"
+        print(f"⚠️ [Compliance] Falha ao ler {POLICY_PATH} ({type(e).__name__}: {e}); {state}.")
+    _policy_cache[POLICY_PATH] = (time.monotonic() + COMPLIANCE_POLICY_TTL_S, doc)
+    return doc
+
+
+async def policy_for_context() -> Tuple[Optional[PolicyDocument], str]:
+    """
+    (política, motivo) para o modo em contexto; política None = usar retrieval.
+    Motivos: context, mode_retrieval, unavailable, too_large.
+    """
+    if COMPLIANCE_POLICY_MODE == "retrieval":
+        return None, "mode_retrieval"
+    policy = await load_policy()
+    if policy is None:
+        return None, "unavailable"
+    if COMPLIANCE_POLICY_MODE == "auto" and policy.tokens > COMPLIANCE_POLICY_MAX_TOKENS:
+        return None, "too_large"
+    return policy, "context"
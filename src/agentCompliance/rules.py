@@ -0,0 +1,491 @@
+"""
+Varredura de compliance em lote: política compilada em regras + avaliação vetorizada.
+
+1. As regras quantitativas de `politica_compliance.txt` são extraídas UMA vez
+   pelo Gemini para um JSON estruturado, gravado em
+   cache/compliance_rules_<hash>.json (hash = texto da política + categorias
+   do extrato + versão do schema). Enquanto a política não mudar, nenhum LLM
+   é chamado.
+2. Todas as linhas do extrato são avaliadas contra as regras com pandas,
+   devolvendo as violações com a citação da política.
+
+Schema das regras:
+    {
+      "category_limits":   [{"category", "max_amount", "citation"}],
+      "receipt_threshold": {"amount", "citation"} | null,
+      "split_purchase":    {"threshold", "window_days", "same_category", "citation"} | null,
+      "approval_levels":   [{"min_amount", "approver", "citation"}],
+      "prohibited_items":  [{"keyword", "citation"}]
+    }
+
+Uso (a partir de src/):
+    python -m agentCompliance.rules            # compila (se preciso) e varre o extrato
+    python -m agentCompliance.rules --refresh  # força nova extração
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import unicodedata
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+project_root = os.path.abspath(os.path.join(src_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from google.adk.agents.llm_agent import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from agentCompliance.policy import POLICY_PATH, load_policy
+from agentPandas.tools import _get_gs_path, load_dataframe_async
+from observability import AgentRun, span
+from runtime import blocking_pool, budget_for, model_for, rate_limit_after_model, rate_limit_before_model, request_memoized, resilient_model, run_escalating, run_with_budget
+
+RULES_SCHEMA_VERSION = 1
+RULES_CACHE_DIR = os.getenv(
+    "COMPLIANCE_RULES_CACHE_DIR", os.path.join(project_root, "cache")
+)
+
+_EVAL_POOL = blocking_pool("dataframe", default_workers=2)
+
+# hash -> regras já carregadas neste processo
+_rules_cache: Dict[str, Dict[str, Any]] = {}
+
+_SEVERITY_ORDER = {"high": 0, "medium": 1, "review": 2}
+
+EXTRACTION_PROMPT = """<system_instructions>
+<role>
+You compile the Dunder Mifflin compliance policy into machine-checkable rules.
+You receive the FULL policy text and the list of expense categories used in the bank statement.
+</role>
+
+<rules>
+- Extract ONLY quantitative/checkable rules that are explicitly written in the policy. Never invent values.
+- "category" must be one of the statement categories given to you (map synonyms to the closest one);
+  use "*" for a per-transaction limit that applies to every category.
+- "citation" is the exact sentence of the policy that supports the rule.
+- Amounts are plain numbers in USD (no currency symbols).
+- If a rule type does not exist in the policy, use null (objects) or [] (lists).
+</rules>
+
+<output_schema>
+Return STRICTLY a JSON object and NOTHING ELSE:
+{
+  "category_limits": [{"category": string, "max_amount": number, "citation": string}],
+  "receipt_threshold": {"amount": number, "citation": string} | null,
+  "split_purchase": {"threshold": number, "window_days": integer, "same_category": boolean, "citation": string} | null,
+  "approval_levels": [{"min_amount": number, "approver": string, "citation": string}],
+  "prohibited_items": [{"keyword": string, "citation": string}]
+}
+</output_schema>
+</system_instructions>
+"""
+
+rule_extractor_agent = Agent(
+    model=resilient_model(model_for("compliance_rule_extractor")),
+    name="compliance_rule_extractor",
+    before_model_callback=rate_limit_before_model,
+    after_model_callback=rate_limit_after_model,
+    description="Compila a política de compliance em regras estruturadas",
+    instruction=EXTRACTION_PROMPT,
+)
+
+
+# ---------------------------------------------------------------------------
+# Compilação das regras
+# ---------------------------------------------------------------------------
+
+
+def _rules_hash(policy_text: str, categories: List[str]) -> str:
+    payload = json.dumps(
+        {"v": RULES_SCHEMA_VERSION, "policy": policy_text, "categories": sorted(categories)},
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _rules_path(rules_hash: str) -> str:
+    return os.path.join(RULES_CACHE_DIR, f"compliance_rules_{rules_hash}.json")
+
+
+def _parse_json(text: str) -> Dict[str, Any]:
+    cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    match = re.search(r"\{.*\}", cleaned, re.DOTALL)
+    if not match:
+        raise ValueError(f"Extrator não retornou JSON: {text[:200]}")
+    return json.loads(match.group(0))
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(str(value).replace("$", "").replace(",", "").strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalize_rules(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Valida o JSON do LLM e descarta entradas sem valor numérico."""
+    rules: Dict[str, Any] = {
+        "category_limits": [],
+        "receipt_threshold": None,
+        "split_purchase": None,
+        "approval_levels": [],
+        "prohibited_items": [],
+    }
+
+    for item in raw.get("category_limits") or []:
+        amount = _to_float(item.get("max_amount"))
+        if amount is not None and item.get("category"):
+            rules["category_limits"].append(
+                {"category": str(item["category"]), "max_amount": amount, "citation": item.get("citation", "")}
+            )
+
+    receipt = raw.get("receipt_threshold") or {}
+    if _to_float(receipt.get("amount")) is not None:
+        rules["receipt_threshold"] = {
+            "amount": _to_float(receipt["amount"]),
+            "citation": receipt.get("citation", ""),
+        }
+
+    split = raw.get("split_purchase") or {}
+    if _to_float(split.get("threshold")) is not None:
+        rules["split_purchase"] = {
+            "threshold": _to_float(split["threshold"]),
+            "window_days": int(_to_float(split.get("window_days")) or 1),
+            # Sem categoria, qualquer semana cheia de despesas vira "fracionamento".
+            "same_category": bool(split.get("same_category", True)),
+            "citation": split.get("citation", ""),
+        }
+
+    for item in raw.get("approval_levels") or []:
+        amount = _to_float(item.get("min_amount"))
+        if amount is not None and item.get("approver"):
+            rules["approval_levels"].append(
+                {"min_amount": amount, "approver": str(item["approver"]), "citation": item.get("citation", "")}
+            )
+    rules["approval_levels"].sort(key=lambda r: r["min_amount"])
+
+    for item in raw.get("prohibited_items") or []:
+        if item.get("keyword"):
+            rules["prohibited_items"].append(
+                {"keyword": str(item["keyword"]), "citation": item.get("citation", "")}
+            )
+
+    return rules
+
+
+async def _extract_rules(policy_text: str, categories: List[str]) -> Dict[str, Any]:
+    print("📜 [Compliance] Compilando regras da política (1 chamada ao Gemini)...")
+    prompt = (
+        f"<statement_categories>{json.dumps(categories, ensure_ascii=False)}</statement_categories>\n"
+        f"<policy>\n{policy_text}\n</policy>"
+    )
+    content = types.Content(role="user", parts=[types.Part(text=prompt)])
+
+    async def _run_once(agent) -> str:
+        session_service = InMemorySessionService()
+        session_id = str(uuid.uuid4())
+        user_id = "compliance_rules_compiler"
+        await session_service.create_session(app_name="dunderai", user_id=user_id, session_id=session_id)
+        runner = Runner(agent=agent, app_name="dunderai", session_service=session_service)
+        with AgentRun(agent.name, entrypoint="compile_rules", model=str(getattr(agent.model, "model", agent.model))) as run:
+            text = await run_with_budget(
+                run,
+                runner.run_async(user_id=user_id, session_id=session_id, new_message=content),
+                budget_for(agent.name),
+            )
+        if run.budget_exceeded:
+            raise RuntimeError(text)
+        return text
+
+    def _accept(text: str) -> Optional[str]:
+        try:
+            _parse_json(text)
+        except ValueError:  # inclui json.JSONDecodeError
+            return "json_invalido"
+        return None
+
+    text = await run_escalating(rule_extractor_agent, _run_once, _accept)
+    return _normalize_rules(_parse_json(text))
+
+
+async def load_rules(categories: List[str], refresh: bool = False) -> Dict[str, Any]:
+    """Regras compiladas da política atual (memória -> disco -> Gemini)."""
+    policy = await load_policy(refresh=refresh)
+    if policy is None:
+        raise RuntimeError(f"Política de compliance indisponível ({POLICY_PATH})")
+    policy_text = policy.text
+    rules_hash = _rules_hash(policy_text, categories)
+
+    if not refresh and rules_hash in _rules_cache:
+        return _rules_cache[rules_hash]
+
+    path = _rules_path(rules_hash)
+    if not refresh and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            rules = json.load(f)
+    else:
+        rules = await _extract_rules(policy_text, categories)
+        rules.update({"policy_hash": rules_hash, "policy_path": POLICY_PATH, "schema_version": RULES_SCHEMA_VERSION})
+        os.makedirs(RULES_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(rules, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        print(f"💾 [Compliance] Regras salvas em {path}")
+
+    _rules_cache[rules_hash] = rules
+    return rules
+
+
+# ---------------------------------------------------------------------------
+# Avaliação vetorizada
+# ---------------------------------------------------------------------------
+
+
+def _find_column(df: pd.DataFrame, candidates: List[str]) -> Optional[str]:
+    return next((c for c in df.columns if c.lower() in candidates), None)
+
+
+def _norm_text(series: pd.Series) -> pd.Series:
+    return series.astype(str).map(
+        lambda s: unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode().casefold().strip()
+    )
+
+
+def _norm(value: str) -> str:
+    return unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode().casefold().strip()
+
+
+def _findings(df: pd.DataFrame, mask: pd.Series, rule: str, severity: str, detail, citation) -> pd.DataFrame:
+    hits = df.loc[mask, ["_id", "_date", "_employee", "_amount", "_category"]].copy()
+    hits["rule"] = rule
+    hits["severity"] = severity
+    hits["detail"] = detail[mask] if isinstance(detail, pd.Series) else detail
+    hits["citation"] = citation[mask] if isinstance(citation, pd.Series) else citation
+    return hits
+
+
+def split_windows(work: pd.DataFrame, keys: List[str], window_days: float) -> Tuple[pd.Series, pd.Series]:
+    """
+    Soma e nº de compras de cada linha na janela (data - window_days, data] do mesmo grupo.
+
+    Inclui as compras do mesmo instante (duas parcelas no mesmo dia contam
+    para as duas). Resultado alinhado por `work.index`; linhas sem chave ou
+    data ficam NaN.
+    """
+    rows = work.dropna(subset=keys + ["_date"])
+    if rows.empty:
+        empty = pd.Series(np.nan, index=work.index)
+        return empty, empty.copy()
+    group = rows.groupby(keys, sort=False).ngroup().to_numpy(dtype=np.int64)
+    seconds = rows["_date"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+    seconds = seconds - seconds.min()
+    window = int(window_days * 86400)
+    # Chave (grupo, instante) em um int64, com folga de uma janela entre os
+    # grupos: a janela de uma linha nunca alcança o grupo anterior.
+    key = group * (int(seconds.max()) + window + 1) + seconds
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    amount = rows["_amount"].to_numpy(dtype=float)[order]
+
+    left = np.searchsorted(key, key - window, side="right")
+    right = np.searchsorted(key, key, side="right")
+    total = np.concatenate([[0.0], np.cumsum(np.nan_to_num(amount))])
+    present = np.concatenate([[0], np.cumsum(~np.isnan(amount))])
+
+    ids = rows.index[order]
+    window_sum = pd.Series(total[right] - total[left], index=ids).reindex(work.index)
+    window_count = pd.Series(present[right] - present[left], index=ids, dtype=float).reindex(work.index)
+    return window_sum, window_count
+
+
+def evaluate_rules(df: pd.DataFrame, rules: Dict[str, Any]) -> Dict[str, Any]:
+    """Aplica as regras em todas as linhas de `df` (sem LLM)."""
+    cols = {
+        "_id": _find_column(df, ["id_transacao", "id", "transaction_id"]),
+        "_date": _find_column(df, ["data", "date"]),
+        "_employee": _find_column(df, ["funcionario", "employee", "nome"]),
+        "_amount": _find_column(df, ["valor", "amount", "value", "total"]),
+        "_category": _find_column(df, ["categoria", "category"]),
+    }
+    missing = [k for k in ("_amount", "_category") if cols[k] is None]
+    if missing:
+        return {"error": f"Colunas obrigatórias não encontradas no extrato: {missing}"}
+
+    work = pd.DataFrame({
+        key: (df[col] if col else pd.Series([None] * len(df), index=df.index))
+        for key, col in cols.items()
+    })
+    work["_amount"] = pd.to_numeric(work["_amount"], errors="coerce")
+    work["_date"] = pd.to_datetime(work["_date"], errors="coerce")
+    category_norm = _norm_text(work["_category"])
+    description_col = _find_column(df, ["descricao", "description"])
+    role_col = _find_column(df, ["cargo", "role"])
+
+    found: List[pd.DataFrame] = []
+
+    # 1. Limite por categoria ("*" = qualquer categoria)
+    for limit in rules.get("category_limits", []):
+        target = _norm(limit["category"])
+        in_scope = category_norm == target if target != "*" else pd.Series(True, index=work.index)
+        mask = in_scope & (work["_amount"] > limit["max_amount"])
+        found.append(_findings(
+            work, mask, "category_limit", "high",
+            "Acima do limite de $" + f"{limit['max_amount']:,.2f}" + " para " + limit["category"],
+            limit["citation"],
+        ))
+
+    # 2. Recibo obrigatório acima do valor
+    receipt = rules.get("receipt_threshold")
+    if receipt:
+        receipt_col = _find_column(df, ["recibo", "comprovante", "receipt", "nota_fiscal"])
+        above = work["_amount"] > receipt["amount"]
+        if receipt_col:
+            has_receipt = df[receipt_col].fillna("").astype(str).str.strip().str.lower()
+            mask = above & has_receipt.isin(["", "0", "false", "nao", "não", "n"])
+            found.append(_findings(work, mask, "receipt_missing", "high",
+                                   f"Sem recibo acima de ${receipt['amount']:,.2f}", receipt["citation"]))
+        else:
+            found.append(_findings(work, above, "receipt_required", "review",
+                                   f"Exige recibo (acima de ${receipt['amount']:,.2f}); extrato não informa",
+                                   receipt["citation"]))
+
+    # 3. Compra fracionada: parcelas abaixo do limite que somam acima dele na janela
+    split = rules.get("split_purchase")
+    if split and work["_employee"].notna().any() and work["_date"].notna().any():
+        keys = ["_employee", "_category"] if split.get("same_category", True) else ["_employee"]
+        window_sum, window_count = split_windows(work, keys, split["window_days"])
+
+        mask = (
+            (work["_amount"] <= split["threshold"])
+            & (window_sum > split["threshold"])
+            & (window_count >= 2)
+        )
+        detail = (
+            window_count.fillna(0).astype(int).astype(str)
+            + " compras somando $" + window_sum.round(2).astype(str)
+            + f" em {split['window_days']} dia(s) (limite ${split['threshold']:,.2f})"
+        )
+        found.append(_findings(work, mask, "split_purchase", "high", detail, split["citation"]))
+
+    # 4. Alçadas de aprovação
+    levels = rules.get("approval_levels", [])
+    if levels:
+        thresholds = np.array([lvl["min_amount"] for lvl in levels])
+        level_idx = np.searchsorted(thresholds, work["_amount"].fillna(0).to_numpy(), side="left") - 1
+        needs = level_idx >= 0
+        level = np.clip(level_idx, 0, None)
+        required = pd.Series(
+            np.where(needs, np.array([lvl["approver"] for lvl in levels], dtype=object)[level], ""),
+            index=work.index,
+        )
+        citation = pd.Series(np.array([lvl["citation"] for lvl in levels], dtype=object)[level], index=work.index)
+        needs = pd.Series(needs, index=work.index)
+        approval_col = _find_column(df, ["aprovador", "aprovado_por", "approver", "approved_by"])
+
+        if approval_col:
+            mask = needs & (_norm_text(df[approval_col].fillna("")) != _norm_text(required))
+            found.append(_findings(work, mask, "approval_missing", "high",
+                                   "Exige aprovação de " + required, citation))
+        else:
+            self_approval = pd.Series(False, index=work.index)
+            if role_col:
+                # Quem aprova não pode aprovar a própria despesa.
+                self_approval = needs & (_norm_text(df[role_col]) == _norm_text(required))
+                found.append(_findings(work, self_approval, "self_approval", "medium",
+                                       "Despesa do próprio aprovador (" + required + ")", citation))
+            found.append(_findings(work, needs & ~self_approval, "approval_required", "review",
+                                   "Exige aprovação de " + required + "; extrato não informa o aprovador",
+                                   citation))
+
+    # 5. Itens proibidos na descrição
+    if description_col is not None:
+        description = _norm_text(df[description_col])
+        for item in rules.get("prohibited_items", []):
+            mask = description.str.contains(re.escape(_norm(item["keyword"])), regex=True)
+            found.append(_findings(work, mask, "prohibited_item", "high",
+                                   f"Item proibido: {item['keyword']}", item["citation"]))
+
+    violations = pd.concat(found) if found else work.iloc[0:0]
+    if len(violations):
+        violations = violations.assign(_order=violations["severity"].map(_SEVERITY_ORDER)).sort_values(
+            ["_order", "_amount"], ascending=[True, False]
+        ).drop(columns="_order")
+
+    return {
+        "total_transactions": int(len(work)),
+        "flagged_transactions": int(violations["_id"].nunique()) if len(violations) else 0,
+        "by_rule": violations["rule"].value_counts().to_dict() if len(violations) else {},
+        "violations": violations,
+    }
+
+
+def _serialize(violations: pd.DataFrame, limit: int) -> List[Dict[str, Any]]:
+    out = violations.head(limit).rename(columns={
+        "_id": "id_transacao", "_date": "data", "_employee": "funcionario",
+        "_amount": "valor", "_category": "categoria",
+    })
+    out["data"] = out["data"].dt.strftime("%Y-%m-%d")
+    return json.loads(out.to_json(orient="records", force_ascii=False))
+
+
+@request_memoized
+async def scan_compliance_violations(max_results: int = 50) -> Dict[str, Any]:
+    """
+    Audita TODAS as transações do extrato contra as regras compiladas da política.
+
+    Args:
+        max_results: Quantas violações detalhar (as mais graves e maiores primeiro).
+
+    Returns:
+        Dict com contagem por regra e as violações com a citação da política.
+    """
+    print("⚖️ [Compliance] Varredura em lote do extrato...")
+    try:
+        df = await load_dataframe_async(_get_gs_path())
+        category_col = _find_column(df, ["categoria", "category"])
+        categories = sorted(df[category_col].dropna().astype(str).unique()) if category_col else []
+
+        rules = await load_rules(categories)
+        with span("compliance.scan", **{"compliance.rules_hash": rules.get("policy_hash", "")}) as s:
+            result = await _EVAL_POOL.run(evaluate_rules, df, rules)
+            if "error" in result:
+                return result
+            s.set_attribute("compliance.flagged", result["flagged_transactions"])
+
+        return {
+            "policy_hash": rules.get("policy_hash"),
+            "total_transactions": result["total_transactions"],
+            "flagged_transactions": result["flagged_transactions"],
+            "by_rule": result["by_rule"],
+            "violations": _serialize(result["violations"], max_results),
+        }
+    except Exception as e:
+        return {"error": f"Falha na varredura de compliance: {e}"}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Varredura de compliance em lote")
+    parser.add_argument("--refresh", action="store_true", help="recompila as regras da política")
+    parser.add_argument("--max-results", type=int, default=20)
+    args = parser.parse_args()
+
+    async def _main():
+        if args.refresh:
+            df = await load_dataframe_async(_get_gs_path())
+            await load_rules(sorted(df["categoria"].dropna().astype(str).unique()), refresh=True)
+        return await scan_compliance_violations(args.max_results)
+
+    print(json.dumps(asyncio.run(_main()), ensure_ascii=False, indent=2))
@@ -6,11 +6,14 @@ from dotenv import load_dotenv
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 root_path = os.path.abspath(os.path.join(current_dir, "..", ".."))
+src_path = os.path.abspath(os.path.join(current_dir, ".."))
 env_path = os.path.join(current_dir, "..", "..", ".env")
 load_dotenv(env_path)
 
 if root_path not in sys.path:
     sys.path.append(root_path)
+if src_path not in sys.path:
+    sys.path.append(src_path)
 
 from google.adk.agents.llm_agent import Agent
 from google.adk.tools.function_tool import FunctionTool
@@ -19,6 +22,9 @@ from google.adk.sessions import InMemorySessionService
 from google.genai import types
 import vertexai
 
+from observability import AgentRun
+from runtime import budget_for, model_for, rate_limit_after_model, rate_limit_before_model, request_memoized, resilient_model, run_with_budget
+
 try:
     from .tools import (
         download_csv_from_bucket,
@@ -287,14 +293,17 @@ t_execute = FunctionTool(execute_pandas_code)
 t_detect = FunctionTool(detect_fraud_patterns)
 
 root_agent = Agent(
-    model="gemini-2.5-flash",
+    model=resilient_model(model_for("finance_agent")),
     name="finance_agent",
+    before_model_callback=rate_limit_before_model,
+    after_model_callback=rate_limit_after_model,
     description="Especialista em Análise de Dados Bancários",
     instruction=SYSTEM_PROMPT,
     tools=[t_download, t_preview, t_stats, t_execute, t_detect],
 )
 
 
+@request_memoized
 async def run_finance_tool(query: str) -> str:
     print(f"[Finance Pandas] Iniciando análise: '{query}'")
 
@@ -319,18 +328,16 @@ async def run_finance_tool(query: str) -> str:
     """
     content = types.Content(role="user", parts=[types.Part(text=enhanced_query)])
 
-    final_text = "Sem dados financeiros encontrados."
-
     try:
-        async for event in runner.run_async(
-            user_id=user_id, session_id=session_id, new_message=content
-        ):
-            if event.content and event.content.parts:
-                text = event.content.parts[0].text
-                if text:
-                    final_text = text
-
-        return final_text
+        with AgentRun(root_agent.name, entrypoint="run_finance_tool") as run:
+            return await run_with_budget(
+                run,
+                runner.run_async(
+                    user_id=user_id, session_id=session_id, new_message=content
+                ),
+                budget_for(root_agent.name),
+                default_text="Sem dados financeiros encontrados.",
+            )
 
     except Exception as e:
         error_msg = f"Erro no Agente Pandas: {str(e)}"
@@ -0,0 +1,280 @@
+"""
+Cópia local do extrato do GCS com revalidação condicional.
+
+`gs://BUCKET/BLOB` fica em `cache/blobs/` junto com os metadados da versão
+baixada (generation, etag, md5/crc32c). Numa nova carga (cache miss do
+DataFrame, restart do pod) só os metadados do objeto são consultados: se a
+generation/etag não mudou, o CSV é lido do disco, sem download.
+
+Quando precisa baixar, o objeto vem em blocos (leituras por range) para um
+arquivo `.part`; um download interrompido continua de onde parou na mesma
+generation. O arquivo só substitui a cópia anterior (os.replace) depois de
+conferir tamanho e checksum (crc32c se `google-crc32c` estiver instalado,
+senão md5). Com o GCS fora do ar vale a última cópia local.
+
+Configuração via env:
+    BLOB_CACHE_ENABLED=1
+    BLOB_CACHE_DIR=<raiz>/cache/blobs
+    BLOB_CACHE_REVALIDATE_S=30       (confia na cópia sem consultar o GCS)
+    BLOB_CACHE_CHUNK_MB=8
+    BLOB_CACHE_SOURCE_DIR=/tmp/gcs   (stand-in local: gs://b/k -> /tmp/gcs/b/k)
+"""
+import base64
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import fsspec
+
+try:
+    import google_crc32c
+except ImportError:
+    google_crc32c = None
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
+if os.path.join(project_root, "src") not in sys.path:
+    sys.path.append(os.path.join(project_root, "src"))
+
+from observability import metrics, span
+from runtime import file_fingerprint
+
+try:
+    from .shared_frame import _exclusive
+except ImportError:
+    from shared_frame import _exclusive
+
+BLOB_CACHE_ENABLED = os.getenv("BLOB_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", os.path.join(project_root, "cache", "blobs"))
+BLOB_CACHE_REVALIDATE_S = float(os.getenv("BLOB_CACHE_REVALIDATE_S", "30"))
+BLOB_CACHE_CHUNK_BYTES = int(float(os.getenv("BLOB_CACHE_CHUNK_MB", "8")) * 1024 * 1024)
+BLOB_CACHE_SOURCE_DIR = os.getenv("BLOB_CACHE_SOURCE_DIR", "")
+
+# path -> (revalidar_em, metadados da cópia local)
+_validated: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_validated_lock = threading.Lock()
+# (arquivo, tamanho, mtime) -> md5 do stand-in local (o GCS já devolve pronto)
+_standin_md5: Dict[Tuple[str, int, int], str] = {}
+
+
+class ChecksumMismatch(IOError):
+    pass
+
+
+def is_remote(path: str) -> bool:
+    return path.startswith("gs://")
+
+
+def _source_url(path: str) -> str:
+    """gs://b/k, ou o arquivo equivalente em BLOB_CACHE_SOURCE_DIR."""
+    if BLOB_CACHE_SOURCE_DIR:
+        return os.path.join(BLOB_CACHE_SOURCE_DIR, path[len("gs://"):])
+    return path
+
+
+def local_path(path: str) -> str:
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:10]
+    return os.path.join(BLOB_CACHE_DIR, f"{digest}-{os.path.basename(path)}")
+
+
+def _meta_path(local: str) -> str:
+    return local + ".json"
+
+
+def _read_meta(local: str) -> Dict[str, Any]:
+    try:
+        with open(_meta_path(local), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _b64(digest: bytes) -> str:
+    return base64.b64encode(digest).decode("ascii")
+
+
+def _standin_checksum(url: str, st: os.stat_result) -> str:
+    key = (url, st.st_size, st.st_mtime_ns)
+    if key not in _standin_md5:
+        md5 = hashlib.md5()
+        with open(url, "rb") as f:
+            for block in iter(lambda: f.read(BLOB_CACHE_CHUNK_BYTES), b""):
+                md5.update(block)
+        _standin_md5[key] = _b64(md5.digest())
+    return _standin_md5[key]
+
+
+def stat_blob(path: str) -> Dict[str, Any]:
+    """Metadados do objeto (requisição só de metadados, sem baixar o conteúdo)."""
+    url = _source_url(path)
+    with span("blob.stat", **{"blob.path": path}):
+        if BLOB_CACHE_SOURCE_DIR:
+            st = os.stat(url)
+            return {
+                "path": path,
+                "size": st.st_size,
+                "generation": str(st.st_mtime_ns),
+                "etag": f"{st.st_size:x}-{st.st_mtime_ns:x}",
+                "md5Hash": _standin_checksum(url, st),
+            }
+        fs, _, (resolved,) = fsspec.get_fs_token_paths(url)
+        info = fs.info(resolved)
+    return {
+        "path": path,
+        "size": int(info.get("size") or 0),
+        "generation": str(info.get("generation") or ""),
+        "etag": info.get("etag") or "",
+        "md5Hash": info.get("md5Hash") or "",  # ausente em objetos compostos
+        "crc32c": info.get("crc32c") or "",
+    }
+
+
+def _same_version(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    if a.get("generation") and b.get("generation"):
+        return a["generation"] == b["generation"] and a.get("size") == b.get("size")
+    return bool(a.get("etag")) and a.get("etag") == b.get("etag")
+
+
+class _Digest:
+    """crc32c (preferido, é o que o GCS garante em todo objeto) ou md5."""
+
+    def __init__(self, meta: Dict[str, Any]):
+        if meta.get("crc32c") and google_crc32c is not None:
+            self.kind, self.expected, self._h = "crc32c", meta["crc32c"], google_crc32c.Checksum()
+        elif meta.get("md5Hash"):
+            self.kind, self.expected, self._h = "md5", meta["md5Hash"], hashlib.md5()
+        else:
+            self.kind, self.expected, self._h = "none", "", None
+
+    def update(self, block: bytes) -> None:
+        if self._h is not None:
+            self._h.update(block)
+
+    def verify(self) -> None:
+        if self._h is None:
+            return
+        actual = _b64(self._h.digest())
+        if actual != self.expected:
+            raise ChecksumMismatch(f"{self.kind} {actual} != {self.expected}")
+
+
+def _download(path: str, meta: Dict[str, Any], local: str) -> None:
+    """Baixa em blocos para <local>.<generation>.part (retoma se já existir) e troca atomicamente."""
+    url = _source_url(path)
+    part = f"{local}.{meta['generation'] or meta['etag']}.part"
+    digest = _Digest(meta)
+
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    if offset > meta["size"]:
+        os.remove(part)
+        offset = 0
+    if offset:
+        with open(part, "rb") as f:
+            for block in iter(lambda: f.read(BLOB_CACHE_CHUNK_BYTES), b""):
+                digest.update(block)
+
+    start = time.perf_counter()
+    with span("blob.download", **{"blob.path": path, "blob.size": meta["size"], "blob.resume_from": offset}):
+        with fsspec.open(url, "rb", block_size=BLOB_CACHE_CHUNK_BYTES) as src, open(part, "ab") as dst:
+            src.seek(offset)
+            while offset < meta["size"]:
+                block = src.read(min(BLOB_CACHE_CHUNK_BYTES, meta["size"] - offset))
+                if not block:
+                    break
+                dst.write(block)
+                digest.update(block)
+                offset += len(block)
+                metrics.BLOB_DOWNLOAD_BYTES.inc(len(block))
+
+    try:
+        if offset != meta["size"]:
+            raise ChecksumMismatch(f"tamanho {offset} != {meta['size']}")
+        digest.verify()
+    except ChecksumMismatch:
+        os.remove(part)  # conteúdo de outra versão ou corrompido: não retomar daqui
+        raise
+
+    os.replace(part, local)
+    for stale in glob.glob(f"{glob.escape(local)}.*.part"):  # restos de generations anteriores
+        os.remove(stale)
+    tmp_meta = f"{local}.{os.getpid()}.json.tmp"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump({**meta, "checksum": digest.kind, "downloaded_at": time.time()}, f)
+    os.replace(tmp_meta, _meta_path(local))
+    print(
+        f"📥 [BlobCache] {path} ({meta['size'] / 1024:.0f} KiB, generation {meta['generation'] or '-'}) "
+        f"baixado em {time.perf_counter() - start:.2f}s, {digest.kind} ok."
+    )
+
+
+def _remember(path: str, meta: Dict[str, Any]) -> None:
+    with _validated_lock:
+        _validated[path] = (time.monotonic() + BLOB_CACHE_REVALIDATE_S, meta)
+
+
+def _fresh(path: str) -> Optional[Dict[str, Any]]:
+    with _validated_lock:
+        cached = _validated.get(path)
+    return cached[1] if cached and cached[0] > time.monotonic() else None
+
+
+def local_blob(path: str) -> str:
+    """
+    Caminho local do objeto `path`, baixando só se a versão remota mudou.
+
+    Caminhos que não são gs:// (ou com o cache desligado) voltam inalterados.
+    """
+    if not BLOB_CACHE_ENABLED or not is_remote(path):
+        return path
+
+    local = local_path(path)
+    if _fresh(path) is not None and os.path.exists(local):
+        metrics.record_cache("blob", hit=True)
+        return local
+
+    os.makedirs(BLOB_CACHE_DIR, exist_ok=True)
+    with _exclusive(local):
+        cached = _read_meta(local) if os.path.exists(local) else {}
+        try:
+            remote = stat_blob(path)
+        except Exception as e:
+            if not cached:
+                raise
+            print(f"⚠️ [BlobCache] Sem acesso a {path} ({type(e).__name__}: {e}); usando a cópia local.")
+            metrics.record_cache("blob", hit=True)
+            return local
+
+        if cached and _same_version(cached, remote):
+            metrics.record_cache("blob", hit=True)
+        else:
+            metrics.record_cache("blob", hit=False)
+            try:
+                _download(path, remote, local)
+            except ChecksumMismatch as e:
+                # O objeto pode ter mudado durante o download: uma nova tentativa com os metadados atuais.
+                print(f"⚠️ [BlobCache] Download de {path} inválido ({e}); baixando de novo.")
+                remote = stat_blob(path)
+                _download(path, remote, local)
+        _remember(path, remote)
+    return local
+
+
+def blob_fingerprint(path: str) -> str:
+    """Mesmo formato de runtime.file_fingerprint, sem outra ida ao GCS se já revalidado."""
+    if not BLOB_CACHE_ENABLED or not is_remote(path):
+        return file_fingerprint(path)
+    meta = _fresh(path)
+    if meta is None:
+        try:
+            meta = stat_blob(path)
+        except Exception:
+            meta = _read_meta(local_path(path))
+            if not meta:
+                return f"{path}:?"
+    stamp = next((meta[k] for k in ("md5Hash", "generation", "etag") if meta.get(k)), "")
+    return f"{path}:{meta.get('size')}:{stamp}"
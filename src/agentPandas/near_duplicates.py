@@ -0,0 +1,228 @@
+"""
+Despesas reapresentadas com descrição ou valor levemente diferentes (MinHash + LSH).
+
+`df.duplicated(subset=[valor])` só pega valores idênticos. Aqui duas
+transações são candidatas quando:
+
+  - as descrições são parecidas: shingles da descrição normalizada (palavras +
+    trigramas de caracteres, sem stopwords nem as palavras da própria
+    categoria, que os lançamentos repetem em "Despesa de <categoria>") com
+    similaridade de Jaccard estimada por MinHash >= NEAR_DUP_THRESHOLD;
+  - os valores diferem no máximo NEAR_DUP_AMOUNT_TOL dólares (e passam de
+    NEAR_DUP_MIN_AMOUNT: cafezinho repetido não é reembolso em dobro);
+  - as datas estão a até NEAR_DUP_WINDOW_DAYS dias;
+  - é o mesmo funcionário (NEAR_DUP_SAME_EMPLOYEE=0 compara entre todos).
+
+Assinaturas e buckets do LSH são calculados por descrição distinta (um
+extrato com milhões de linhas repete poucas descrições). Cada linha entra
+em duas grades de valor e duas de data deslocadas em meia célula, o que
+garante que pares dentro da tolerância dividem pelo menos uma célula. Só
+linhas no mesmo bucket são comparadas, então nada é O(n²). O índice é montado
+uma vez por DataFrame (versão do extrato).
+
+Configuração via env:
+    NEAR_DUP_THRESHOLD=0.5
+    NEAR_DUP_PERMUTATIONS=64      (bandas x linhas do LSH: NEAR_DUP_BANDS=16)
+    NEAR_DUP_AMOUNT_TOL=0.5
+    NEAR_DUP_MIN_AMOUNT=50
+    NEAR_DUP_WINDOW_DAYS=3
+    NEAR_DUP_SAME_EMPLOYEE=1
+"""
+import os
+import re
+import sys
+import threading
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
+if os.path.join(project_root, "src") not in sys.path:
+    sys.path.append(os.path.join(project_root, "src"))
+
+from observability import metrics, span
+
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.5"))
+NEAR_DUP_PERMUTATIONS = int(os.getenv("NEAR_DUP_PERMUTATIONS", "64"))
+NEAR_DUP_BANDS = int(os.getenv("NEAR_DUP_BANDS", "16"))
+NEAR_DUP_AMOUNT_TOL = float(os.getenv("NEAR_DUP_AMOUNT_TOL", "0.5"))
+NEAR_DUP_MIN_AMOUNT = float(os.getenv("NEAR_DUP_MIN_AMOUNT", "50"))
+NEAR_DUP_WINDOW_DAYS = int(os.getenv("NEAR_DUP_WINDOW_DAYS", "3"))
+NEAR_DUP_SAME_EMPLOYEE = os.getenv("NEAR_DUP_SAME_EMPLOYEE", "1").lower() in ("1", "true", "yes")
+
+_STOPWORDS = {
+    "a", "o", "e", "de", "da", "do", "das", "dos", "com", "para", "em", "no", "na",
+    "despesa", "despesas", "the", "of", "and", "for", "expense", "expenses",
+}
+_SEED = 20080401
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().casefold()
+
+
+def _tokens(text: str) -> List[str]:
+    return [w for w in re.findall(r"[a-z0-9]+", _normalize(text)) if w not in _STOPWORDS]
+
+
+def shingles(description: str, category: str = "") -> np.ndarray:
+    """Hashes (uint64) das palavras + trigramas, sem as palavras da categoria."""
+    skip = set(_tokens(category))
+    words = [w for w in _tokens(description) if w not in skip] or _tokens(description)
+    grams = set(words)
+    for w in words:
+        grams.update(w[i:i + 3] for i in range(len(w) - 2))
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class NearDuplicateIndex:
+    """Assinaturas MinHash por descrição distinta + bandas do LSH."""
+
+    def __init__(self, df: pd.DataFrame, permutations: int = NEAR_DUP_PERMUTATIONS, bands: int = NEAR_DUP_BANDS):
+        if permutations % bands:
+            raise ValueError("NEAR_DUP_PERMUTATIONS precisa ser múltiplo de NEAR_DUP_BANDS")
+        self.df = df
+        self.bands = bands
+        rng = np.random.default_rng(_SEED)
+        # Hash universal multiply-shift: (a*x + b) mod 2^64 >> 32, a ímpar.
+        self._a = rng.integers(1, 2**63, size=permutations, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=permutations, dtype=np.uint64)
+
+        category = df["categoria"].astype(str) if "categoria" in df.columns else pd.Series("", index=df.index)
+        keys = pd.MultiIndex.from_arrays([df["descricao"].fillna("").astype(str), category])
+        self.desc_ids, uniques = keys.factorize()
+        self.descriptions = list(uniques)
+        self.signatures = np.vstack([self._minhash(shingles(d, c)) for d, c in self.descriptions]) \
+            if self.descriptions else np.empty((0, permutations), dtype=np.uint64)
+
+        self.amounts = pd.to_numeric(df["valor"], errors="coerce").to_numpy(dtype=float)
+        dates = pd.to_datetime(df["data"], errors="coerce").to_numpy(dtype="datetime64[D]")
+        self.days = np.where(np.isnat(dates), np.iinfo(np.int64).min, dates.astype(np.int64))
+        self.employees = (
+            pd.factorize(df["funcionario"])[0] if "funcionario" in df.columns else np.zeros(len(df), dtype=np.int64)
+        )
+
+    def _minhash(self, hashes: np.ndarray) -> np.ndarray:
+        if hashes.size == 0:
+            return np.full(self._a.shape, np.iinfo(np.uint64).max, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            mixed = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)
+        return mixed.min(axis=1)
+
+    def similar_descriptions(self, threshold: float = NEAR_DUP_THRESHOLD) -> pd.DataFrame:
+        """Pares (a <= b) de descrições distintas com Jaccard estimado >= threshold (inclui a == b)."""
+        n = len(self.descriptions)
+        rows = self.signatures.shape[1] // self.bands
+        candidates = set()
+        for band in range(self.bands):
+            block = np.ascontiguousarray(self.signatures[:, band * rows:(band + 1) * rows])
+            keys = pd.factorize(pd.Series([b.tobytes() for b in block]))[0] if n else np.empty(0, dtype=int)
+            order = np.argsort(keys, kind="stable")
+            bounds = np.flatnonzero(np.diff(keys[order])) + 1
+            for group in np.split(order, bounds):
+                if len(group) > 1:
+                    candidates.update(
+                        (int(min(a, b)), int(max(a, b))) for i, a in enumerate(group) for b in group[i + 1:]
+                    )
+
+        pairs = [(i, i, 1.0) for i in range(n)]
+        for a, b in candidates:
+            similarity = float(np.mean(self.signatures[a] == self.signatures[b]))
+            if similarity >= threshold:
+                pairs.append((a, b, similarity))
+        return pd.DataFrame(pairs, columns=["desc_a", "desc_b", "similarity"])
+
+    def _cells(self, amount_tol: float, window_days: int, min_amount: float) -> pd.DataFrame:
+        """Cada linha em 4 células (2 grades de valor x 2 de data, deslocadas meia célula)."""
+        width_amount = max(amount_tol, 1e-9) * 2
+        width_days = max(window_days, 0) * 2 + 1
+        valid = (self.amounts >= min_amount) & (self.days != np.iinfo(np.int64).min)
+        row = np.flatnonzero(valid)
+        frames = []
+        for shift_a in (0.0, 0.5):
+            for shift_d in (0.0, 0.5):
+                frames.append(pd.DataFrame({
+                    "row": row,
+                    "desc": self.desc_ids[row],
+                    "employee": self.employees[row],
+                    "grid": int(shift_a * 2) * 2 + int(shift_d * 2),
+                    "cell_amount": np.floor(self.amounts[row] / width_amount + shift_a).astype(np.int64),
+                    "cell_day": np.floor(self.days[row] / width_days + shift_d).astype(np.int64),
+                }))
+        return pd.concat(frames, ignore_index=True)
+
+    def find(
+        self,
+        threshold: float = NEAR_DUP_THRESHOLD,
+        amount_tol: float = NEAR_DUP_AMOUNT_TOL,
+        window_days: int = NEAR_DUP_WINDOW_DAYS,
+        min_amount: float = NEAR_DUP_MIN_AMOUNT,
+        same_employee: bool = NEAR_DUP_SAME_EMPLOYEE,
+    ) -> pd.DataFrame:
+        """Pares de linhas (row_a < row_b) quase duplicados, com similaridade e diferenças."""
+        desc_pairs = self.similar_descriptions(threshold)
+        cells = self._cells(amount_tol, window_days, min_amount)
+        on = ["grid", "cell_amount", "cell_day"] + (["employee"] if same_employee else [])
+        if not same_employee:
+            cells = cells.drop(columns="employee")
+
+        left = cells.rename(columns={"row": "row_a", "desc": "desc_a"}).merge(desc_pairs, on="desc_a")
+        both = left.merge(cells.rename(columns={"row": "row_b", "desc": "desc_b"}), on=on + ["desc_b"])
+        both = both[both["row_a"] != both["row_b"]]
+        a = np.minimum(both["row_a"].to_numpy(), both["row_b"].to_numpy())
+        b = np.maximum(both["row_a"].to_numpy(), both["row_b"].to_numpy())
+        pairs = pd.DataFrame({"row_a": a, "row_b": b, "similarity": both["similarity"].to_numpy()})
+        pairs = pairs.drop_duplicates(["row_a", "row_b"])
+
+        pairs["amount_diff"] = np.abs(self.amounts[pairs["row_a"]] - self.amounts[pairs["row_b"]]).round(2)
+        pairs["days_apart"] = np.abs(self.days[pairs["row_a"]] - self.days[pairs["row_b"]])
+        pairs = pairs[(pairs["amount_diff"] <= amount_tol) & (pairs["days_apart"] <= window_days)]
+        return pairs.sort_values(["similarity", "amount_diff", "days_apart"], ascending=[False, True, True],
+                                 ignore_index=True)
+
+
+_index_cache: Dict[str, Any] = {"df_id": None, "index": None, "pairs": None}
+_index_lock = threading.Lock()
+
+
+def _near_duplicate_pairs(df: pd.DataFrame) -> pd.DataFrame:
+    """Pares com a configuração padrão, calculados uma vez por DataFrame."""
+    with _index_lock:
+        if _index_cache["df_id"] == id(df) and _index_cache["pairs"] is not None:
+            metrics.record_cache("near_duplicates", hit=True)
+            return _index_cache["pairs"]
+
+    metrics.record_cache("near_duplicates", hit=False)
+    with span("dataframe.near_duplicates", **{"dataframe.rows": len(df)}) as s:
+        index = NearDuplicateIndex(df)
+        pairs = index.find()
+        s.set_attribute("near_duplicates.descriptions", len(index.descriptions))
+        s.set_attribute("near_duplicates.pairs", len(pairs))
+    with _index_lock:
+        _index_cache.update({"df_id": id(df), "index": index, "pairs": pairs})
+    return pairs
+
+
+def near_duplicate_claims(df: pd.DataFrame, max_results: int = 10) -> Optional[Dict[str, Any]]:
+    """Resumo para o relatório do detect_fraud_patterns (None sem as colunas necessárias)."""
+    if not {"descricao", "valor", "data"} <= set(df.columns):
+        return None
+    pairs = _near_duplicate_pairs(df)
+    columns = [c for c in ("id_transacao", "data", "funcionario", "descricao", "valor") if c in df.columns]
+    records = df[columns].astype(object).where(df[columns].notna(), None)
+
+    claims = []
+    for p in pairs.head(max_results).itertuples(index=False):
+        first, second = records.iloc[p.row_a].to_dict(), records.iloc[p.row_b].to_dict()
+        claims.append({
+            "transactions": [first, second],
+            "description_similarity": round(p.similarity, 2),
+            "amount_diff": float(p.amount_diff),
+            "days_apart": int(p.days_apart),
+            "same_employee": first.get("funcionario") == second.get("funcionario"),
+        })
+    return {"total_pairs": len(pairs), "pairs": claims}
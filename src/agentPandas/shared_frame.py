@@ -0,0 +1,172 @@
+"""
+Extrato de transações compartilhado entre processos (Arrow IPC mapeado em memória).
+
+O CSV é lido UMA vez e gravado em `cache/transactions-<hash da origem>.arrow`
+(formato Arrow IPC/Feather v2, sem compressão). Cada worker da API abre o
+arquivo com mmap e monta o DataFrame com colunas `pd.ArrowDtype` apontando
+direto para as páginas do arquivo: o sistema operacional mantém uma única
+cópia na page cache, então a memória não cresce com o número de workers e um
+worker novo começa a servir sem baixar nem parsear o CSV.
+
+Regravação é atômica (arquivo temporário + os.replace): quem já abriu segue
+lendo a versão antiga até reabrir; `refresh_shared_frame()` (ou
+`python -m agentPandas.shared_frame --refresh`) força a regravação e os
+demais workers percebem a troca pelo inode do arquivo.
+
+Configuração via env:
+    SHARED_DATAFRAME=1
+    SHARED_DATAFRAME_DIR=<raiz>/cache
+    SHARED_DATAFRAME_DTYPES=arrow | numpy   (numpy: copia para o processo)
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
+if os.path.join(project_root, "src") not in sys.path:
+    sys.path.append(os.path.join(project_root, "src"))
+
+from observability import metrics, span
+
+SHARED_DATAFRAME = os.getenv("SHARED_DATAFRAME", "1").lower() in ("1", "true", "yes") and ARROW_AVAILABLE
+SHARED_DATAFRAME_DIR = os.getenv("SHARED_DATAFRAME_DIR", os.path.join(project_root, "cache"))
+SHARED_DATAFRAME_DTYPES = os.getenv("SHARED_DATAFRAME_DTYPES", "arrow").lower()
+
+
+def arrow_path(source: str) -> str:
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:10]
+    return os.path.join(SHARED_DATAFRAME_DIR, f"transactions-{digest}.arrow")
+
+
+def _meta_path(path: str) -> str:
+    return path + ".json"
+
+
+def _read_meta(path: str) -> Dict[str, Any]:
+    try:
+        with open(_meta_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def file_identity(path: str) -> Optional[Tuple[int, int]]:
+    """(inode, mtime) do .arrow: muda quando outro processo troca o arquivo."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+@contextmanager
+def _exclusive(path: str):
+    """Só um processo materializa por vez; os outros esperam e reaproveitam."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a+") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def materialize(df: pd.DataFrame, path: str, source: str, fingerprint: str) -> None:
+    """Grava o DataFrame em Arrow IPC e troca o arquivo atomicamente."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with span("dataframe.materialize", **{"dataframe.arrow_path": path}) as s:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        meta = {"source": source, "fingerprint": fingerprint, "rows": table.num_rows, "created_at": time.time()}
+        with open(f"{tmp}.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+        os.replace(f"{tmp}.json", _meta_path(path))
+        s.set_attribute("dataframe.bytes", os.path.getsize(path))
+    print(f"📦 [SharedFrame] {table.num_rows} linhas materializadas em {path}")
+
+
+def open_shared(path: str) -> pd.DataFrame:
+    """DataFrame sobre o arquivo mapeado em memória (zero-copy com ArrowDtype)."""
+    with span("dataframe.mmap", **{"dataframe.arrow_path": path}) as s:
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        if SHARED_DATAFRAME_DTYPES == "numpy":
+            df = table.to_pandas()
+        else:
+            df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        s.set_attribute("dataframe.rows", len(df))
+    return df
+
+
+def load_shared(source: str, read_source: Callable[[str], pd.DataFrame], fingerprint: str) -> pd.DataFrame:
+    """
+    Abre o .arrow de `source` se ele corresponde ao `fingerprint` atual da
+    origem; senão lê a origem com `read_source` e materializa (uma vez, com lock).
+    """
+    path = arrow_path(source)
+    if _read_meta(path).get("fingerprint") == fingerprint and os.path.exists(path):
+        metrics.record_cache("dataframe_arrow", hit=True)
+        return open_shared(path)
+
+    with _exclusive(path):
+        # Outro processo pode ter materializado enquanto esperávamos o lock.
+        if _read_meta(path).get("fingerprint") == fingerprint and os.path.exists(path):
+            metrics.record_cache("dataframe_arrow", hit=True)
+            return open_shared(path)
+        metrics.record_cache("dataframe_arrow", hit=False)
+        materialize(read_source(source), path, source, fingerprint)
+    return open_shared(path)
+
+
+def refresh_shared_frame(source: str, read_source: Callable[[str], pd.DataFrame], fingerprint: str) -> str:
+    path = arrow_path(source)
+    with _exclusive(path):
+        materialize(read_source(source), path, source, fingerprint)
+    return path
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Materializa o extrato em cache/transactions-*.arrow")
+    parser.add_argument("--refresh", action="store_true", help="regrava mesmo se a origem não mudou")
+    args = parser.parse_args(argv)
+
+    from agentPandas.tools import _get_gs_path, _read_dataframe, source_fingerprint
+
+    source = _get_gs_path()
+    if args.refresh:
+        path = refresh_shared_frame(source, _read_dataframe, source_fingerprint(source))
+    else:
+        load_shared(source, _read_dataframe, source_fingerprint(source))
+        path = arrow_path(source)
+    meta = _read_meta(path)
+    print(f"✅ {path}: {meta.get('rows')} linhas, {os.path.getsize(path) / 1024:.0f} KiB, origem {meta.get('source')}")
+
+
+if __name__ == "__main__":
+    main()
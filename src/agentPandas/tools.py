@@ -1,21 +1,47 @@
 import pandas as pd
+import asyncio
+import concurrent.futures
 import os
 import sys
 import io
-from typing import Dict, Any
+import threading
+import time
+from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
+from observability import metrics, span
+from runtime import blocking_pool, request_memoized
+
+try:
+    from . import blob_cache, near_duplicates, shared_frame
+except ImportError:
+    import blob_cache
+    import near_duplicates
+    import shared_frame
+
 # Carrega variáveis
 current_dir = os.path.dirname(os.path.abspath(__file__))
 env_path = os.path.abspath(os.path.join(current_dir, "..", "..", ".env"))
 load_dotenv(env_path)
 
-# Cache global para armazenar o DataFrame
-_dataframe_cache: Dict[str, Any] = {"df": None, "path": None}
+# Cache global para armazenar o DataFrame ("arrow": identidade do .arrow compartilhado)
+_dataframe_cache: Dict[str, Any] = {"df": None, "path": None, "arrow": None}
+# Cargas em andamento por path: requisições simultâneas aguardam o mesmo future.
+_dataframe_inflight: Dict[str, concurrent.futures.Future] = {}
+_dataframe_lock = threading.Lock()
+_DATAFRAME_POOL = blocking_pool("dataframe", default_workers=2)
 
 
 def _get_gs_path() -> str:
-    """Helper interno para montar o caminho do GCS."""
+    """Helper interno para montar o caminho do GCS.
+
+    TRANSACTIONS_PATH (opcional) aponta para um CSV local/URL e tem
+    prioridade sobre o bucket - usado pelos benchmarks offline.
+    """
+    override = os.environ.get("TRANSACTIONS_PATH")
+    if override:
+        return override
+
     bucket = os.environ.get("BUCKET_NAME")
     blob = os.environ.get("BLOB_NAME")
 
@@ -25,41 +51,126 @@ def _get_gs_path() -> str:
     return f"gs://{bucket}/{blob}"
 
 
+def _read_dataframe(path: str) -> pd.DataFrame:
+    """Download + parse do CSV (bloqueante; roda no pool "dataframe")."""
+    print(f"Carregando DataFrame de {path}...")
+    start = time.perf_counter()
+    with span("dataframe.load", **{"dataframe.path": path}) as s:
+        # gs://: cópia em cache/blobs/, rebaixada só se a generation mudou.
+        df = pd.read_csv(blob_cache.local_blob(path), sep=None, engine="python")
+        df.columns = df.columns.str.strip()
+        s.set_attribute("dataframe.rows", len(df))
+    metrics.DATAFRAME_RELOADS.inc()
+    metrics.DATAFRAME_LOAD_DURATION.observe(time.perf_counter() - start)
+    return df
+
+
+def source_fingerprint(path: str) -> str:
+    """Tamanho + md5/etag/mtime da origem (muda quando o CSV é trocado)."""
+    return blob_cache.blob_fingerprint(path)
+
+
+def _load_and_publish(path: str) -> pd.DataFrame:
+    try:
+        if shared_frame.SHARED_DATAFRAME:
+            df = shared_frame.load_shared(path, _read_dataframe, source_fingerprint(path))
+            arrow = shared_frame.file_identity(shared_frame.arrow_path(path))
+        else:
+            df, arrow = _read_dataframe(path), None
+        with _dataframe_lock:
+            _dataframe_cache["df"] = df
+            _dataframe_cache["path"] = path
+            _dataframe_cache["arrow"] = arrow
+        return df
+    finally:
+        with _dataframe_lock:
+            _dataframe_inflight.pop(path, None)
+
+
+def _dataframe_future(path: str) -> concurrent.futures.Future:
+    """
+    Future com o DataFrame de `path` (single-flight).
+
+    Cache quente: future já resolvido. Carga em andamento: o mesmo future para
+    todos. Senão dispara UMA carga no pool, fora de qualquer event loop.
+    """
+    # Outro worker regravou o .arrow compartilhado: reabre (mmap, sem parse).
+    arrow_changed = (
+        shared_frame.SHARED_DATAFRAME
+        and _dataframe_cache["arrow"] is not None
+        and shared_frame.file_identity(shared_frame.arrow_path(path)) != _dataframe_cache["arrow"]
+    )
+    with _dataframe_lock:
+        if (
+            isinstance(_dataframe_cache["df"], pd.DataFrame)
+            and _dataframe_cache["path"] == path
+            and not arrow_changed
+        ):
+            metrics.record_cache("dataframe", hit=True)
+            done: concurrent.futures.Future = concurrent.futures.Future()
+            done.set_result(_dataframe_cache["df"])
+            return done
+
+        future = _dataframe_inflight.get(path)
+        metrics.record_cache("dataframe", hit=future is not None)
+        if future is None:
+            future = _DATAFRAME_POOL.submit(_load_and_publish, path)
+            _dataframe_inflight[path] = future
+        return future
+
+
 def _load_dataframe(path: str) -> pd.DataFrame:
-    """Carrega ou retorna o DataFrame do cache."""
-    global _dataframe_cache
+    """Carrega ou retorna o DataFrame do cache (versão síncrona)."""
+    return _dataframe_future(path).result()
 
-    if (
-        isinstance(_dataframe_cache["df"], pd.DataFrame)
-        and _dataframe_cache["path"] == path
-    ):
-        return _dataframe_cache["df"]
 
-    print(f"Carregando DataFrame de {path}...")
-    df = pd.read_csv(path, sep=None, engine="python")
-    df.columns = df.columns.str.strip()
+async def load_dataframe_async(path: str) -> pd.DataFrame:
+    """Carrega ou retorna o DataFrame do cache sem bloquear o event loop."""
+    # shield: cancelar quem espera (ex: prefetch) não cancela a carga compartilhada.
+    return await asyncio.shield(asyncio.wrap_future(_dataframe_future(path)))
 
-    _dataframe_cache["df"] = df
-    _dataframe_cache["path"] = path
 
-    return df
+def clear_dataframe_cache() -> None:
+    with _dataframe_lock:
+        _dataframe_cache.update({"df": None, "path": None, "arrow": None})
 
 
-def download_csv_from_bucket() -> Dict[str, Any]:
+def preload_dataframe() -> Optional[concurrent.futures.Future]:
+    """Dispara a carga em background (PRELOAD_DATAFRAME=1 no startup da API)."""
+    try:
+        path = _get_gs_path()
+    except ValueError as e:
+        print(f"⚠️ Preload do DataFrame ignorado: {e}")
+        return None
+
+    future = _dataframe_future(path)
+    future.add_done_callback(
+        lambda f: print(
+            f"❌ Preload do DataFrame falhou: {f.exception()}"
+            if f.exception()
+            else f"📦 DataFrame pré-carregado ({len(f.result())} linhas)."
+        )
+    )
+    return future
+
+
+@request_memoized
+async def download_csv_from_bucket() -> Dict[str, Any]:
     print("Verificando acesso ao arquivo na nuvem...")
     try:
         path = _get_gs_path()
-        _load_dataframe(path)
+        await load_dataframe_async(path)
         print(f"Conexão GCS estabelecida: {path}")
         return {"success": True, "local_path": path}
     except Exception as e:
         return {"success": False, "error": f"Erro ao conectar no Bucket: {str(e)}"}
 
 
-def load_csv_preview(local_path: str = "") -> Dict[str, Any]:
+@request_memoized
+async def load_csv_preview(local_path: str = "") -> Dict[str, Any]:
     path = local_path if local_path else _get_gs_path()
     try:
-        df = _load_dataframe(path)
+        df = await load_dataframe_async(path)
         preview_df = df.head(5)
         return {
             "columns": list(df.columns),
@@ -69,16 +180,18 @@ def load_csv_preview(local_path: str = "") -> Dict[str, Any]:
         return {"error": str(e)}
 
 
-def get_statistics(local_path: str = "") -> Dict[str, Any]:
+@request_memoized
+async def get_statistics(local_path: str = "") -> Dict[str, Any]:
     path = local_path if local_path else _get_gs_path()
     try:
-        df = _load_dataframe(path)
+        df = await load_dataframe_async(path)
         return {"statistics": df.describe(include="all").to_string()}
     except Exception as e:
         return {"error": str(e)}
 
 
-def execute_pandas_code(local_path: str, code: str) -> str:
+@request_memoized
+async def execute_pandas_code(local_path: str, code: str) -> str:
     """
     Executa código Pandas e SEMPRE retorna um resultado válido ou erro instrutivo.
 
@@ -90,7 +203,7 @@ def execute_pandas_code(local_path: str, code: str) -> str:
     path = local_path if local_path else _get_gs_path()
 
     try:
-        df = _load_dataframe(path)
+        df = await load_dataframe_async(path)
         local_scope = {"df": df, "pd": pd}
 
         print(f"[execute_pandas_code] Código recebido: {code[:100]}...")
@@ -163,10 +276,11 @@ def execute_pandas_code(local_path: str, code: str) -> str:
         return f"Erro no código: {str(e)}"
 
 
-def detect_fraud_patterns(local_path: str = "") -> Dict[str, Any]:
+@request_memoized
+async def detect_fraud_patterns(local_path: str = "") -> Dict[str, Any]:
     path = local_path if local_path else _get_gs_path()
     try:
-        df = _load_dataframe(path)
+        df = await load_dataframe_async(path)
 
         report: Dict[str, Any] = {}
 
@@ -192,6 +306,11 @@ def detect_fraud_patterns(local_path: str = "") -> Dict[str, Any]:
             else:
                 report["warning"] = f"Coluna {col_valor} não é numérica."
 
+        # Reapresentações com descrição/valor levemente diferentes (MinHash + LSH, índice por versão do extrato).
+        near = await _DATAFRAME_POOL.run(near_duplicates.near_duplicate_claims, df)
+        if near and near["total_pairs"]:
+            report["near_duplicate_claims"] = near
+
         return report if report else {"message": "Nenhum padrão óbvio detectado."}
 
     except Exception as e:
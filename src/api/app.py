@@ -1,7 +1,11 @@
 import sys
 import os
 import asyncio
-from flask import Flask, request, jsonify, send_file
+import json
+import time
+import uuid
+from dataclasses import asdict
+from flask import Flask, request, jsonify, send_file, g, Response
 from flask_cors import CORS
 from flasgger import Swagger
 from dotenv import load_dotenv
@@ -19,6 +23,16 @@ from google.adk.sessions import InMemorySessionService
 from google.genai import types
 from google.adk.agents.llm_agent import Agent
 
+from observability import AgentRun, metrics, setup_tracing, span
+from observability.runs import begin_request, end_request
+from observability.tracing import start_span, end_span
+from runtime import budget_for, data_version, request_scope, run_with_budget, semantic_cache, upstream, usable_answer
+from jobs import TERMINAL, JobFailed, job_queue
+from jobs.queue import JOBS_POLL_S
+from api.batch import parse_concurrency, parse_items, run_batch, stream_ndjson
+
+setup_tracing()
+
 try:
     from elevenlabs.client import ElevenLabs
     
@@ -46,6 +60,21 @@ except ImportError:
         print("⚠️ Orquestrador não encontrado.")
         orchestrator_agent = None
 
+try:
+    from orchestrator.router import route_fast_path
+except ImportError:
+    route_fast_path = None
+
+try:
+    from orchestrator.prefetch import speculative_prefetch
+except ImportError:
+    speculative_prefetch = None
+
+try:
+    from orchestrator import plans
+except ImportError:
+    plans = None
+
 try:
     from agentPandas.agent import root_agent as finance_agent
 except ImportError:
@@ -72,12 +101,19 @@ except ImportError:
     print("⚠️ Agente de Compliance não encontrado.")
     compliance_agent = None
 
+# Pré-carrega o CSV de transações em background (não atrasa o boot).
+if os.getenv("PRELOAD_DATAFRAME", "0").lower() in ("1", "true", "yes") and finance_agent:
+    from agentPandas.tools import preload_dataframe
+
+    preload_dataframe()
+
 
 app = Flask(__name__)
 
 CORS(
     app,
     resources={r"/api/*": {"origins": "*"}},
+    expose_headers=["X-Request-Id", "X-Semantic-Cache", "X-Intent-Route"],
     supports_credentials=False
 )
 
@@ -110,13 +146,231 @@ async def run_agent_session(target_agent: Agent, user_query: str, session_prefix
     runner = Runner(agent=target_agent, session_service=session_service, app_name=app_name)
     
     user_msg = types.Content(role="user", parts=[types.Part(text=user_query)])
-    final_response = ""
 
-    async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=user_msg):
-        if event.content and event.content.parts:
-            final_response = event.content.parts[0].text
-            
-    return final_response
+    with request_scope(), AgentRun(target_agent.name, entrypoint="run_agent_session", session_prefix=session_prefix) as run:
+        return await run_with_budget(
+            run,
+            runner.run_async(user_id=user_id, session_id=session_id, new_message=user_msg),
+            budget_for(target_agent.name),
+        )
+
+
+def _data_sources():
+    """Arquivos cujas versões invalidam as respostas em cache."""
+    paths = []
+    try:
+        from agentPandas.tools import _get_gs_path
+
+        paths.append(_get_gs_path())
+    except (ImportError, ValueError):
+        pass
+    try:
+        from RAGEmails.corpus import EMAILS_PATH
+
+        paths.append(EMAILS_PATH)
+    except ImportError:
+        pass
+    try:
+        from agentCompliance.policy import POLICY_PATH
+
+        paths.append(POLICY_PATH)
+    except ImportError:
+        pass
+    return paths
+
+
+def _cacheable(answer) -> bool:
+    return usable_answer(answer)
+
+
+async def orchestrate(target_agent: Agent, user_query: str, session_prefix: str):
+    """Roteador local primeiro (FLOW 3/4 claros vão direto ao especialista); senão o LLM do orquestrador.
+
+    Retorna (resposta, rota), com rota "fast:<intent>" ou "llm".
+    """
+    with request_scope():
+        if route_fast_path and user_query:
+            routed = await route_fast_path(user_query)
+            if routed:
+                return routed["response"], f"fast:{routed['intent']}"
+        if speculative_prefetch is None:
+            return await run_agent_session(target_agent, user_query, session_prefix), "llm"
+        # Dados da intenção provável carregam junto com o 1º turno do LLM (mesmo escopo de memo).
+        async with speculative_prefetch(user_query):
+            return await run_agent_session(target_agent, user_query, session_prefix), "llm"
+
+
+async def run_orchestrator_session(target_agent: Agent, user_query: str, session_prefix: str):
+    res, g.intent_route = await orchestrate(target_agent, user_query, session_prefix)
+    return res
+
+
+async def answer_with_cache(target_agent: Agent, user_query: str, session_prefix: str, run_session=None):
+    """run_agent_session com o cache semântico na frente (header X-Cache-Bypass pula a consulta)."""
+    run_session = run_session or run_agent_session
+    cache = semantic_cache() if target_agent and user_query else None
+    if cache is None:
+        return await run_session(target_agent, user_query, session_prefix)
+
+    bypass = request.headers.get("X-Cache-Bypass", "").lower() in ("1", "true", "yes")
+    try:
+        scope = (target_agent.name, await data_version(_data_sources()))
+        hit = None if bypass else await cache.lookup(scope, user_query)
+    except Exception as e:
+        print(f"⚠️ [SemanticCache] Consulta falhou, seguindo sem cache: {e}")
+        g.semantic_cache = "error"
+        return await run_session(target_agent, user_query, session_prefix)
+
+    if hit:
+        print(f"⚡ [SemanticCache] {target_agent.name}: reaproveitando '{hit.question}' (similaridade {hit.similarity:.3f})")
+        g.semantic_cache = "hit"
+        g.semantic_similarity = hit.similarity
+        return hit.answer
+
+    res = await run_session(target_agent, user_query, session_prefix)
+    g.semantic_cache = "bypass" if bypass else "miss"
+    if _cacheable(res):
+        try:
+            await cache.store(scope, user_query, res)
+        except Exception as e:
+            print(f"⚠️ [SemanticCache] Não foi possível gravar: {e}")
+    return res
+
+
+# --- Jobs assíncronos (auditorias longas fora da requisição HTTP) ---
+
+JOB_AGENTS = {
+    "orchestrator": (orchestrator_agent, "orch"),
+    "finance": (finance_agent, "finance"),
+    "profiler": (profiler_agent, "profiler"),
+    "compliance": (compliance_agent, "compliance"),
+}
+
+
+def _agent_job(target_agent: Agent, session_prefix: str, run_session=None):
+    run_session = run_session or run_agent_session
+
+    async def handler(payload):
+        return _job_answer(await run_session(target_agent, payload["message"], f"job_{session_prefix}"))
+
+    return handler
+
+
+def _job_answer(answer):
+    """Resposta de erro, indisponibilidade ou orçamento estourado (ver _cacheable) vira job failed."""
+    if not _cacheable(answer):
+        text = answer.strip() if isinstance(answer, str) else ""
+        raise JobFailed(text.splitlines()[0][:300] if text else "resposta vazia do agente", answer)
+    return answer
+
+
+async def _orchestrate_text(target_agent: Agent, user_query: str, session_prefix: str):
+    res, _ = await orchestrate(target_agent, user_query, session_prefix)
+    return res
+
+
+async def _compliance_scan_job(payload):
+    from agentCompliance.rules import scan_compliance_violations
+
+    res = await scan_compliance_violations(int(payload.get("max_results", 50)))
+    if "error" in res:
+        raise RuntimeError(res["error"])
+    return res
+
+
+async def _plan_job(payload):
+    plan = plans.load_plan(payload.get("plan", ""))
+    if plan is None:
+        raise LookupError(f"Plano '{payload.get('plan')}' não encontrado")
+    result = await plans.replay_plan(plan, payload.get("params"), run_agent_session)
+    try:
+        _job_answer(result.get("response"))
+    except JobFailed as e:
+        raise JobFailed(str(e), result) from None
+    return result
+
+
+JOB_HANDLERS = {kind: _agent_job(agent, prefix) for kind, (agent, prefix) in JOB_AGENTS.items() if agent}
+if orchestrator_agent:
+    JOB_HANDLERS["orchestrator"] = _agent_job(orchestrator_agent, "orch", _orchestrate_text)
+JOB_HANDLERS["compliance_scan"] = _compliance_scan_job
+if plans and orchestrator_agent:
+    JOB_HANDLERS["plan"] = _plan_job
+
+if os.getenv("JOBS_ENABLED", "1").lower() in ("1", "true", "yes"):
+    jobs = job_queue(JOB_HANDLERS)
+else:
+    jobs = None
+
+
+# --- Lote de perguntas para os especialistas ---
+
+BATCH_AGENTS = {
+    "finance": (finance_agent, "finance"),
+    "compliance": (compliance_agent, "compliance"),
+    "profiler": (profiler_agent, "profiler"),
+}
+
+
+async def _run_batch_item(agent_key: str, message: str) -> str:
+    target_agent, session_prefix = BATCH_AGENTS[agent_key]
+    return await run_agent_session(target_agent, message, f"batch_{session_prefix}")
+
+
+def _make_batch(items, concurrency: int):
+    def make():
+        if any(item.agent == "finance" for item in items):
+            from agentPandas.tools import preload_dataframe
+
+            preload_dataframe()  # uma carga para o lote todo (single-flight)
+        return run_batch(items, _run_batch_item, concurrency, accept=_cacheable)
+
+    return make
+
+
+def _job_events(job_id: str):
+    """Stream SSE: um evento `status` a cada mudança e `done` no estado final."""
+    last_state = None
+    last_ping = time.monotonic()
+    while True:
+        job = jobs.store.get(job_id)
+        if job is None:
+            yield f"event: error\ndata: {json.dumps({'error': 'job não encontrado'})}\n\n"
+            return
+        state = (job.status, job.cancel_requested)
+        if state != last_state:
+            last_state = state
+            event = "done" if job.done else "status"
+            yield f"event: {event}\ndata: {json.dumps(job.to_dict(), ensure_ascii=False, default=str)}\n\n"
+        if job.done:
+            return
+        if time.monotonic() - last_ping > 15:
+            last_ping = time.monotonic()
+            yield ": ping\n\n"
+        jobs.wait_for_change(JOBS_POLL_S)
+
+
+def text_to_speech(text: str, **options) -> bytes:
+    """Gera o MP3 do Michael via ElevenLabs (com span de tracing, métricas, prazo e retries)."""
+
+    def convert(timeout: float) -> bytes:
+        # Retries ficam com o upstream "elevenlabs"; o SDK só aplica o prazo.
+        audio_generator = eleven_client.text_to_speech.convert(
+            text=text,
+            voice_id=MICHAEL_VOICE_ID,
+            model_id="eleven_multilingual_v2",
+            request_options={"timeout_in_seconds": max(1, int(timeout)), "max_retries": 0},
+            **options
+        )
+        return b"".join(audio_generator)
+
+    start = time.perf_counter()
+    with span("tts.convert", **{"tts.chars": len(text), "tts.voice_id": MICHAEL_VOICE_ID}) as s:
+        audio_bytes = upstream("elevenlabs").call_sync(convert, op="convert")
+        s.set_attribute("tts.bytes", len(audio_bytes))
+    metrics.TTS_DURATION.observe(time.perf_counter() - start)
+    metrics.TTS_BYTES.inc(len(audio_bytes))
+    return audio_bytes
 
 
 @app.before_request
@@ -124,6 +378,56 @@ def allow_options():
     if request.method == "OPTIONS":
         return "", 200
 
+
+@app.before_request
+def open_request_span():
+    g.request_id = request.headers.get("X-Request-Id") or uuid.uuid4().hex
+    g.request_start = time.perf_counter()
+    g.request_totals_token = begin_request()
+    g.request_span, g.request_token = start_span(
+        f"request {request.method} {request.path}",
+        **{
+            "http.method": request.method,
+            "http.route": request.url_rule.rule if request.url_rule else request.path,
+            "request.id": g.request_id,
+        },
+    )
+
+
+@app.after_request
+def tag_request_id(response):
+    if getattr(g, "request_id", None):
+        response.headers["X-Request-Id"] = g.request_id
+        g.request_status = response.status_code
+    if getattr(g, "semantic_cache", None):
+        response.headers["X-Semantic-Cache"] = g.semantic_cache
+        if getattr(g, "semantic_similarity", None) is not None:
+            response.headers["X-Semantic-Cache-Similarity"] = f"{g.semantic_similarity:.3f}"
+    if getattr(g, "intent_route", None):
+        response.headers["X-Intent-Route"] = g.intent_route
+    return response
+
+
+@app.teardown_request
+def close_request_span(exc):
+    request_span = g.pop("request_span", None)
+    if request_span is None:
+        return
+
+    status = g.pop("request_status", 500 if exc else None)
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    totals = end_request(g.pop("request_totals_token"))
+
+    if route != "/metrics":
+        metrics.HTTP_REQUEST_DURATION.labels(
+            route=route, method=request.method, status=str(status)
+        ).observe(time.perf_counter() - g.pop("request_start"))
+        if totals["llm_turns"] or totals["tool_calls"]:
+            metrics.REQUEST_LLM_TURNS.labels(route=route).observe(totals["llm_turns"])
+            metrics.REQUEST_TOOL_CALLS.labels(route=route).observe(totals["tool_calls"])
+
+    end_span(request_span, g.pop("request_token", None), **{"http.status_code": status})
+
 @app.route('/health', methods=['GET'])
 def health():
     """
@@ -144,9 +448,28 @@ def health():
             "profiler": profiler_agent is not None,
             "michael_persona": chat_with_michael is not None,
             "compliance": compliance_agent is not None
-        }
+        },
+        "jobs": jobs.store.counts() if jobs else None
     })
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Métricas no formato Prometheus
+    ---
+    tags:
+      - System
+    responses:
+      200:
+        description: Latência por rota, agentes em andamento, turnos/tool calls, tokens, RAG, cache e TTS
+      501:
+        description: prometheus_client não instalado
+    """
+    if not metrics.PROMETHEUS_AVAILABLE:
+        return jsonify({"error": "prometheus_client não instalado"}), 501
+    payload, content_type = metrics.render()
+    return Response(payload, content_type=content_type)
+
 @app.route('/api/michael/experience', methods=['POST'])
 async def michael_full_experience():
     """
@@ -187,14 +510,7 @@ async def michael_full_experience():
 
         print(f"🔊 [TTS] Gerando áudio...")
         
-        audio_generator = eleven_client.text_to_speech.convert(
-            text=michael_response,
-            voice_id=MICHAEL_VOICE_ID,
-            model_id="eleven_multilingual_v2",
-            output_format="mp3_44100_128"
-        )
-        
-        audio_bytes = b"".join(audio_generator)
+        audio_bytes = text_to_speech(michael_response, output_format="mp3_44100_128")
         audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
 
         return jsonify({
@@ -217,6 +533,11 @@ async def chat_orchestrator():
       - Agents
     description: Acessa a lógica central.
     parameters:
+      - name: X-Cache-Bypass
+        in: header
+        type: string
+        required: false
+        description: "1 para ignorar o cache semântico e rodar o agente"
       - name: body
         in: body
         required: true
@@ -231,7 +552,7 @@ async def chat_orchestrator():
         description: Resposta técnica
     """
     data = request.get_json()
-    res = await run_agent_session(orchestrator_agent, data.get('message'), "orch")
+    res = await answer_with_cache(orchestrator_agent, data.get('message'), "orch", run_orchestrator_session)
     return jsonify({"success": True, "response": res})
 
 @app.route('/api/finance', methods=['POST'])
@@ -242,6 +563,11 @@ async def chat_finance():
     tags:
       - Agents
     parameters:
+      - name: X-Cache-Bypass
+        in: header
+        type: string
+        required: false
+        description: "1 para ignorar o cache semântico e rodar o agente"
       - name: body
         in: body
         required: true
@@ -256,7 +582,7 @@ async def chat_finance():
         description: Resposta do analista de dados
     """
     data = request.get_json()
-    res = await run_agent_session(finance_agent, data.get('message'), "finance")
+    res = await answer_with_cache(finance_agent, data.get('message'), "finance")
     return jsonify({"success": True, "text": res})
 
 @app.route('/api/profiler', methods=['POST'])
@@ -267,6 +593,11 @@ async def chat_profiler():
     tags:
       - Agents
     parameters:
+      - name: X-Cache-Bypass
+        in: header
+        type: string
+        required: false
+        description: "1 para ignorar o cache semântico e rodar o agente"
       - name: body
         in: body
         required: true
@@ -281,7 +612,7 @@ async def chat_profiler():
         description: Evidências encontradas
     """
     data = request.get_json()
-    res = await run_agent_session(profiler_agent, data.get('message'), "profiler")
+    res = await answer_with_cache(profiler_agent, data.get('message'), "profiler")
     return jsonify({"success": True, "text": res})
 
 @app.route('/api/compliance', methods=['POST'])
@@ -293,6 +624,11 @@ async def chat_compliance():
       - Agents
     description: Verifica violações de regras baseadas no manual de política.
     parameters:
+      - name: X-Cache-Bypass
+        in: header
+        type: string
+        required: false
+        description: "1 para ignorar o cache semântico e rodar o agente"
       - name: body
         in: body
         required: true
@@ -307,9 +643,430 @@ async def chat_compliance():
         description: Veredito de compliance (JSON)
     """
     data = request.get_json()
-    res = await run_agent_session(compliance_agent, data.get('message'), "compliance")
+    res = await answer_with_cache(compliance_agent, data.get('message'), "compliance")
     return jsonify({"success": True, "text": res})
 
+@app.route('/api/compliance/scan', methods=['GET'])
+async def compliance_scan():
+    """
+    Varredura de compliance do extrato inteiro (regras compiladas da política)
+    ---
+    tags:
+      - Agents
+    description: Avalia todas as transações contra as regras extraídas de politica_compliance.txt (cache em disco, sem LLM por transação).
+    parameters:
+      - name: max_results
+        in: query
+        type: integer
+        default: 50
+    responses:
+      200:
+        description: Violações por regra, com citação da política
+    """
+    from agentCompliance.rules import scan_compliance_violations
+
+    with request_scope():
+        res = await scan_compliance_violations(request.args.get('max_results', 50, type=int))
+    if "error" in res:
+        return jsonify({"success": False, "error": res["error"]}), 500
+    return jsonify({"success": True, **res})
+
+@app.route('/api/batch', methods=['POST'])
+async def batch_questions():
+    """
+    Lote de perguntas para os especialistas (Financeiro, Compliance, Profiler)
+    ---
+    tags:
+      - Agents
+    description: "Executa as perguntas em paralelo (limite configurável), com o DataFrame e o cache de ferramentas/busca compartilhados no lote. Por padrão responde em NDJSON: uma linha por pergunta assim que termina, e uma linha final com `done: true`."
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            agent:
+              type: string
+              enum: [finance, compliance, profiler]
+              description: "Agente padrão para 'questions'"
+            questions:
+              type: array
+              items:
+                type: string
+              example: ["Total gasto em restaurantes?", "Quem mais gastou em viagens?"]
+            items:
+              type: array
+              description: "Alternativa com agente por item: [{agent, message, id}]"
+              items:
+                type: object
+            concurrency:
+              type: integer
+              description: "Máximo de perguntas simultâneas (até BATCH_MAX_CONCURRENCY)"
+            stream:
+              type: boolean
+              default: true
+              description: "false para receber todos os resultados num único JSON"
+    responses:
+      200:
+        description: Resultados (NDJSON em streaming ou JSON)
+      400:
+        description: Lote inválido
+    """
+    data = request.get_json() or {}
+    available = [name for name, (agent, _) in BATCH_AGENTS.items() if agent]
+    try:
+        items = parse_items(data, available)
+        concurrency = parse_concurrency(data.get("concurrency"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    make_batch = _make_batch(items, concurrency)
+    print(f"📦 [Batch] {len(items)} pergunta(s), até {concurrency} em paralelo.")
+
+    if data.get("stream", True):
+        return Response(
+            stream_ndjson(make_batch),
+            mimetype="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    start = time.perf_counter()
+    results = sorted([r async for r in make_batch()], key=lambda r: r["index"])
+    return jsonify({
+        "success": True,
+        "total": len(results),
+        "failed": sum(not r["success"] for r in results),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        "results": results,
+    })
+
+@app.route('/api/plans', methods=['POST'])
+async def record_plan():
+    """
+    Gravar um plano do orquestrador (template de tool calls)
+    ---
+    tags:
+      - Plans
+    description: "Roda o orquestrador normalmente (LLM planejando) e salva as tool calls, passo a passo, como template. Os valores de 'params' encontrados na mensagem e nos argumentos viram {{nome}}."
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            name:
+              type: string
+              example: "gastos_funcionario"
+            message:
+              type: string
+              example: "Investigue os gastos de Ryan Howard e verifique a política."
+            params:
+              type: object
+              example: {"employee": "Ryan Howard"}
+    responses:
+      201:
+        description: Plano gravado e resposta da execução que o gerou
+      400:
+        description: Pedido inválido ou execução sem tool calls
+    """
+    if plans is None or orchestrator_agent is None:
+        return jsonify({"error": "Planos indisponíveis (orquestrador não carregado)"}), 503
+    data = request.get_json() or {}
+    if not data.get("name") or not data.get("message"):
+        return jsonify({"error": "Campos 'name' e 'message' são obrigatórios"}), 400
+    try:
+        plan, res = await plans.record_plan(data["name"], data["message"], data.get("params") or {}, run_agent_session)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"success": True, "plan": asdict(plan), "response": res}), 201, {"Location": f"/api/plans/{plan.name}"}
+
+@app.route('/api/plans', methods=['GET'])
+def list_plans():
+    """
+    Listar planos gravados
+    ---
+    tags:
+      - Plans
+    responses:
+      200:
+        description: Planos (nome, pergunta, parâmetros, passos)
+    """
+    if plans is None:
+        return jsonify({"error": "Planos indisponíveis"}), 503
+    return jsonify({"success": True, "plans": [p.summary() for p in plans.list_plans()]})
+
+@app.route('/api/plans/<name>', methods=['GET'])
+def get_plan(name):
+    """
+    Template completo de um plano
+    ---
+    tags:
+      - Plans
+    parameters:
+      - name: name
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Plano
+      404:
+        description: Plano não encontrado
+    """
+    if plans is None:
+        return jsonify({"error": "Planos indisponíveis"}), 503
+    try:
+        plan = plans.load_plan(name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if plan is None:
+        return jsonify({"error": "Plano não encontrado"}), 404
+    return jsonify({"success": True, "plan": asdict(plan)})
+
+@app.route('/api/plans/<name>/run', methods=['POST'])
+async def run_plan(name):
+    """
+    Repetir um plano gravado (sem turnos de planejamento)
+    ---
+    tags:
+      - Plans
+    description: "Executa as tool calls do template direto (as de um mesmo passo em paralelo) e chama o LLM uma única vez para a resposta final."
+    parameters:
+      - name: name
+        in: path
+        type: string
+        required: true
+      - name: body
+        in: body
+        required: false
+        schema:
+          type: object
+          properties:
+            params:
+              type: object
+              example: {"employee": "Dwight Schrute"}
+    responses:
+      200:
+        description: Resposta final e tempos por tool call
+      400:
+        description: Parâmetro faltando
+      404:
+        description: Plano não encontrado
+    """
+    if plans is None or orchestrator_agent is None:
+        return jsonify({"error": "Planos indisponíveis (orquestrador não carregado)"}), 503
+    data = request.get_json(silent=True) or {}
+    try:
+        plan = plans.load_plan(name)
+        if plan is None:
+            return jsonify({"error": "Plano não encontrado"}), 404
+        res = await plans.replay_plan(plan, data.get("params"), run_agent_session)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"success": True, **res})
+
+@app.route('/api/plans/<name>', methods=['DELETE'])
+def delete_plan(name):
+    """
+    Apagar um plano
+    ---
+    tags:
+      - Plans
+    parameters:
+      - name: name
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Plano apagado
+      404:
+        description: Plano não encontrado
+    """
+    if plans is None:
+        return jsonify({"error": "Planos indisponíveis"}), 503
+    try:
+        deleted = plans.delete_plan(name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not deleted:
+        return jsonify({"error": "Plano não encontrado"}), 404
+    return jsonify({"success": True})
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Enfileirar uma auditoria (job assíncrono)
+    ---
+    tags:
+      - Jobs
+    description: Retorna o id na hora; o job roda num pool limitado de workers. Acompanhe em GET /api/jobs/{job_id} ou /api/jobs/{job_id}/events (SSE).
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            kind:
+              type: string
+              enum: [orchestrator, finance, profiler, compliance, compliance_scan, plan]
+              default: orchestrator
+            message:
+              type: string
+              example: "Faça uma varredura geral por fraudes."
+            priority:
+              type: string
+              example: "high"
+              description: "high, normal, low ou 0-9 (menor roda antes)"
+            max_results:
+              type: integer
+              description: "Só para compliance_scan"
+            plan:
+              type: string
+              description: "Só para plan: nome do plano gravado"
+            params:
+              type: object
+              description: "Só para plan: valores dos {{parâmetros}}"
+    responses:
+      202:
+        description: Job na fila
+      400:
+        description: Pedido inválido
+      503:
+        description: Jobs desativados (JOBS_ENABLED=0)
+    """
+    if jobs is None:
+        return jsonify({"error": "Jobs desativados (JOBS_ENABLED=0)"}), 503
+    data = request.get_json() or {}
+    kind = data.get("kind", "orchestrator")
+    payload = {k: data[k] for k in ("message", "max_results", "plan", "params") if data.get(k) is not None}
+    if kind in JOB_AGENTS and not payload.get("message"):
+        return jsonify({"error": "Campo 'message' é obrigatório"}), 400
+    if kind == "plan" and not payload.get("plan"):
+        return jsonify({"error": "Campo 'plan' é obrigatório"}), 400
+    try:
+        job = jobs.submit(kind, payload, data.get("priority"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"success": True, "job": job.to_dict()}), 202, {"Location": f"/api/jobs/{job.id}"}
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """
+    Listar jobs recentes
+    ---
+    tags:
+      - Jobs
+    parameters:
+      - name: status
+        in: query
+        type: string
+        enum: [queued, running, succeeded, failed, cancelled]
+      - name: limit
+        in: query
+        type: integer
+        default: 50
+    responses:
+      200:
+        description: Jobs (mais recentes primeiro) e contagem por estado
+    """
+    if jobs is None:
+        return jsonify({"error": "Jobs desativados (JOBS_ENABLED=0)"}), 503
+    listed = jobs.store.list(request.args.get("status"), min(request.args.get("limit", 50, type=int), 500))
+    return jsonify({"success": True, "counts": jobs.store.counts(), "jobs": [j.to_dict() for j in listed]})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Estado e resultado de um job
+    ---
+    tags:
+      - Jobs
+    parameters:
+      - name: job_id
+        in: path
+        type: string
+        required: true
+      - name: wait
+        in: query
+        type: number
+        description: "Segundos para aguardar o fim do job (long-poll, máx. 60)"
+    responses:
+      200:
+        description: Job (result preenchido quando status=succeeded)
+      404:
+        description: Job não encontrado
+    """
+    if jobs is None:
+        return jsonify({"error": "Jobs desativados (JOBS_ENABLED=0)"}), 503
+    deadline = time.monotonic() + min(request.args.get("wait", 0, type=float), 60)
+    job = jobs.store.get(job_id)
+    while job is not None and not job.done and time.monotonic() < deadline:
+        jobs.wait_for_change(min(JOBS_POLL_S, max(0.0, deadline - time.monotonic())))
+        job = jobs.store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado"}), 404
+    return jsonify({"success": True, "job": job.to_dict()})
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Assinar a conclusão de um job (Server-Sent Events)
+    ---
+    tags:
+      - Jobs
+    produces:
+      - text/event-stream
+    parameters:
+      - name: job_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: "Eventos `status` a cada mudança e `done` com o job final"
+    """
+    if jobs is None:
+        return jsonify({"error": "Jobs desativados (JOBS_ENABLED=0)"}), 503
+    return Response(
+        _job_events(job_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """
+    Cancelar um job
+    ---
+    tags:
+      - Jobs
+    description: Na fila é cancelado na hora; em execução, o worker interrompe o agente.
+    parameters:
+      - name: job_id
+        in: path
+        type: string
+        required: true
+    responses:
+      202:
+        description: Cancelamento pedido (ou já cancelado)
+      404:
+        description: Job não encontrado
+      409:
+        description: Job já terminou
+    """
+    if jobs is None:
+        return jsonify({"error": "Jobs desativados (JOBS_ENABLED=0)"}), 503
+    job = jobs.store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado"}), 404
+    if job.status in TERMINAL:
+        return jsonify({"error": f"Job já terminou ({job.status})", "job": job.to_dict()}), 409
+    job = jobs.cancel(job_id)
+    return jsonify({"success": True, "job": job.to_dict()}), 202
+
 @app.route('/api/speak', methods=['POST'])
 def speak_michael_direct():
     """
@@ -335,12 +1092,7 @@ def speak_michael_direct():
     text = data.get('text', '')
     
     try:
-        audio_gen = eleven_client.text_to_speech.convert(
-            text=text,
-            voice_id=MICHAEL_VOICE_ID,
-            model_id="eleven_multilingual_v2"
-        )
-        audio_bytes = b"".join(audio_gen)
+        audio_bytes = text_to_speech(text)
         return send_file(io.BytesIO(audio_bytes), mimetype="audio/mpeg", download_name="michael.mp3")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,195 @@
+"""
+Lote de perguntas para os agentes especialistas (POST /api/batch).
+
+As perguntas rodam em paralelo (no máximo BATCH_MAX_CONCURRENCY por vez)
+dentro de UM `request_scope()`: o DataFrame é carregado uma vez e chamadas
+repetidas de ferramenta (embeddings, buscas no RAG, estatísticas) são
+reaproveitadas entre os itens. Perguntas idênticas para o mesmo agente
+rodam uma vez só. Os resultados saem na ordem em que terminam. As chamadas
+ao Gemini do lote usam a prioridade `batch` do limitador global
+(runtime/ratelimit.py).
+
+Configuração via env:
+    BATCH_MAX_CONCURRENCY=8
+    BATCH_MAX_ITEMS=100
+    BATCH_ITEM_TIMEOUT_S=180
+"""
+import asyncio
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from observability import metrics, span
+from runtime import llm_priority, request_scope
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_ITEM_TIMEOUT_S = float(os.getenv("BATCH_ITEM_TIMEOUT_S", "180"))
+
+RunItem = Callable[[str, str], Awaitable[str]]
+
+
+@dataclass
+class BatchItem:
+    index: int
+    id: Any
+    agent: str
+    message: str
+
+
+def parse_items(data: Dict[str, Any], agents: List[str]) -> List[BatchItem]:
+    """
+    Aceita {"agent": "finance", "questions": ["...", ...]} e/ou
+    {"items": [{"agent": "compliance", "message": "...", "id": "q1"}, ...]}.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Corpo deve ser um objeto JSON")
+    questions, extra = data.get("questions") or [], data.get("items") or []
+    if not isinstance(questions, list) or not isinstance(extra, list):
+        raise ValueError("'questions' e 'items' devem ser listas")
+    default_agent = data.get("agent")
+    raw: List[Any] = [{"message": q} for q in questions] + extra
+    if not raw:
+        raise ValueError("Envie 'questions' (lista de perguntas) ou 'items'")
+    if len(raw) > BATCH_MAX_ITEMS:
+        raise ValueError(f"Lote com {len(raw)} perguntas; máximo {BATCH_MAX_ITEMS}")
+
+    items = []
+    for i, entry in enumerate(raw):
+        if isinstance(entry, str):
+            entry = {"message": entry}
+        if not isinstance(entry, dict):
+            raise ValueError(f"Item {i}: esperado objeto {{agent, message, id}} ou texto")
+        agent = entry.get("agent") or default_agent
+        message = entry.get("message") or ""
+        if not isinstance(message, str):
+            raise ValueError(f"Item {i}: 'message' deve ser texto")
+        message = message.strip()
+        if agent not in agents:
+            raise ValueError(f"Item {i}: agente '{agent}' inválido (use {', '.join(agents)})")
+        if not message:
+            raise ValueError(f"Item {i}: 'message' vazia")
+        items.append(BatchItem(index=i, id=entry.get("id", i), agent=agent, message=message))
+    return items
+
+
+def parse_concurrency(value: Any) -> int:
+    """'concurrency' do pedido (ausente = BATCH_MAX_CONCURRENCY); fora de 1..máximo é erro."""
+    if value is None:
+        return BATCH_MAX_CONCURRENCY
+    if isinstance(value, bool) or not (isinstance(value, int) or (isinstance(value, str) and value.strip().isdigit())):
+        raise ValueError("'concurrency' deve ser um inteiro")
+    value = int(value)
+    if not 1 <= value <= BATCH_MAX_CONCURRENCY:
+        raise ValueError(f"'concurrency' deve estar entre 1 e {BATCH_MAX_CONCURRENCY}")
+    return value
+
+
+async def run_batch(
+    items: List[BatchItem],
+    run_item: RunItem,
+    concurrency: int = BATCH_MAX_CONCURRENCY,
+    accept: Optional[Callable[[str], bool]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Executa o lote e gera um resultado por item, na ordem de conclusão.
+
+    `accept` decide se o texto devolvido conta como resposta; recusado (erro,
+    indisponibilidade, orçamento estourado), o item sai com success=False, o
+    texto e um `error` com a primeira linha.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    shared: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    async def execute(agent: str, message: str) -> str:
+        async with semaphore:
+            with span("batch.item", **{"batch.agent": agent}):
+                return await asyncio.wait_for(run_item(agent, message), BATCH_ITEM_TIMEOUT_S)
+
+    async def answer(item: BatchItem) -> Dict[str, Any]:
+        key = (item.agent, " ".join(item.message.casefold().split()))
+        deduplicated = key in shared
+        if not deduplicated:
+            shared[key] = asyncio.ensure_future(execute(item.agent, item.message))
+        start = time.perf_counter()
+        result = {"index": item.index, "id": item.id, "agent": item.agent, "question": item.message}
+        try:
+            text = await asyncio.shield(shared[key])
+            if accept is None or accept(text):
+                result.update(success=True, text=text)
+            else:
+                first = text.strip().splitlines()[0][:300] if isinstance(text, str) and text.strip() else ""
+                result.update(success=False, text=text, error=first or "resposta vazia do agente")
+        except asyncio.TimeoutError:
+            result.update(success=False, error=f"tempo limite do item ({BATCH_ITEM_TIMEOUT_S:.0f}s)")
+        except Exception as e:
+            result.update(success=False, error=str(e))
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        if deduplicated:
+            result["deduplicated"] = True
+        metrics.BATCH_ITEMS.labels(agent=item.agent, status="ok" if result["success"] else "error").inc()
+        return result
+
+    # Lote cede a vez ao chat no limitador global do Gemini.
+    with request_scope(), llm_priority("batch"), \
+            span("batch.run", **{"batch.items": len(items), "batch.concurrency": concurrency}):
+        tasks = [asyncio.ensure_future(answer(item)) for item in items]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in [*tasks, *shared.values()]:
+                task.cancel()
+
+
+def stream_ndjson(make_batch: Callable[[], AsyncIterator[Dict[str, Any]]]) -> Iterator[str]:
+    """
+    Ponte para resposta streaming do Flask: o lote roda num event loop em outra
+    thread e cada resultado vira uma linha JSON assim que fica pronto. Se o
+    cliente desconectar, o lote é cancelado.
+    """
+    lines: "queue.Queue[Optional[str]]" = queue.Queue()
+    state: Dict[str, Any] = {}
+
+    async def produce() -> None:
+        state["task"] = asyncio.current_task()
+        state["loop"] = asyncio.get_running_loop()
+        start = time.perf_counter()
+        total = failed = 0
+        try:
+            async for result in make_batch():
+                total += 1
+                failed += not result["success"]
+                lines.put(json.dumps(result, ensure_ascii=False) + "\n")
+            summary = {"done": True, "total": total, "failed": failed}
+        except Exception as e:
+            summary = {"done": True, "total": total, "failed": failed, "error": str(e)}
+        summary["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        lines.put(json.dumps(summary, ensure_ascii=False) + "\n")
+
+    def run() -> None:
+        try:
+            asyncio.run(produce())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            lines.put(None)
+
+    # Copia o contexto (span da requisição) para a thread do lote.
+    ctx = contextvars.copy_context()
+    threading.Thread(target=ctx.run, args=(run,), name="dunder-batch", daemon=True).start()
+    try:
+        while True:
+            line = lines.get()
+            if line is None:
+                return
+            yield line
+    finally:
+        loop, task = state.get("loop"), state.get("task")
+        if loop is not None and task is not None and not task.done():
+            loop.call_soon_threadsafe(task.cancel)
@@ -0,0 +1 @@
+"""Benchmarks offline da Dunder AI (replay de respostas do Gemini e do Vertex RAG)."""
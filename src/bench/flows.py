@@ -0,0 +1,281 @@
+"""
+Benchmark end-to-end dos FLOWs do orquestrador, offline.
+
+Reproduz respostas gravadas do Gemini e do Vertex RAG (bench/fixtures/*.json)
+e mede só o NOSSO código: tempo por estágio, nº de chamadas de ferramenta,
+turnos de LLM e alocações (tracemalloc) de cada FLOW.
+
+Uso (a partir de src/):
+    python -m bench.flows                      # todos os FLOWs, replay
+    python -m bench.flows --flow 1 --repeat 10
+    python -m bench.flows --json reports/bench.json
+    python -m bench.flows --record             # grava de novo (precisa de credenciais)
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Dict, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+project_root = os.path.abspath(os.path.join(src_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from bench.replay import Cassette, install_rag, wrap_agent_model
+
+FIXTURES_DIR = os.path.join(current_dir, "fixtures")
+
+FLOWS: Dict[str, Dict[str, str]] = {
+    "1": {
+        "name": "FLOW 1 - Fraud Triangle",
+        "query": "Investigue se alguém planejou desviar dinheiro da empresa.",
+    },
+    # Cassette ROTEIRIZADO à mão (não gravado do Gemini): o orquestrador começa
+    # por link_email_evidence e para ali. Mede o custo do nosso código nesse
+    # caminho; não é evidência de quantos turnos o modelo real economiza.
+    # `--record` troca pelo que o modelo decidir de fato.
+    "1-linked": {
+        "name": "FLOW 1 - Fraud Triangle (link_email_evidence, roteirizado)",
+        "query": "Investigue se alguém planejou desviar dinheiro da empresa.",
+    },
+    "2": {
+        "name": "FLOW 2 - Social Investigation",
+        "query": "Existe algum plano contra o Toby nos e-mails?",
+    },
+    "3": {
+        "name": "FLOW 3 - Simple Rule Check",
+        "query": "Posso gastar $1000 sem recibo?",
+    },
+    # Modo padrão do compliance (política no prompt, sem make_embedding). Os
+    # demais cassettes foram gravados com o compliance via retrieval. Cassette
+    # roteirizado até ser regravado com `--record --flow 3-context`.
+    "3-context": {
+        "name": "FLOW 3 - Simple Rule Check (política no contexto, roteirizado)",
+        "query": "Posso gastar $1000 sem recibo?",
+        "policy_mode": "context",
+    },
+    "4": {
+        "name": "FLOW 4 - General Audit",
+        "query": "Faça uma varredura geral por anomalias.",
+    },
+}
+
+
+class StageStats:
+    """Acumula tempo de parede e contagem por estágio."""
+
+    def __init__(self):
+        self.wall: Dict[str, float] = defaultdict(float)
+        self.count: Dict[str, int] = defaultdict(int)
+
+    def add(self, stage: str, elapsed: float) -> None:
+        self.wall[stage] += elapsed
+        self.count[stage] += 1
+
+    def total(self, prefix: str) -> int:
+        return sum(c for s, c in self.count.items() if s.startswith(prefix))
+
+
+def _cassette_path(flow_id: str) -> str:
+    return os.path.join(FIXTURES_DIR, f"flow{flow_id}.json")
+
+
+def _instrument_tools(agents: List[Any], stats_ref: Dict[str, StageStats]) -> None:
+    """Mede cada tool call via callbacks do ADK (before/after_tool_callback)."""
+    started: Dict[str, float] = {}
+
+    def before_tool(tool, args, tool_context):
+        started[tool_context.function_call_id] = time.perf_counter()
+        return None
+
+    def after_tool(tool, args, tool_context, tool_response):
+        start = started.pop(tool_context.function_call_id, None)
+        if start is not None:
+            stats_ref["current"].add(f"tool:{tool.name}", time.perf_counter() - start)
+        return None
+
+    for agent in agents:
+        _prepend_callback(agent, "before_tool_callback", before_tool)
+        _prepend_callback(agent, "after_tool_callback", after_tool)
+
+
+def _prepend_callback(agent, attr: str, callback) -> None:
+    """Coloca o callback do harness na frente dos já configurados no Agent."""
+    existing = getattr(agent, attr)
+    if existing is None:
+        chain = []
+    elif isinstance(existing, list):
+        chain = list(existing)
+    else:
+        chain = [existing]
+    setattr(agent, attr, [callback] + chain)
+
+
+def _instrument_dataframe(stats_ref: Dict[str, StageStats]) -> None:
+    import agentPandas.tools as pandas_tools
+
+    original = pandas_tools.load_dataframe_async
+
+    async def timed_load(path):
+        start = time.perf_counter()
+        try:
+            return await original(path)
+        finally:
+            stats_ref["current"].add("dataframe", time.perf_counter() - start)
+
+    pandas_tools.load_dataframe_async = timed_load
+
+
+async def _run_flow(run_agent_session, orchestrator, query: str) -> str:
+    return await run_agent_session(orchestrator, query, "bench")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--flow", default="all", help="1, 1-linked, 2, 3, 3-context, 4 ou all")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cold", action="store_true", help="limpa o cache do DataFrame a cada execução")
+    parser.add_argument("--record", action="store_true", help="grava cassettes com Gemini/Vertex reais")
+    parser.add_argument("--json", dest="json_out", default="", help="salva o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    flow_ids = sorted(FLOWS) if args.flow == "all" else [args.flow]
+
+    os.environ.setdefault(
+        "TRANSACTIONS_PATH",
+        os.path.join(project_root, "assets", "transacoes_bancarias.csv"),
+    )
+    os.environ.setdefault("EMAILS_PATH", os.path.join(FIXTURES_DIR, "emails.txt"))
+    os.environ.setdefault("RAG_SOURCE_PREFIX", FIXTURES_DIR + os.sep)
+    os.environ.setdefault("COMPLIANCE_POLICY_PATH", os.path.join(FIXTURES_DIR, "politica_compliance.txt"))
+    # Cassettes gravados com o compliance via retrieval (turno de make_embedding),
+    # exceto os FLOWs com "policy_mode" próprio.
+    os.environ.setdefault("COMPLIANCE_POLICY_MODE", "retrieval")
+
+    stats_ref: Dict[str, StageStats] = {"current": StageStats()}
+    hook = lambda stage, elapsed: stats_ref["current"].add(stage, elapsed)
+
+    # Precisa acontecer antes de qualquer import de agente.
+    rag_stub = install_rag(Cassette(), record=args.record, hook=hook)
+
+    from api.app import run_agent_session
+    import agentCompliance.agent as compliance_module
+    import agentCompliance.policy as policy_module
+    import agentPandas.tools as pandas_tools
+    from agentPandas.agent import root_agent as finance_agent
+    from agentCompliance.agent import agent_compliance
+    from RAGEmails.agent import root_agent as profiler_agent
+    from orchestrator.agent import root_agent as orchestrator
+
+    agents = [orchestrator, finance_agent, agent_compliance, profiler_agent]
+    _instrument_tools(agents, stats_ref)
+    _instrument_dataframe(stats_ref)
+
+    report: Dict[str, Any] = {}
+    repeat = 1 if args.record else max(1, args.repeat)
+
+    for flow_id in flow_ids:
+        flow = FLOWS[flow_id]
+        runs: List[Dict[str, Any]] = []
+
+        for _ in range(repeat):
+            cassette = Cassette() if args.record else Cassette.load(_cassette_path(flow_id))
+            rag_stub.cassette = cassette
+            for agent in agents:
+                wrap_agent_model(agent, cassette, args.record, hook)
+            policy_module.COMPLIANCE_POLICY_MODE = flow.get("policy_mode", os.environ["COMPLIANCE_POLICY_MODE"])
+            # As cópias com a política no prompt herdam o modelo do agent_compliance.
+            compliance_module._context_agents.clear()
+            if args.cold:
+                pandas_tools.clear_dataframe_cache()
+
+            stats = StageStats()
+            stats_ref["current"] = stats
+
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            start = time.perf_counter()
+            answer = asyncio.run(_run_flow(run_agent_session, orchestrator, flow["query"]))
+            wall = time.perf_counter() - start
+            after, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            runs.append(
+                {
+                    "wall_s": wall,
+                    "stages": {
+                        s: {"wall_s": stats.wall[s], "count": stats.count[s]}
+                        for s in sorted(stats.wall)
+                    },
+                    "tool_calls": stats.total("tool:"),
+                    "llm_turns": stats.total("llm:"),
+                    "alloc_peak_kib": (peak - before) / 1024,
+                    "alloc_net_kib": (after - before) / 1024,
+                    "answer_chars": len(answer or ""),
+                }
+            )
+
+            if args.record:
+                cassette.save(_cassette_path(flow_id))
+                print(f"💾 Cassette gravado em {_cassette_path(flow_id)}")
+
+        report[flow_id] = _summarize(flow["name"], runs)
+        _print_flow(report[flow_id])
+
+    if args.json_out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json_out)), exist_ok=True)
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 Relatório salvo em {args.json_out}")
+
+    return 0
+
+
+def _summarize(name: str, runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    walls = [r["wall_s"] for r in runs]
+    stages: Dict[str, Dict[str, float]] = {}
+    for stage in sorted({s for r in runs for s in r["stages"]}):
+        values = [r["stages"].get(stage, {"wall_s": 0.0, "count": 0}) for r in runs]
+        stages[stage] = {
+            "median_ms": statistics.median(v["wall_s"] for v in values) * 1000,
+            "count": values[-1]["count"],
+        }
+    return {
+        "name": name,
+        "runs": len(runs),
+        "first_ms": walls[0] * 1000,
+        "median_ms": statistics.median(walls) * 1000,
+        "max_ms": max(walls) * 1000,
+        "tool_calls": runs[-1]["tool_calls"],
+        "llm_turns": runs[-1]["llm_turns"],
+        "alloc_peak_kib": max(r["alloc_peak_kib"] for r in runs),
+        "alloc_net_kib": statistics.median(r["alloc_net_kib"] for r in runs),
+        "stages": stages,
+    }
+
+
+def _print_flow(summary: Dict[str, Any]) -> None:
+    print(f"\n=== {summary['name']} ({summary['runs']} execuções) ===")
+    print(
+        f"wall: first {summary['first_ms']:.1f} ms | median {summary['median_ms']:.1f} ms"
+        f" | max {summary['max_ms']:.1f} ms"
+    )
+    print(
+        f"llm turns: {summary['llm_turns']} | tool calls: {summary['tool_calls']}"
+        f" | alloc peak {summary['alloc_peak_kib']:.0f} KiB"
+        f" | alloc net {summary['alloc_net_kib']:.0f} KiB"
+    )
+    for stage, values in summary["stages"].items():
+        print(f"  {stage:<40} {values['median_ms']:>9.2f} ms  x{values['count']}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
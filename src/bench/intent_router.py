@@ -0,0 +1,110 @@
+"""
+Benchmark do roteador local de intenção (offline).
+
+Classifica as consultas rotuladas de bench/fixtures/intent_eval.json (fora
+dos exemplos de treino em orchestrator/intents.json) e reporta:
+
+  - acurácia da intenção;
+  - cobertura da rota rápida (FLOW 3/4 resolvidos sem o orquestrador LLM);
+  - rotas rápidas erradas (deviam ir para o LLM ou para outro FLOW);
+  - latência do roteador (média / p95);
+  - turnos de LLM economizados, contados nos cassettes dos FLOWs
+    (bench/fixtures/flowN.json), e o tempo estimado com `--llm-turn-ms`.
+
+Uso (a partir de src/):
+    python -m bench.intent_router
+    python -m bench.intent_router --min-confidence 0.9 --llm-turn-ms 1500 --verbose
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from bench.replay import Cassette, install_rag
+
+FIXTURES_DIR = os.path.join(current_dir, "fixtures")
+
+# intent -> (cassette do FLOW, agentes que a rota rápida ainda executa)
+FAST_PATH_COST = {
+    "rule_check": ("flow3.json", {"agent_compliance"}),
+    "general_audit": ("flow4.json", {"profiler_agent"}),  # passo 2: padrões vão ao profiler
+}
+
+
+def turns_saved() -> Dict[str, int]:
+    """Turnos de LLM do FLOW completo menos os que a rota rápida ainda gasta."""
+    saved = {}
+    for intent, (fixture, kept_agents) in FAST_PATH_COST.items():
+        cassette = Cassette.load(os.path.join(FIXTURES_DIR, fixture))
+        saved[intent] = sum(len(turns) for agent, turns in cassette.llm.items() if agent not in kept_agents)
+    return saved
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-confidence", type=float, help="sobrescreve ROUTER_MIN_CONFIDENCE")
+    parser.add_argument("--llm-turn-ms", type=float, default=1200, help="latência média de um turno do Gemini")
+    parser.add_argument("--repeat", type=int, default=50, help="classificações por consulta (latência)")
+    parser.add_argument("--verbose", action="store_true", help="mostra cada consulta")
+    args = parser.parse_args(argv)
+
+    install_rag(Cassette(), record=False)  # orchestrator/__init__ importa os agentes
+    from orchestrator.router import ROUTER_MIN_CONFIDENCE, IntentRouter
+
+    router = IntentRouter.from_file(
+        min_confidence=args.min_confidence if args.min_confidence is not None else ROUTER_MIN_CONFIDENCE
+    )
+    with open(os.path.join(FIXTURES_DIR, "intent_eval.json"), encoding="utf-8") as f:
+        queries = json.load(f)["queries"]
+
+    saved_turns = turns_saved()
+    correct = fast = fast_wrong = fast_eligible = fast_hits = 0
+    turns_total = 0
+    latencies: List[float] = []
+
+    for item in queries:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            route = router.classify(item["query"])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        expected = item["intent"]
+        correct += expected != "other" and route.intent == expected
+        eligible = expected in router.fast_intents
+        fast_eligible += eligible
+        if route.fast_path:
+            fast += 1
+            if route.intent == expected:
+                fast_hits += 1
+                turns_total += saved_turns.get(route.intent, 0)
+            else:
+                fast_wrong += 1
+        if args.verbose:
+            mark = "⚡" if route.fast_path else "🧠"
+            ok = "✅" if (route.fast_path and route.intent == expected) or (not route.fast_path and not eligible) else "❌"
+            print(f"{ok} {mark} {route.intent:>14} {route.confidence:.2f} (esperado {expected:>14}) {item['query']}"
+                  + (f"  [{route.reason}]" if route.reason else ""))
+
+    in_scope = [q for q in queries if q["intent"] != "other"]
+    latencies.sort()
+    print(f"\n🧭 Roteador de intenção — {len(queries)} consultas ({len(in_scope)} com FLOW definido)\n")
+    print(f"acurácia da intenção (com FLOW): {correct / len(in_scope):.0%}")
+    print(f"rota rápida: {fast} consultas | cobertura {fast_hits}/{fast_eligible} elegíveis | erradas {fast_wrong}")
+    print(f"latência do roteador: média {statistics.mean(latencies):.3f} ms | p95 {latencies[int(0.95 * (len(latencies) - 1))]:.3f} ms")
+    print(
+        f"turnos de LLM economizados: {turns_total} "
+        f"({', '.join(f'{k}: {v}/consulta' for k, v in saved_turns.items())}) "
+        f"≈ {turns_total * args.llm_turn_ms / 1000:.1f}s a {args.llm_turn_ms:.0f} ms/turno"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark da detecção de despesas quase duplicadas (agentPandas/near_duplicates.py).
+
+Monta um extrato sintético de `--rows` linhas a partir de
+assets/transacoes_bancarias.csv (datas espalhadas em `--days` dias, valores
+com ruído) e planta `--planted` reapresentações: mesma despesa do mesmo
+funcionário com a descrição reescrita e o valor mudado em centavos. Mede o
+tempo do índice MinHash + LSH, o recall das plantadas e compara com a
+comparação par a par (O(n²)) numa amostra.
+
+Uso (a partir de src/):
+    python -m bench.near_duplicates
+    python -m bench.near_duplicates --rows 1000000 --planted 500 --naive-rows 3000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+project_root = os.path.abspath(os.path.join(src_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from agentPandas.near_duplicates import NEAR_DUP_AMOUNT_TOL, NEAR_DUP_THRESHOLD, NEAR_DUP_WINDOW_DAYS, NearDuplicateIndex, shingles
+
+_REWRITES = [
+    lambda d: d.lower(),
+    lambda d: d.replace("(", "").replace(")", "").replace("/", " e "),
+    lambda d: d.replace(" - ", " ").replace("Despesa de ", ""),
+    lambda d: " ".join(reversed(d.split(" - "))),
+    lambda d: d + " (reembolso)",
+]
+
+
+def _synthetic(rows: int, days: int, planted: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(os.path.join(project_root, "assets", "transacoes_bancarias.csv"), sep=None, engine="python")
+    df = base.iloc[rng.integers(0, len(base), rows)].reset_index(drop=True)
+    df["data"] = (np.datetime64("2008-01-01") + rng.integers(0, days, rows)).astype(str)
+    df["valor"] = (df["valor"] * rng.uniform(0.5, 1.5, rows)).round(2)
+    df["id_transacao"] = [f"TX_{i}" for i in range(rows)]
+
+    random.seed(seed)
+    originals = df[df["valor"] >= 60].sample(planted, random_state=seed)
+    copies = originals.copy()
+    copies["descricao"] = [random.choice(_REWRITES)(d) for d in copies["descricao"]]
+    copies["valor"] = (copies["valor"] + rng.choice([-0.3, -0.1, 0.05, 0.2], planted)).round(2)
+    copies["data"] = (pd.to_datetime(copies["data"]) + pd.to_timedelta(rng.integers(0, 3, planted), unit="D")).dt.strftime("%Y-%m-%d")
+    copies["id_transacao"] = [f"{t}_DUP" for t in originals["id_transacao"]]
+    return pd.concat([df, copies], ignore_index=True)
+
+
+def _naive(df: pd.DataFrame) -> int:
+    """Todos os pares, Jaccard exato dos mesmos shingles."""
+    sets: List[set] = [set(shingles(d, c).tolist()) for d, c in zip(df["descricao"], df["categoria"])]
+    amounts, days = df["valor"].to_numpy(), pd.to_datetime(df["data"]).to_numpy(dtype="datetime64[D]").astype(np.int64)
+    employees = df["funcionario"].to_numpy()
+    found = 0
+    for i in range(len(df)):
+        for j in range(i + 1, len(df)):
+            if employees[i] != employees[j] or abs(amounts[i] - amounts[j]) > NEAR_DUP_AMOUNT_TOL:
+                continue
+            if abs(days[i] - days[j]) > NEAR_DUP_WINDOW_DAYS or min(amounts[i], amounts[j]) < 50:
+                continue
+            if len(sets[i] & sets[j]) / len(sets[i] | sets[j]) >= NEAR_DUP_THRESHOLD:
+                found += 1
+    return found
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=3650)
+    parser.add_argument("--planted", type=int, default=200)
+    parser.add_argument("--naive-rows", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    df = _synthetic(args.rows, args.days, args.planted, args.seed)
+    print(f"\n🧪 {len(df)} linhas, {df['descricao'].nunique()} descrições distintas, {args.planted} reapresentações plantadas\n")
+
+    start = time.perf_counter()
+    index = NearDuplicateIndex(df)
+    built = time.perf_counter() - start
+    pairs = index.find()
+    total = time.perf_counter() - start
+
+    ids = df["id_transacao"].to_numpy()
+    found = {tuple(sorted((ids[a], ids[b]))) for a, b in zip(pairs["row_a"], pairs["row_b"])}
+    recalled = sum(1 for t in ids if t.endswith("_DUP") and tuple(sorted((t[:-4], t))) in found)
+    print(f"{'MinHash + LSH':>16} | índice {built * 1000:8.1f} ms | total {total * 1000:8.1f} ms"
+          f" | {len(pairs)} pares | recall plantadas {recalled}/{args.planted}")
+
+    sample = df.head(args.naive_rows)
+    start = time.perf_counter()
+    naive_pairs = _naive(sample)
+    naive = time.perf_counter() - start
+    start = time.perf_counter()
+    lsh_pairs = len(NearDuplicateIndex(sample).find())
+    lsh = time.perf_counter() - start
+    scale = (len(df) / len(sample)) ** 2
+    print(f"{'par a par':>16} | {len(sample)} linhas {naive * 1000:8.1f} ms ({naive_pairs} pares; LSH {lsh * 1000:.1f} ms, {lsh_pairs} pares)"
+          f" | estimado p/ {len(df)} linhas: {naive * scale / 60:.0f} min")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
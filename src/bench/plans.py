@@ -0,0 +1,111 @@
+"""
+Benchmark dos planos do orquestrador (orchestrator/plans.py), offline.
+
+Grava um FLOW a partir do cassette (o orquestrador planeja, turno a turno) e
+depois repete o plano gravado: as ferramentas rodam direto e o LLM só faz a
+síntese final. O `plan_synthesizer` devolve a resposta final gravada no
+cassette, então o que se mede é o nosso código + o nº de turnos de LLM.
+`--llm-ms` soma uma latência simulada por turno para estimar o ganho real.
+
+Uso (a partir de src/):
+    python -m bench.plans
+    python -m bench.plans --flow 1 --repeat 10 --llm-ms 2500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import AsyncGenerator, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+from bench.flows import FIXTURES_DIR, FLOWS, _cassette_path
+from bench.replay import Cassette, install_rag, wrap_agent_model
+
+
+class _SynthesisLlm(BaseLlm):
+    """Responde a síntese com o último turno gravado do orquestrador."""
+
+    responses: List[dict]
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        for raw in self.responses:
+            yield LlmResponse.model_validate(raw)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--flow", default="4", help="1, 2 ou 4 (o 3 não usa ferramentas do orquestrador)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--llm-ms", type=float, default=0, help="latência simulada por turno de LLM")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("TRANSACTIONS_PATH", os.path.join(src_dir, "..", "assets", "transacoes_bancarias.csv"))
+    os.environ.setdefault("EMAILS_PATH", os.path.join(FIXTURES_DIR, "emails.txt"))
+    os.environ.setdefault("RAG_SOURCE_PREFIX", FIXTURES_DIR + os.sep)
+    os.environ.setdefault("COMPLIANCE_POLICY_MODE", "retrieval")
+    os.environ["PLANS_DIR"] = tempfile.mkdtemp(prefix="dunder_plans_")
+
+    rag_stub = install_rag(Cassette(), record=False)
+
+    from api.app import run_agent_session
+    from agentPandas.agent import root_agent as finance_agent
+    from agentCompliance.agent import agent_compliance
+    from RAGEmails.agent import root_agent as profiler_agent
+    from orchestrator import plans
+    from orchestrator.agent import root_agent as orchestrator
+
+    agents = [orchestrator, finance_agent, agent_compliance, profiler_agent]
+    query = FLOWS[args.flow]["query"]
+
+    def fresh_cassette() -> Cassette:
+        cassette = Cassette.load(_cassette_path(args.flow))
+        rag_stub.cassette = cassette
+        for agent in agents:
+            wrap_agent_model(agent, cassette, False, lambda stage, elapsed: None)
+        return cassette
+
+    cassette = fresh_cassette()
+    recorded_turns = len(cassette.llm.get(orchestrator.name, []))
+    plan, _ = asyncio.run(plans.record_plan(f"flow{args.flow}", query, {}, run_agent_session))
+    plans.plan_synthesizer.model = _SynthesisLlm(
+        model="bench-synthesis", responses=cassette.llm[orchestrator.name][-1]
+    )
+
+    full, replay = [], []
+    for _ in range(max(1, args.repeat)):
+        fresh_cassette()
+        start = time.perf_counter()
+        asyncio.run(run_agent_session(orchestrator, query, "bench"))
+        full.append(time.perf_counter() - start)
+
+        fresh_cassette()
+        start = time.perf_counter()
+        result = asyncio.run(plans.replay_plan(plan, {}, run_agent_session))
+        replay.append(time.perf_counter() - start)
+
+    full_ms = statistics.median(full) * 1000
+    replay_ms = statistics.median(replay) * 1000
+    failed = sum("error" in c for c in result["calls"])
+    print(f"\n=== {FLOWS[args.flow]['name']}: plano com {len(plan.steps)} passo(s), {plan.tool_calls} tool call(s) ===")
+    print(f"{'orquestrador (LLM planeja)':>28} | {recorded_turns} turno(s) do orquestrador | mediana {full_ms:8.1f} ms"
+          f" | +LLM simulado {full_ms + recorded_turns * args.llm_ms:8.1f} ms")
+    print(f"{'replay do plano':>28} | 1 turno(s) de síntese     | mediana {replay_ms:8.1f} ms"
+          f" | +LLM simulado {replay_ms + args.llm_ms:8.1f} ms | {failed} tool call(s) com erro")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Benchmark do prefetch especulativo (orchestrator/prefetch.py), offline.
+
+Roda os FLOWs pelo mesmo caminho do `/api/orchestrator` (`orchestrate`), com
+caches frios a cada execução, com e sem prefetch. Para o ganho aparecer sem
+Gemini/GCS reais, o replay soma latências simuladas:
+
+  --llm-ms   por turno de LLM (o prefetch corre durante o 1º turno);
+  --load-ms  no download do CSV do extrato;
+  --rag-ms   por list_files do Vertex RAG.
+
+Uso (a partir de src/):
+    python -m bench.prefetch
+    python -m bench.prefetch --flow 1 --repeat 5 --llm-ms 1500 --load-ms 800
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import AsyncGenerator, Dict, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+from bench.flows import FIXTURES_DIR, FLOWS, _cassette_path
+from bench.replay import Cassette, install_rag, wrap_agent_model
+
+
+class _SlowLlm(BaseLlm):
+    """Replay com latência fixa por turno."""
+
+    inner: BaseLlm
+    delay_s: float
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(self.delay_s)
+        async for response in self.inner.generate_content_async(llm_request, stream):
+            yield response
+
+
+def _clear_caches() -> None:
+    """Zera os caches em memória que o prefetch aquece."""
+    import agentPandas.tools as pandas_tools
+    import RAGEmails.index as emails_index
+    import RAGEmails.linkage as linkage
+    import agentCompliance.policy as policy
+    import rag.embedding as embedding
+    import rag.hybrid as hybrid
+
+    pandas_tools.clear_dataframe_cache()
+    for cache in (embedding._file_ids_cache, hybrid._lexical_cache,
+                  emails_index._index_cache, policy._policy_cache):
+        cache.clear()
+    linkage._index_cache.update({"df_id": None, "index": None})
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--flow", default="1,2,4", help="FLOWs separados por vírgula")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm-ms", type=float, default=1500)
+    parser.add_argument("--load-ms", type=float, default=800)
+    parser.add_argument("--rag-ms", type=float, default=200)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("TRANSACTIONS_PATH", os.path.join(src_dir, "..", "assets", "transacoes_bancarias.csv"))
+    os.environ.setdefault("EMAILS_PATH", os.path.join(FIXTURES_DIR, "emails.txt"))
+    os.environ.setdefault("RAG_SOURCE_PREFIX", FIXTURES_DIR + os.sep)
+    os.environ.setdefault("COMPLIANCE_POLICY_MODE", "retrieval")
+    # Todo FLOW passa pelo LLM do orquestrador (sem rota rápida), extrato sem .arrow compartilhado.
+    os.environ["ROUTER_FAST_INTENTS"] = ""
+    os.environ["SHARED_DATAFRAME"] = "0"
+    os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "0")
+
+    rag_stub = install_rag(Cassette(), record=False)
+    list_files = rag_stub.list_files
+    rag_stub.list_files = lambda corpus: (time.sleep(args.rag_ms / 1000), list_files(corpus))[1]
+
+    import agentPandas.tools as pandas_tools
+    from api.app import orchestrate
+    from agentPandas.agent import root_agent as finance_agent
+    from agentCompliance.agent import agent_compliance
+    from RAGEmails.agent import root_agent as profiler_agent
+    from orchestrator import prefetch
+    from orchestrator.agent import root_agent as orchestrator
+
+    read_dataframe = pandas_tools._read_dataframe
+    pandas_tools._read_dataframe = lambda path: (time.sleep(args.load_ms / 1000), read_dataframe(path))[1]
+    agents = [orchestrator, finance_agent, agent_compliance, profiler_agent]
+
+    print(f"\n🧪 LLM {args.llm_ms:.0f} ms/turno | CSV {args.load_ms:.0f} ms | list_files {args.rag_ms:.0f} ms\n")
+    for flow_id in args.flow.split(","):
+        walls: Dict[bool, List[float]] = {False: [], True: []}
+        for _ in range(max(1, args.repeat)):
+            for enabled in (False, True):
+                cassette = Cassette.load(_cassette_path(flow_id))
+                rag_stub.cassette = cassette
+                for agent in agents:
+                    wrap_agent_model(agent, cassette, False, lambda stage, elapsed: None)
+                    agent.model = _SlowLlm(model=agent.model.model, inner=agent.model, delay_s=args.llm_ms / 1000)
+                _clear_caches()
+                prefetch.PREFETCH_ENABLED = enabled
+
+                start = time.perf_counter()
+                asyncio.run(orchestrate(orchestrator, FLOWS[flow_id]["query"], "bench"))
+                walls[enabled].append(time.perf_counter() - start)
+
+        off, on = (statistics.median(walls[k]) * 1000 for k in (False, True))
+        print(
+            f"{FLOWS[flow_id]['name']:<32} | sem prefetch {off:8.1f} ms | com prefetch {on:8.1f} ms"
+            f" | {off - on:+8.1f} ms ({(off - on) / off:+.0%})"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
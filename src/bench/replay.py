@@ -0,0 +1,236 @@
+"""
+Camada de record/replay para rodar os agentes sem Gemini/Vertex.
+
+- RecordingLlm / ReplayLlm substituem o `model` de cada Agent do ADK.
+- RecordingRag / ReplayRag substituem o módulo `rag` usado por `rag.config`
+  (list_files + retrieval_query).
+
+As respostas ficam num "cassette" JSON:
+{
+  "llm": {"<agent_name>": [[<LlmResponse>, ...], ...]},   # um item por turno
+  "retrieval": {"<query>": [{"text", "score", "source", "uri"}, ...]}
+}
+"""
+import json
+import sys
+import time
+import types as pytypes
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Callable, Dict, List
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+
+
+class ReplayMissError(RuntimeError):
+    """O cassette não tem resposta gravada para a chamada pedida."""
+
+
+@dataclass
+class Cassette:
+    llm: Dict[str, List[List[Dict[str, Any]]]] = field(default_factory=dict)
+    retrieval: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(llm=data.get("llm", {}), retrieval=data.get("retrieval", {}))
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"llm": self.llm, "retrieval": self.retrieval},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+
+# Callback opcional (stage, elapsed_s) para o harness contabilizar tempo.
+StageHook = Callable[[str, float], None]
+
+
+def _noop_hook(stage: str, elapsed: float) -> None:
+    pass
+
+
+class RecordingLlm(BaseLlm):
+    """Repassa para o modelo real e grava cada turno no cassette."""
+
+    agent_name: str
+    inner: BaseLlm
+    cassette: Cassette
+    hook: StageHook = _noop_hook
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        turn: List[Dict[str, Any]] = []
+        self.cassette.llm.setdefault(self.agent_name, []).append(turn)
+        # Conta só o tempo esperando o modelo, não o do consumidor do gerador.
+        elapsed = 0.0
+        stream_iter = self.inner.generate_content_async(llm_request, stream).__aiter__()
+        while True:
+            start = time.perf_counter()
+            try:
+                response = await stream_iter.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - start
+            turn.append(response.model_dump(mode="json", exclude_none=True))
+            yield response
+        self.hook(f"llm:{self.agent_name}", elapsed)
+
+
+class ReplayLlm(BaseLlm):
+    """Devolve, em ordem, os turnos gravados para `agent_name`."""
+
+    agent_name: str
+    cassette: Cassette
+    hook: StageHook = _noop_hook
+    cursor: int = 0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        start = time.perf_counter()
+        turns = self.cassette.llm.get(self.agent_name, [])
+        if self.cursor >= len(turns):
+            raise ReplayMissError(
+                f"Sem turno gravado #{self.cursor} para '{self.agent_name}'"
+            )
+        responses = [LlmResponse.model_validate(raw) for raw in turns[self.cursor]]
+        self.cursor += 1
+        self.hook(f"llm:{self.agent_name}", time.perf_counter() - start)
+        for response in responses:
+            yield response
+
+
+def wrap_agent_model(agent, cassette: Cassette, record: bool, hook: StageHook) -> None:
+    """Troca o modelo do Agent por Recording/ReplayLlm (in-place)."""
+    model_name = agent.model if isinstance(agent.model, str) else agent.model.model
+    if record:
+        agent.model = RecordingLlm(
+            model=model_name,
+            agent_name=agent.name,
+            inner=LLMRegistry.new_llm(model_name),
+            cassette=cassette,
+            hook=hook,
+        )
+    else:
+        agent.model = ReplayLlm(
+            model=model_name, agent_name=agent.name, cassette=cassette, hook=hook
+        )
+
+
+# ---------------------------------------------------------------------------
+# Retrieval (vertexai.rag)
+# ---------------------------------------------------------------------------
+
+
+class _Kwargs:
+    """Stand-in para RagRetrievalConfig / Filter / RagResource."""
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def _to_response(chunks: List[Dict[str, Any]]):
+    contexts = [
+        pytypes.SimpleNamespace(
+            text=c["text"],
+            score=c.get("score", 0.0),
+            source_display_name=c.get("source", ""),
+            source_uri=c.get("uri", ""),
+        )
+        for c in chunks
+    ]
+    return pytypes.SimpleNamespace(
+        contexts=pytypes.SimpleNamespace(contexts=contexts)
+    )
+
+
+class ReplayRag:
+    """Imita a API de `vertexai.rag` usada em rag/embedding.py e RAGEmails."""
+
+    RagRetrievalConfig = _Kwargs
+    Filter = _Kwargs
+    RagResource = _Kwargs
+
+    def __init__(self, cassette: Cassette, hook: StageHook = _noop_hook):
+        self.cassette = cassette
+        self.hook = hook
+
+    def list_files(self, corpus_name: str):
+        names = {"politica_compliance.txt", "emails.txt"}
+        for c in self.cassette.retrieval.values():
+            names.update(chunk.get("source", "") for chunk in c)
+        return [
+            pytypes.SimpleNamespace(
+                display_name=n, name=f"{corpus_name}/ragFiles/{i}"
+            )
+            for i, n in enumerate(sorted(n for n in names if n))
+        ]
+
+    def retrieval_query(self, rag_resources, text: str, rag_retrieval_config=None):
+        start = time.perf_counter()
+        chunks = self.cassette.retrieval.get(text)
+        if chunks is None:
+            raise ReplayMissError(f"Sem retrieval gravado para '{text}'")
+        self.hook("retrieval", time.perf_counter() - start)
+        return _to_response(chunks)
+
+
+class RecordingRag:
+    """Proxy do módulo real que grava as respostas de retrieval_query."""
+
+    def __init__(self, real_rag, cassette: Cassette, hook: StageHook = _noop_hook):
+        self._real = real_rag
+        self.cassette = cassette
+        self.hook = hook
+
+    def __getattr__(self, name: str):
+        return getattr(self._real, name)
+
+    def retrieval_query(self, rag_resources, text: str, rag_retrieval_config=None):
+        start = time.perf_counter()
+        response = self._real.retrieval_query(
+            rag_resources=rag_resources,
+            text=text,
+            rag_retrieval_config=rag_retrieval_config,
+        )
+        self.hook("retrieval", time.perf_counter() - start)
+        self.cassette.retrieval[text] = [
+            {
+                "text": ctx.text,
+                "score": float(ctx.score),
+                "source": ctx.source_display_name,
+                "uri": ctx.source_uri,
+            }
+            for ctx in response.contexts.contexts
+        ]
+        return response
+
+
+def install_rag(cassette: Cassette, record: bool, hook: StageHook = _noop_hook):
+    """
+    Instala o stand-in de `rag.config` ANTES de importar os agentes.
+
+    Em replay nada toca o Vertex (rag.config real faz get_corpus no import).
+    Retorna o objeto instalado; troque `.cassette` dele entre cenários.
+    """
+    if record:
+        import rag.config as real_config
+
+        real_config.rag = RecordingRag(real_config.rag, cassette, hook)
+        return real_config.rag
+
+    module = pytypes.ModuleType("rag.config")
+    module.rag = ReplayRag(cassette, hook)
+    module.rag_corpus = pytypes.SimpleNamespace(name="replay/ragCorpora/0")
+    sys.modules["rag.config"] = module
+    return module.rag
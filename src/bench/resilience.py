@@ -0,0 +1,181 @@
+"""
+Benchmark da camada de resiliência (runtime/resilience.py) contra um
+servidor HTTP local que imita um upstream ruim (offline).
+
+O servidor responde em `--latency` ms, mas uma fração `--tail` das respostas
+demora `--tail-ms` ms e uma fração `--errors` devolve 503. Três cenários,
+cada um com e sem resiliência, com `--inflight` clientes simultâneos:
+
+  - cauda:  só latência (hedge após o p95 corta o p99);
+  - falhas: 503 intermitente (retries com jitter zeram os erros);
+  - queda:  servidor fora do ar (circuit breaker falha na hora);
+  - pool:   cauda longa com timeout curto num BlockingPool do tamanho do
+            "rag" (`--pool-workers`): tentativas abandonadas seguem ocupando
+            threads. Compara retries/hedge cegos com `call(..., pool=)`, que
+            só os dispara havendo thread livre.
+
+Uso (a partir de src/):
+    python -m bench.resilience
+    python -m bench.resilience --requests 400 --tail 0.03 --tail-ms 800 --errors 0.1
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from runtime import BlockingPool, blocking_pool
+from runtime.resilience import ResiliencePolicy, Upstream
+
+
+class FakeUpstream(BaseHTTPRequestHandler):
+    latency = 0.02
+    tail, tail_latency = 0.0, 0.0
+    errors = 0.0
+
+    def do_GET(self):
+        roll = random.random()
+        time.sleep(self.tail_latency if roll < self.tail else self.latency)
+        status = 503 if random.random() < self.errors else 200
+        body = b'{"contexts": []}'
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeUpstream)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _fetch(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read()
+
+
+async def _run(
+    url: str, requests: int, inflight: int, up: Upstream = None,
+    pool: BlockingPool = None, pool_aware: bool = False,
+) -> Dict[str, Any]:
+    pool = pool or blocking_pool("bench_resilience", default_workers=64)
+    semaphore = asyncio.Semaphore(inflight)
+    peak_busy = 0
+    latencies: List[float] = []
+    failures = 0
+
+    async def one() -> None:
+        nonlocal failures, peak_busy
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if up is None:
+                    await pool.run(_fetch, url)
+                else:
+                    await up.call(lambda: pool.run(_fetch, url), op="get", pool=pool if pool_aware else None)
+                peak_busy = max(peak_busy, pool.busy)
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def pct(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else float("nan")
+
+    return {
+        "p50": pct(0.5),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "mean": statistics.mean(latencies) * 1000 if latencies else float("nan"),
+        "errors": failures,
+        "elapsed": elapsed,
+        "peak_busy": peak_busy,
+    }
+
+
+def _print(label: str, r: Dict[str, Any], requests: int) -> None:
+    print(
+        f"{label:>24} | p50 {r['p50']:7.1f} | p95 {r['p95']:7.1f} | p99 {r['p99']:7.1f} ms | "
+        f"erros {r['errors']:>4}/{requests} | total {r['elapsed']:6.2f}s"
+    )
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--inflight", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=20, help="latência normal (ms)")
+    parser.add_argument("--tail", type=float, default=0.03, help="fração de respostas lentas")
+    parser.add_argument("--tail-ms", type=float, default=600, help="latência da cauda (ms)")
+    parser.add_argument("--errors", type=float, default=0.1, help="fração de 503 no cenário de falhas")
+    parser.add_argument("--pool-workers", type=int, default=8, help="threads do pool no cenário pool (o 'rag' tem 8)")
+    args = parser.parse_args(argv)
+
+    random.seed(7)
+    server = _start_server()
+    url = f"http://127.0.0.1:{server.server_port}/retrieval"
+    FakeUpstream.latency = args.latency / 1000
+
+    print(f"\n🧪 Upstream local em {url} — {args.requests} requisições, {args.inflight} em voo\n")
+
+    # Cauda: hedge depois do p95 (a janela de latência aquece na primeira passada).
+    FakeUpstream.tail, FakeUpstream.tail_latency = args.tail, args.tail_ms / 1000
+    hedged = Upstream("bench_tail", ResiliencePolicy(timeout_s=5, retries=0, hedge=True))
+    _print("cauda / sem", asyncio.run(_run(url, args.requests, args.inflight)), args.requests)
+    asyncio.run(_run(url, 100, args.inflight, hedged))
+    _print("cauda / hedge p95", asyncio.run(_run(url, args.requests, args.inflight, hedged)), args.requests)
+
+    # Falhas intermitentes: retries com jitter.
+    FakeUpstream.tail, FakeUpstream.errors = 0.0, args.errors
+    retrying = Upstream("bench_flaky", ResiliencePolicy(timeout_s=5, retries=3, backoff_s=0.02, failures=50))
+    _print("503 / sem", asyncio.run(_run(url, args.requests, args.inflight)), args.requests)
+    _print("503 / retries", asyncio.run(_run(url, args.requests, args.inflight, retrying)), args.requests)
+
+    # Queda: servidor responde 503 sempre (cada chamada sem breaker paga os retries).
+    FakeUpstream.errors = 1.0
+    policy = ResiliencePolicy(timeout_s=5, retries=2, backoff_s=0.05, failures=5, reset_s=60)
+    no_breaker = Upstream("bench_down_nb", policy)
+    no_breaker.breaker.failures = 10**9
+    _print("queda / só retries", asyncio.run(_run(url, args.requests, args.inflight, no_breaker)), args.requests)
+    _print(
+        "queda / circuit breaker",
+        asyncio.run(_run(url, args.requests, args.inflight, Upstream("bench_down", policy))),
+        args.requests,
+    )
+
+    # Pool pequeno: timeouts abandonam threads ocupadas; retries/hedge cegos esperam na fila.
+    FakeUpstream.errors, FakeUpstream.tail, FakeUpstream.tail_latency = 0.0, args.tail, 1.5
+    policy = ResiliencePolicy(timeout_s=0.25, deadline_s=2, retries=2, backoff_s=0.01, hedge=True, failures=10**9)
+    for label, aware in (("pool / retry+hedge cegos", False), ("pool / pool-aware", True)):
+        pool = BlockingPool(f"bench_pool_{aware}", args.pool_workers)
+        up = Upstream(f"bench_pool_{aware}", policy)
+        asyncio.run(_run(url, 100, args.inflight, up, pool, aware))  # aquece o p95 do hedge
+        time.sleep(FakeUpstream.tail_latency)  # threads abandonadas no aquecimento terminam
+        result = asyncio.run(_run(url, args.requests, args.inflight, up, pool, aware))
+        _print(label, result, args.requests)
+        print(f"{'':>24} | tarefas no pool (pico, rodando + fila) {result['peak_busy']} para {pool.max_workers} threads")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
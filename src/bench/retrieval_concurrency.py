@@ -0,0 +1,115 @@
+"""
+Benchmark de concorrência do retrieval (offline).
+
+Usa um retriever local que imita o SDK síncrono do Vertex (dorme `--latency`
+segundos por consulta) e compara, para N auditorias simultâneas no MESMO
+event loop:
+
+  - bloqueante: a chamada síncrona direto no loop (comportamento antigo);
+  - offload: `rag.embedding.make_embedding` (pool limitado + timeout).
+
+Com offload o throughput deve crescer com N até o tamanho do pool
+(RAG_MAX_CONCURRENCY); no modo bloqueante fica constante em ~1/latência.
+
+Uso (a partir de src/):
+    python -m bench.retrieval_concurrency
+    python -m bench.retrieval_concurrency --latency 0.2 --inflight 1,4,16 --workers 16
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import types as pytypes
+from typing import List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from bench.flows import FIXTURES_DIR
+from bench.replay import ReplayRag, _to_response
+
+
+class StandInRag(ReplayRag):
+    """Retriever local: mesma API do vertexai.rag, latência simulada com sleep."""
+
+    def __init__(self, latency: float):
+        super().__init__(cassette=None)
+        self.latency = latency
+
+    def list_files(self, corpus_name: str):
+        return [pytypes.SimpleNamespace(display_name="politica_compliance.txt", name=f"{corpus_name}/ragFiles/0")]
+
+    def retrieval_query(self, rag_resources, text: str, rag_retrieval_config=None):
+        time.sleep(self.latency)  # bloqueia a thread, como o SDK real
+        return _to_response([{"text": f"trecho para {text}", "score": 0.9, "source": "politica_compliance.txt"}])
+
+
+def install_stand_in(latency: float) -> StandInRag:
+    module = pytypes.ModuleType("rag.config")
+    module.rag = StandInRag(latency)
+    module.rag_corpus = pytypes.SimpleNamespace(name="standin/ragCorpora/0")
+    sys.modules["rag.config"] = module
+    return module.rag
+
+
+async def _audit_blocking(rag, rag_corpus, audit_id: int, queries: int) -> None:
+    for q in range(queries):
+        rag.retrieval_query(
+            rag_resources=[rag.RagResource(rag_corpus=rag_corpus.name, rag_file_ids=["0"])],
+            text=f"auditoria {audit_id} consulta {q}",
+        )
+        await asyncio.sleep(0)  # o "resto" da auditoria (turno de LLM etc.)
+
+
+async def _audit_offload(make_embedding, audit_id: int, queries: int) -> None:
+    for q in range(queries):
+        result = await make_embedding(f"auditoria {audit_id} consulta {q}", ["politica_compliance.txt"])
+        assert result["chunks"], result
+        await asyncio.sleep(0)
+
+
+async def _measure(factory, inflight: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(factory(i) for i in range(inflight)))
+    return time.perf_counter() - start
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.1, help="latência simulada por consulta (s)")
+    parser.add_argument("--queries", type=int, default=3, help="consultas por auditoria")
+    parser.add_argument("--inflight", default="1,2,4,8,16", help="auditorias simultâneas (lista)")
+    parser.add_argument("--workers", type=int, help="sobrescreve RAG_MAX_CONCURRENCY")
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        os.environ["RAG_MAX_CONCURRENCY"] = str(args.workers)
+    # O braço BM25 do make_embedding lê a política das fixtures, não do GCS.
+    os.environ.setdefault("RAG_SOURCE_PREFIX", FIXTURES_DIR + os.sep)
+
+    rag = install_stand_in(args.latency)
+    from rag.config import rag_corpus
+    from rag.embedding import _RAG_POOL, make_embedding
+
+    print(
+        f"\n📊 Retrieval concorrente — latência {args.latency * 1000:.0f}ms, "
+        f"{args.queries} consultas/auditoria, pool={_RAG_POOL.max_workers}\n"
+    )
+    print(f"{'em voo':>7} | {'bloqueante (q/s)':>17} | {'offload (q/s)':>14} | {'ganho':>6}")
+    print("-" * 55)
+
+    for n in (int(x) for x in args.inflight.split(",")):
+        total = n * args.queries
+        blocking = asyncio.run(_measure(lambda i: _audit_blocking(rag, rag_corpus, i, args.queries), n))
+        offload = asyncio.run(_measure(lambda i: _audit_offload(make_embedding, i, args.queries), n))
+        print(
+            f"{n:>7} | {total / blocking:>17.1f} | {total / offload:>14.1f} | "
+            f"{blocking / offload:>5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
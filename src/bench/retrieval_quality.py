@@ -0,0 +1,156 @@
+"""
+Benchmark de qualidade/latência do retrieval (offline).
+
+Roda as consultas rotuladas de bench/fixtures/retrieval_queries.json contra
+os quatro modos de busca e mede recall@k, MRR e latência (média / p95):
+
+  - vetorial: só o ranking do Vertex (replay do fixture, com `--latency`);
+  - bm25:     só o índice local (parágrafos da política / índice de e-mails);
+  - híbrido:  vetorial + BM25 fundidos por RRF;
+  - híbrido+rerank: idem, reordenado pelo reranker local (HYBRID_RERANKER).
+
+O braço vetorial é reproduzido a partir do campo "vector" de cada consulta
+(sem credenciais); os demais braços rodam o código de produção.
+
+Uso (a partir de src/):
+    python -m bench.retrieval_quality
+    python -m bench.retrieval_quality --k 1 --latency 0.2 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+project_root = os.path.abspath(os.path.join(src_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from bench.replay import Cassette, install_rag
+
+FIXTURES_DIR = os.path.join(current_dir, "fixtures")
+MODES = ["vetorial", "bm25", "híbrido", "híbrido+rerank"]
+
+
+def _find(chunks: List[Dict[str, Any]], marker: str) -> Dict[str, Any]:
+    return next(c for c in chunks if marker in c["text"])
+
+
+def _first_hit(chunks: List[Dict[str, Any]], relevant: List[str]) -> int:
+    for rank, chunk in enumerate(chunks, start=1):
+        if any(marker in chunk["text"] for marker in relevant):
+            return rank
+    return 0
+
+
+async def _run_query(item: Dict[str, Any], mode: str, k: int, latency: float, docs, lexical) -> List[Dict[str, Any]]:
+    from rag.hybrid import hybrid_search
+
+    async def vector_search(n: int) -> List[Dict[str, Any]]:
+        await asyncio.sleep(latency)  # ida e volta ao Vertex
+        return [dict(_find(docs, marker)) for marker in item["vector"][:n]]
+
+    if mode == "vetorial":
+        return (await vector_search(k))[:k]
+    if mode == "bm25":
+        return await lexical(item["query"], k)
+    result = await hybrid_search(
+        item["query"],
+        [item["source"]],
+        vector_search=vector_search,
+        top_k=k,
+        lexical=lexical,
+        reranker="none" if mode == "híbrido" else os.getenv("HYBRID_RERANKER", "lexical"),
+    )
+    return result["chunks"]
+
+
+async def _bench(queries: List[Dict[str, Any]], k: int, latency: float, repeat: int) -> Dict[str, Dict[str, float]]:
+    from rag.hybrid import _load_lexical_sync, lexical_search
+    from RAGEmails.agent import _email_bm25, _email_chunk
+    from RAGEmails.index import load_index
+
+    # Documentos que o "Vertex" devolve: os mesmos trechos que o BM25 enxerga.
+    email_index = await load_index()
+    sources = {
+        "politica_compliance.txt": (
+            _load_lexical_sync("politica_compliance.txt").chunks,
+            lambda q, n: lexical_search(q, ["politica_compliance.txt"], n),
+        ),
+        "emails.txt": (
+            [_email_chunk(e) for e in email_index.search("", top_k=len(email_index.meta))],
+            _email_bm25,
+        ),
+    }
+
+    recall: Dict[str, List[float]] = defaultdict(list)
+    rr: Dict[str, List[float]] = defaultdict(list)
+    lat: Dict[str, List[float]] = defaultdict(list)
+    for item in queries:
+        docs, lexical = sources[item["source"]]
+        for mode in MODES:
+            for i in range(repeat):
+                start = time.perf_counter()
+                chunks = await _run_query(item, mode, k, latency, docs, lexical)
+                lat[mode].append((time.perf_counter() - start) * 1000)
+            found = sum(1 for marker in item["relevant"] if any(marker in c["text"] for c in chunks[:k]))
+            recall[mode].append(found / len(item["relevant"]))
+            hit = _first_hit(chunks[:k], item["relevant"])
+            rr[mode].append(1 / hit if hit else 0.0)
+
+    report = {}
+    for mode in MODES:
+        ordered = sorted(lat[mode])
+        report[mode] = {
+            "recall": statistics.mean(recall[mode]),
+            "mrr": statistics.mean(rr[mode]),
+            "lat_mean_ms": statistics.mean(ordered),
+            "lat_p95_ms": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        }
+    return report
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=3, help="top_k avaliado (recall@k / MRR@k)")
+    parser.add_argument("--latency", type=float, default=0.08, help="latência simulada do Vertex (s)")
+    parser.add_argument("--repeat", type=int, default=3, help="execuções por consulta (latência)")
+    parser.add_argument("--source", default="all", help="politica_compliance.txt, emails.txt ou all")
+    parser.add_argument("--json", dest="json_out", default="", help="salva o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("TRANSACTIONS_PATH", os.path.join(project_root, "assets", "transacoes_bancarias.csv"))
+    os.environ.setdefault("EMAILS_PATH", os.path.join(FIXTURES_DIR, "emails.txt"))
+    os.environ.setdefault("RAG_SOURCE_PREFIX", FIXTURES_DIR + os.sep)
+    install_rag(Cassette(), record=False)  # RAGEmails.agent importa rag.config
+
+    with open(os.path.join(FIXTURES_DIR, "retrieval_queries.json"), encoding="utf-8") as f:
+        queries = json.load(f)["queries"]
+    if args.source != "all":
+        queries = [q for q in queries if q["source"] == args.source]
+
+    report = asyncio.run(_bench(queries, args.k, args.latency, args.repeat))
+
+    print(f"\n📊 Retrieval — {len(queries)} consultas rotuladas, k={args.k}, vetorial={args.latency * 1000:.0f}ms\n")
+    print(f"{'modo':>15} | {f'recall@{args.k}':>9} | {'MRR':>5} | {'média (ms)':>10} | {'p95 (ms)':>8}")
+    print("-" * 62)
+    for mode, row in report.items():
+        print(
+            f"{mode:>15} | {row['recall']:>9.2f} | {row['mrr']:>5.2f} | "
+            f"{row['lat_mean_ms']:>10.1f} | {row['lat_p95_ms']:>8.1f}"
+        )
+
+    if args.json_out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json_out)), exist_ok=True)
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"k": args.k, "queries": len(queries), "modes": report}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Conferência da trava numérica do cache semântico (runtime/semantic_cache.py).
+
+Grava a primeira pergunta de cada par e consulta a segunda com limiar de
+similaridade 0: só a comparação dos valores citados decide. Pares "devem
+reaproveitar" escrevem o mesmo valor de outro jeito; pares "não podem
+reaproveitar" citam valores diferentes. Sai com código 1 se algum par
+divergir. Sem rede: usa o HashingEmbedder.
+
+Uso (a partir de src/):
+    python -m bench.semantic_cache
+"""
+import asyncio
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from runtime.semantic_cache import HashingEmbedder, SemanticCache
+
+MUST_HIT = [
+    ("Posso gastar $1000 sem recibo?", "Posso gastar $1.000 sem recibo?"),
+    ("Can I spend $1,000 without a receipt?", "Can I spend $1000.00 without a receipt?"),
+    ("Despesa de R$ 1.000,50 precisa de aprovação?", "Despesa de R$ 1000,50 precisa de aprovação?"),
+    ("Gastos acima de $500 em abril", "Gastos acima de $500.00 em abril"),
+]
+
+MUST_MISS = [
+    ("Posso gastar $1000 sem recibo?", "Posso gastar $100 sem recibo?"),
+    ("Posso gastar $1.5 mil sem recibo?", "Posso gastar $15 mil sem recibo?"),
+    ("Reembolso de 1,50 no café é permitido?", "Reembolso de 150 no café é permitido?"),
+    ("Can I spend $1,000.00 on gifts?", "Can I spend $100000 on gifts?"),
+    ("Despesa de R$ 1.000,50 precisa de aprovação?", "Despesa de R$ 100050 precisa de aprovação?"),
+]
+
+
+async def _hit(stored: str, asked: str) -> bool:
+    cache = SemanticCache(embedder=HashingEmbedder(), threshold=0.0)
+    await cache.store(("bench",), stored, "resposta")
+    return await cache.lookup(("bench",), asked) is not None
+
+
+async def _run() -> int:
+    wrong = 0
+    for expected, pairs in ((True, MUST_HIT), (False, MUST_MISS)):
+        print(f"\n🧪 {'devem reaproveitar' if expected else 'não podem reaproveitar'}")
+        for stored, asked in pairs:
+            hit = await _hit(stored, asked)
+            wrong += hit != expected
+            print(f"  {'✅' if hit == expected else '❌'} {'hit ' if hit else 'miss'} | {stored!r} -> {asked!r}")
+    if wrong:
+        print(f"❌ {wrong} par(es) com resultado errado.")
+        return 1
+    print("✅ Trava numérica confere.")
+    return 0
+
+
+def main() -> int:
+    return asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Benchmark do extrato compartilhado entre workers (Arrow IPC + mmap).
+
+Gera um extrato sintético com `--rows` linhas (amostrando o CSV de assets/),
+depois sobe `--workers` processos que carregam o DataFrame ao mesmo tempo,
+nos dois modos:
+
+  - csv:   cada processo faz o parse do CSV (comportamento antigo);
+  - arrow: cada processo abre o .arrow mapeado em memória (SHARED_DATAFRAME).
+
+Para cada modo reporta o tempo de carga + uma varredura de todas as colunas
+e a memória do DataFrame por processo (RSS privado e PSS de
+/proc/self/smaps_rollup: páginas compartilhadas são divididas entre os
+processos que as mapeiam). Só Linux.
+
+Uso (a partir de src/):
+    python -m bench.shared_frame
+    python -m bench.shared_frame --rows 1000000 --workers 8
+"""
+import argparse
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+project_root = os.path.abspath(os.path.join(src_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+SAMPLE_CSV = os.path.join(project_root, "assets", "transacoes_bancarias.csv")
+
+
+def _memory_kib() -> Dict[str, int]:
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _worker(mode: str, csv_path: str, arrow_dir: str, start_barrier, done_barrier, out) -> None:
+    os.environ["TRANSACTIONS_PATH"] = csv_path
+    os.environ["SHARED_DATAFRAME"] = "1" if mode == "arrow" else "0"
+    os.environ["SHARED_DATAFRAME_DIR"] = arrow_dir
+    from agentPandas.tools import _get_gs_path, _load_dataframe
+
+    before = _memory_kib()
+    start_barrier.wait()
+    start = time.perf_counter()
+    df = _load_dataframe(_get_gs_path())
+    distinct = int(df.nunique().sum())  # lê todas as colunas (todas as páginas)
+    elapsed = time.perf_counter() - start
+    # Mede com todos os processos ainda vivos (PSS divide o que é compartilhado).
+    done_barrier.wait()
+    after = _memory_kib()
+    out.put({
+        "seconds": elapsed,
+        "pss": after["pss"] - before["pss"],
+        "private": after["private"] - before["private"],
+        "rows": len(df),
+        "distinct": distinct,
+    })
+    done_barrier.wait()
+
+
+def _run(mode: str, workers: int, csv_path: str, arrow_dir: str) -> List[Dict[str, float]]:
+    ctx = mp.get_context("spawn")
+    start_barrier, done_barrier, out = ctx.Barrier(workers), ctx.Barrier(workers), ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(mode, csv_path, arrow_dir, start_barrier, done_barrier, out))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return results
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000, help="linhas do extrato sintético")
+    parser.add_argument("--workers", type=int, default=4, help="processos simultâneos")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    with tempfile.TemporaryDirectory(prefix="dunder-shared-frame-") as tmp:
+        sample = pd.read_csv(SAMPLE_CSV)
+        synthetic = sample.sample(n=args.rows, replace=True, random_state=7).reset_index(drop=True)
+        synthetic["id_transacao"] = [f"TX_{i}" for i in range(len(synthetic))]
+        csv_path = os.path.join(tmp, "transacoes.csv")
+        synthetic.to_csv(csv_path, index=False)
+        print(f"\n🧪 Extrato sintético: {args.rows} linhas ({os.path.getsize(csv_path) / 2**20:.1f} MiB de CSV), "
+              f"{args.workers} workers\n")
+
+        # Primeira carga materializa o .arrow (o que um worker faria no boot).
+        warm = _run("arrow", 1, csv_path, tmp)[0]
+        print(f"materialização (parse do CSV + gravação do .arrow): {warm['seconds'] * 1000:.0f} ms\n")
+
+        for mode in ("csv", "arrow"):
+            results = _run(mode, args.workers, csv_path, tmp)
+            seconds = [r["seconds"] * 1000 for r in results]
+            pss = sum(r["pss"] for r in results) / 1024
+            private = statistics.mean(r["private"] for r in results) / 1024
+            print(
+                f"{mode:>5}: carga+varredura média {statistics.mean(seconds):7.1f} ms (máx {max(seconds):7.1f}) | "
+                f"PSS total {pss:7.1f} MiB | privado/worker {private:6.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Conferência da janela de compra fracionada (agentCompliance/rules.split_windows).
+
+Compara, linha a linha, a soma e o nº de compras na janela (data - N dias,
+data] do mesmo funcionário/categoria com uma força bruta sobre o extrato
+(assets/transacoes_bancarias.csv por padrão). Sai com código 1 se alguma
+linha divergir. Sem LLM: as regras são montadas aqui.
+
+Uso (a partir de src/):
+    python -m bench.split_purchase
+    python -m bench.split_purchase --window-days 3 --any-category
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+project_root = os.path.abspath(os.path.join(src_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from bench.replay import Cassette, install_rag
+
+
+def _brute_force(work: pd.DataFrame, keys, window_days: float):
+    window = pd.Timedelta(days=window_days)
+    sums, counts = {}, {}
+    for idx, row in work.iterrows():
+        if row[keys + ["_date"]].isna().any():
+            continue
+        same = (work[keys] == row[keys]).all(axis=1)
+        inside = same & (work["_date"] > row["_date"] - window) & (work["_date"] <= row["_date"])
+        sums[idx] = work.loc[inside, "_amount"].sum()
+        counts[idx] = work.loc[inside, "_amount"].count()
+    return pd.Series(sums, dtype=float).reindex(work.index), pd.Series(counts, dtype=float).reindex(work.index)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--csv", default=os.path.join(project_root, "assets", "transacoes_bancarias.csv"))
+    parser.add_argument("--window-days", type=float, default=7)
+    parser.add_argument("--threshold", type=float, default=500)
+    parser.add_argument("--any-category", action="store_true", help="janela só por funcionário")
+    args = parser.parse_args(argv)
+
+    install_rag(Cassette(), record=False)  # importar o compliance não inicializa o Vertex
+    from agentCompliance.rules import evaluate_rules, split_windows
+
+    df = pd.read_csv(args.csv, sep=None, engine="python")
+    work = pd.DataFrame({
+        "_employee": df["funcionario"],
+        "_category": df["categoria"],
+        "_date": pd.to_datetime(df["data"], errors="coerce"),
+        "_amount": pd.to_numeric(df["valor"], errors="coerce"),
+    })
+    keys = ["_employee"] if args.any_category else ["_employee", "_category"]
+
+    start = time.perf_counter()
+    window_sum, window_count = split_windows(work, keys, args.window_days)
+    fast_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    expected_sum, expected_count = _brute_force(work, keys, args.window_days)
+    brute_ms = (time.perf_counter() - start) * 1000
+
+    sum_ok = np.isclose(window_sum, expected_sum, equal_nan=True)
+    count_ok = np.isclose(window_count, expected_count, equal_nan=True)
+    print(f"\n🧪 {len(df)} linhas, janela {args.window_days:g} dia(s) por {', '.join(keys)}")
+    print(f"{'split_windows':>14} | {fast_ms:8.1f} ms")
+    print(f"{'força bruta':>14} | {brute_ms:8.1f} ms")
+    print(f"{'iguais':>14} | soma {sum_ok.sum()}/{len(df)} | contagem {count_ok.sum()}/{len(df)}")
+
+    rules = {"split_purchase": {
+        "threshold": args.threshold, "window_days": args.window_days,
+        "same_category": not args.any_category, "citation": "bench",
+    }}
+    flagged = evaluate_rules(df, rules)["violations"]
+    expected = int(((work["_amount"] <= args.threshold) & (expected_sum > args.threshold) & (expected_count >= 2)).sum())
+    print(f"{'violações':>14} | evaluate_rules {len(flagged)} | força bruta {expected}")
+
+    mismatches = (~sum_ok).sum() + (~count_ok).sum() + abs(len(flagged) - expected)
+    if mismatches:
+        print("❌ split_windows diverge da força bruta.")
+        return 1
+    print("✅ split_windows confere com a força bruta.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
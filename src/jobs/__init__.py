@@ -0,0 +1,45 @@
+"""
+Jobs assíncronos: auditorias longas saem da requisição HTTP.
+
+A rota grava o job (SQLite, ver store.py) e devolve o id; um pool limitado de
+workers (queue.py) executa por prioridade, e o cliente consulta o estado
+(GET /api/jobs/<id>) ou assina os eventos (SSE em /api/jobs/<id>/events).
+
+    JOBS_DB_PATH=cache/jobs.sqlite3
+"""
+import os
+import threading
+from typing import Dict, Optional
+
+from .queue import Handler, JobFailed, JobQueue
+from .store import PRIORITIES, TERMINAL, Job, JobStore, parse_priority
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(project_root, "cache", "jobs.sqlite3"))
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def job_queue(handlers: Optional[Dict[str, Handler]] = None) -> JobQueue:
+    """Fila do processo (criada e iniciada na primeira chamada, com os handlers)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            if handlers is None:
+                raise RuntimeError("job_queue() precisa dos handlers na primeira chamada")
+            _queue = JobQueue(JobStore(JOBS_DB_PATH), handlers).start()
+        return _queue
+
+
+__all__ = [
+    "Job",
+    "JobFailed",
+    "JobQueue",
+    "JobStore",
+    "PRIORITIES",
+    "TERMINAL",
+    "job_queue",
+    "parse_priority",
+]
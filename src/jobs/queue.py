@@ -0,0 +1,206 @@
+"""
+Pool de workers assíncronos que executa os jobs da JobStore.
+
+Os workers rodam num event loop próprio (thread daemon), separado dos loops
+por requisição do Flask: a requisição só grava o job e retorna o id. O número
+de workers limita quantas auditorias rodam ao mesmo tempo no processo.
+
+    queue = JobQueue(store, handlers={"orchestrator": run_orchestrator_job})
+    queue.start()
+    job = queue.submit("orchestrator", {"message": "..."}, priority="high")
+    queue.cancel(job.id)
+
+Configuração via env:
+    JOBS_WORKERS=2
+    JOBS_POLL_S=1            (fila compartilhada com outros processos)
+    JOBS_TIMEOUT_S=900
+    JOBS_STALE_S=120         (running sem heartbeat volta para a fila)
+    JOBS_MAX_ATTEMPTS=2
+    JOBS_RETENTION_S=604800
+"""
+import asyncio
+import os
+import socket
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from observability import metrics, span
+from observability.runs import begin_request, end_request
+from runtime import llm_priority, request_scope
+
+from .store import Job, JobStore, parse_priority
+
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_POLL_S = float(os.getenv("JOBS_POLL_S", "1"))
+JOBS_TIMEOUT_S = float(os.getenv("JOBS_TIMEOUT_S", "900"))
+JOBS_STALE_S = float(os.getenv("JOBS_STALE_S", "120"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "2"))
+JOBS_RETENTION_S = float(os.getenv("JOBS_RETENTION_S", str(7 * 24 * 3600)))
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class JobFailed(Exception):
+    """
+    O handler terminou, mas com resposta de erro (ex: "Erro: ...", "⚠️ ...").
+
+    O job vai para `failed` com `error`, e o que houver de resposta (parcial)
+    fica em `result` para quem consulta.
+    """
+
+    def __init__(self, error: str, response: Any = None):
+        super().__init__(error)
+        self.response = response
+
+
+class JobQueue:
+    def __init__(self, store: JobStore, handlers: Dict[str, Handler], workers: int = JOBS_WORKERS):
+        self.store = store
+        self.handlers = dict(handlers)
+        self.workers = max(1, workers)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        # Notificado a cada mudança de estado (long-poll / SSE no mesmo processo).
+        self.changed = threading.Condition()
+
+    # --- API usada pelas rotas (qualquer thread) ---
+
+    def submit(self, kind: str, payload: Dict[str, Any], priority: Any = None) -> Job:
+        if kind not in self.handlers:
+            raise ValueError(f"tipo de job desconhecido: '{kind}' (disponíveis: {', '.join(sorted(self.handlers))})")
+        job = self.store.create(kind, payload, parse_priority(priority))
+        metrics.JOBS.labels(kind=kind, status="queued").inc()
+        print(f"📥 [Jobs] {job.id} ({kind}, prioridade {job.priority}) na fila.")
+        self._wake()
+        self._notify()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.store.request_cancel(job_id)
+        if job is None:
+            return None
+        if job.status == "cancelled":
+            metrics.JOBS.labels(kind=job.kind, status="cancelled").inc()
+            self._notify()
+        elif job.status == "running" and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._cancel_local, job_id)
+        return job
+
+    def wait_for_change(self, timeout: float) -> None:
+        with self.changed:
+            self.changed.wait(timeout)
+
+    # --- Ciclo de vida ---
+
+    def start(self) -> "JobQueue":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_loop, name="dunder-jobs", daemon=True)
+            self._thread.start()
+            self._started.wait(5)
+            print(f"⚙️ [Jobs] {self.workers} worker(s) ativos ({', '.join(sorted(self.handlers))}).")
+        return self
+
+    def _run_loop(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._wakeup = asyncio.Event()
+        self._started.set()
+        self._loop.run_until_complete(self._main())
+
+    async def _main(self) -> None:
+        self.store.requeue_stale(JOBS_STALE_S, JOBS_MAX_ATTEMPTS)
+        await asyncio.gather(self._supervise(), *(self._worker(i) for i in range(self.workers)))
+
+    def _wake(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _notify(self) -> None:
+        with self.changed:
+            self.changed.notify_all()
+
+    def _cancel_local(self, job_id: str) -> None:
+        task = self._running.get(job_id)
+        if task is not None and not task.done():
+            task.cancel()
+
+    # --- Workers ---
+
+    async def _worker(self, index: int) -> None:
+        name = f"{self.worker_id}/{index}"
+        while True:
+            job = self.store.claim(name, list(self.handlers))
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOBS_POLL_S)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(job)
+
+    async def _execute(self, job: Job) -> None:
+        print(f"▶️ [Jobs] {job.id} ({job.kind}) iniciado (tentativa {job.attempts}).")
+        self._notify()
+        start = time.perf_counter()
+        totals_token = begin_request()
+        task = asyncio.ensure_future(self._call_handler(job))
+        self._running[job.id] = task
+        status, result, error = "succeeded", None, None
+        try:
+            result = await asyncio.wait_for(task, JOBS_TIMEOUT_S)
+        except JobFailed as e:
+            status, result, error = "failed", e.response, str(e)
+        except asyncio.CancelledError:
+            status, error = "cancelled", "cancelado a pedido"
+        except asyncio.TimeoutError:
+            status, error = "failed", f"tempo limite do job ({JOBS_TIMEOUT_S:.0f}s)"
+        except Exception as e:
+            status, error = "failed", str(e)
+        finally:
+            self._running.pop(job.id, None)
+            totals = end_request(totals_token)
+
+        if status == "succeeded" or result is not None:
+            result = {"response": result, **totals}
+        elapsed = time.perf_counter() - start
+        if not self.store.finish(job, status, result=result, error=error):
+            metrics.JOBS.labels(kind=job.kind, status="stale").inc()
+            print(f"⏭️ [Jobs] {job.id} ({job.kind}) tentativa {job.attempts} descartada: o job foi retomado por outro worker.")
+            self._notify()
+            return
+        metrics.JOBS.labels(kind=job.kind, status=status).inc()
+        metrics.JOB_DURATION.labels(kind=job.kind, status=status).observe(elapsed)
+        icon = {"succeeded": "✅", "cancelled": "🛑"}.get(status, "❌")
+        print(f"{icon} [Jobs] {job.id} ({job.kind}) {status} em {elapsed:.1f}s" + (f": {error}" if error else ""))
+        self._notify()
+
+    async def _call_handler(self, job: Job) -> Any:
+        with span("job.run", **{"job.id": job.id, "job.kind": job.kind, "job.priority": job.priority}), \
+                request_scope(), llm_priority("batch"):
+            return await self.handlers[job.kind](job.payload)
+
+    # --- Supervisão: heartbeat, cancelamento vindo de outro processo, limpeza ---
+
+    async def _supervise(self) -> None:
+        last_reap = time.monotonic()
+        while True:
+            await asyncio.sleep(JOBS_POLL_S)
+            running = list(self._running)
+            try:
+                self.store.heartbeat(running)
+                for job_id in self.store.cancel_requested(running):
+                    self._cancel_local(job_id)
+                if time.monotonic() - last_reap > JOBS_STALE_S:
+                    last_reap = time.monotonic()
+                    self.store.requeue_stale(JOBS_STALE_S, JOBS_MAX_ATTEMPTS)
+                    self.store.purge(JOBS_RETENTION_S)
+                for status, n in self.store.counts().items():
+                    metrics.JOBS_BY_STATUS.labels(status=status).set(n)
+            except Exception as e:
+                print(f"⚠️ [Jobs] Supervisão falhou: {e}")
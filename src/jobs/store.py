@@ -0,0 +1,239 @@
+"""
+Persistência dos jobs em SQLite (a própria tabela é a fila).
+
+Um job passa por queued -> running -> succeeded | failed | cancelled. Os
+workers reivindicam o próximo job com um UPDATE atômico, então vários
+processos (gunicorn) podem dividir o mesmo arquivo sem pegar o mesmo job.
+Prioridade menor roda antes (0 = alta, 5 = normal, 9 = baixa).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+TERMINAL = ("succeeded", "failed", "cancelled")
+PRIORITIES = {"high": 0, "normal": 5, "low": 9}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at);
+"""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    priority: int
+    status: str
+    result: Any = None
+    error: Optional[str] = None
+    attempts: int = 0
+    cancel_requested: bool = False
+    worker: Optional[str] = None
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    heartbeat_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("heartbeat_at")
+        data["done"] = self.done
+        return data
+
+
+def parse_priority(value: Any) -> int:
+    """'high' / 'normal' / 'low' ou um inteiro de 0 a 9."""
+    if value is None:
+        return PRIORITIES["normal"]
+    if isinstance(value, str) and value.lower() in PRIORITIES:
+        return PRIORITIES[value.lower()]
+    priority = int(value)
+    if not 0 <= priority <= 9:
+        raise ValueError("priority deve estar entre 0 e 9")
+    return priority
+
+
+def _row_to_job(row: sqlite3.Row) -> Job:
+    data = dict(row)
+    data["payload"] = json.loads(data["payload"])
+    data["result"] = json.loads(data["result"]) if data["result"] is not None else None
+    data["cancel_requested"] = bool(data["cancel_requested"])
+    return Job(**data)
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def create(self, kind: str, payload: Dict[str, Any], priority: int) -> Job:
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            payload=payload,
+            priority=priority,
+            status="queued",
+            created_at=time.time(),
+        )
+        self._execute(
+            "INSERT INTO jobs (id, kind, payload, priority, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job.id, kind, json.dumps(payload, ensure_ascii=False), priority, job.status, job.created_at),
+        )
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+        if status:
+            rows = self._execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = self._execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_row_to_job(r) for r in rows]
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in STATUSES}
+        counts.update({r["status"]: r["n"] for r in rows})
+        return counts
+
+    def claim(self, worker: str, kinds: List[str]) -> Optional[Job]:
+        """Move o próximo job da fila (prioridade, depois ordem de chegada) para running."""
+        if not kinds:
+            return None
+        now = time.time()
+        marks = ",".join("?" for _ in kinds)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT id FROM jobs WHERE status = 'queued' AND kind IN ({marks}) "
+                    "ORDER BY priority, created_at LIMIT 1",
+                    kinds,
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                    "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                    (worker, now, now, row["id"]),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"])
+
+    def finish(self, job: Job, status: str, result: Any = None, error: Optional[str] = None) -> bool:
+        """
+        Grava o estado final da tentativa `job` (worker + nº da tentativa do claim).
+
+        Se o job foi devolvido à fila por falta de heartbeat e reivindicado de
+        novo (ou já falhou por isso), a tentativa antiga não sobrescreve nada:
+        retorna False.
+        """
+        return self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+            "WHERE id = ? AND status = 'running' AND worker = ? AND attempts = ?",
+            (
+                status,
+                json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                error,
+                time.time(),
+                job.id,
+                job.worker,
+                job.attempts,
+            ),
+        ).rowcount > 0
+
+    def request_cancel(self, job_id: str) -> Optional[Job]:
+        """Job na fila é cancelado na hora; em execução fica marcado para o worker interromper."""
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = 'cancelled', error = 'cancelado a pedido', finished_at = ? "
+            "WHERE id = ? AND status = 'queued'",
+            (now, job_id),
+        )
+        self._execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def cancel_requested(self, job_ids: List[str]) -> List[str]:
+        if not job_ids:
+            return []
+        marks = ",".join("?" for _ in job_ids)
+        rows = self._execute(
+            f"SELECT id FROM jobs WHERE cancel_requested = 1 AND status = 'running' AND id IN ({marks})", job_ids
+        ).fetchall()
+        return [r["id"] for r in rows]
+
+    def heartbeat(self, job_ids: List[str]) -> None:
+        if not job_ids:
+            return
+        marks = ",".join("?" for _ in job_ids)
+        self._execute(f"UPDATE jobs SET heartbeat_at = ? WHERE id IN ({marks})", [time.time(), *job_ids])
+
+    def requeue_stale(self, stale_after_s: float, max_attempts: int) -> int:
+        """Jobs 'running' sem heartbeat (processo morreu) voltam para a fila ou falham."""
+        cutoff = time.time() - stale_after_s
+        with self._lock:
+            failed = self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'worker interrompido', finished_at = ? "
+                "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                (time.time(), cutoff, max_attempts),
+            ).rowcount
+            requeued = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat_at < ?",
+                (cutoff,),
+            ).rowcount
+        if failed or requeued:
+            print(f"♻️ [Jobs] Jobs órfãos: {requeued} de volta na fila, {failed} marcados como falha.")
+        return requeued
+
+    def purge(self, older_than_s: float) -> int:
+        cutoff = time.time() - older_than_s
+        marks = ",".join("?" for _ in TERMINAL)
+        return self._execute(
+            f"DELETE FROM jobs WHERE status IN ({marks}) AND finished_at < ?", (*TERMINAL, cutoff)
+        ).rowcount
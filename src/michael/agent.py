@@ -4,6 +4,9 @@ from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types
 
+from observability import AgentRun
+from runtime import budget_for, model_for, rate_limit_after_model, rate_limit_before_model, resilient_model, run_with_budget
+
 michael_instruction = """
 <system_prompt>
 
@@ -128,8 +131,10 @@ michael_instruction = """
 """
 
 michael_agent = Agent(
-    model="gemini-2.5-flash", 
+    model=resilient_model(model_for("michael_scott_persona")),
     name="michael_scott_persona",
+    before_model_callback=rate_limit_before_model,
+    after_model_callback=rate_limit_after_model,
     instruction=michael_instruction
 )
 
@@ -154,14 +159,14 @@ async def chat_with_michael(user_message: str) -> str:
     
     msg = types.Content(role="user", parts=[types.Part(text=user_message)])
     
-    final_text = "I have nothing to say to you."
-    
-    async for event in runner.run_async(
-        user_id="camera_crew", 
-        session_id=session_id, 
-        new_message=msg
-    ):
-        if event.content and event.content.parts:
-            final_text = event.content.parts[0].text
-            
-    return final_text
\ No newline at end of file
+    with AgentRun(michael_agent.name, entrypoint="chat_with_michael") as run:
+        return await run_with_budget(
+            run,
+            runner.run_async(
+                user_id="camera_crew", 
+                session_id=session_id, 
+                new_message=msg
+            ),
+            budget_for(michael_agent.name),
+            default_text="I have nothing to say to you.",
+        )
\ No newline at end of file
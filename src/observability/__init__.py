@@ -0,0 +1,4 @@
+from .tracing import setup_tracing, span, traced
+from .runs import AgentRun
+
+__all__ = ["setup_tracing", "span", "traced", "AgentRun"]
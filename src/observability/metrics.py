@@ -0,0 +1,269 @@
+"""
+Métricas Prometheus da Dunder AI (expostas em GET /metrics).
+
+Se `prometheus_client` não estiver instalado, todas as métricas viram no-op
+e /metrics responde 501.
+
+Com vários processos (gunicorn), defina PROMETHEUS_MULTIPROC_DIR para agregar
+as métricas de todos os workers.
+"""
+import os
+from typing import Tuple
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+def _metric(cls_name: str, name: str, doc: str, labels=(), **kwargs):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    cls = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}[cls_name]
+    if cls_name == "gauge":
+        kwargs.setdefault("multiprocess_mode", "livesum")
+    return cls(name, doc, labelnames=labels, **kwargs)
+
+
+# Buckets pensados para chamadas de LLM (segundos a minutos).
+_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+_REMOTE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+HTTP_REQUEST_DURATION = _metric(
+    "histogram",
+    "dunder_http_request_duration_seconds",
+    "Latência das requisições HTTP por rota.",
+    labels=("route", "method", "status"),
+    buckets=_LATENCY_BUCKETS,
+)
+AGENT_INFLIGHT = _metric(
+    "gauge",
+    "dunder_agent_inflight",
+    "Execuções de agente em andamento.",
+    labels=("agent",),
+)
+AGENT_RUN_DURATION = _metric(
+    "histogram",
+    "dunder_agent_run_duration_seconds",
+    "Duração de cada execução de agente (Runner do ADK).",
+    labels=("agent",),
+    buckets=_LATENCY_BUCKETS,
+)
+REQUEST_LLM_TURNS = _metric(
+    "histogram",
+    "dunder_request_llm_turns",
+    "Turnos de LLM por requisição HTTP (somando agentes aninhados).",
+    labels=("route",),
+    buckets=_COUNT_BUCKETS,
+)
+REQUEST_TOOL_CALLS = _metric(
+    "histogram",
+    "dunder_request_tool_calls",
+    "Chamadas de ferramenta por requisição HTTP (somando agentes aninhados).",
+    labels=("route",),
+    buckets=_COUNT_BUCKETS,
+)
+LLM_TOKENS = _metric(
+    "counter",
+    "dunder_llm_tokens_total",
+    "Tokens consumidos no Gemini.",
+    labels=("agent", "kind"),
+)
+BUDGET_EXCEEDED = _metric(
+    "counter",
+    "dunder_agent_budget_exceeded_total",
+    "Execuções interrompidas por orçamento (turnos, tool calls, tokens, prazo).",
+    labels=("agent", "reason"),
+)
+RAG_RETRIEVAL_DURATION = _metric(
+    "histogram",
+    "dunder_rag_retrieval_duration_seconds",
+    "Latência do retrieval_query no Vertex RAG.",
+    labels=("source",),
+    buckets=_REMOTE_BUCKETS,
+)
+CACHE_REQUESTS = _metric(
+    "counter",
+    "dunder_cache_requests_total",
+    "Consultas a caches internos (hit/miss).",
+    labels=("cache", "result"),
+)
+RATE_LIMIT_WAIT = _metric(
+    "histogram",
+    "dunder_llm_ratelimit_wait_seconds",
+    "Espera no limitador global antes de cada turno de LLM, por classe de prioridade.",
+    labels=("model", "priority"),
+    buckets=(0, 0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+RATE_LIMIT_WAITING = _metric(
+    "gauge",
+    "dunder_llm_ratelimit_waiting",
+    "Turnos de LLM aguardando na fila do limitador.",
+    labels=("model", "priority"),
+)
+RATE_LIMIT_THROTTLED = _metric(
+    "counter",
+    "dunder_llm_ratelimit_throttled_total",
+    "Turnos que esperaram por saldo (rpm/tpm) ou desistiram (timeout).",
+    labels=("model", "priority", "reason"),
+)
+UPSTREAM_CALLS = _metric(
+    "counter",
+    "dunder_upstream_calls_total",
+    "Chamadas a upstreams remotos (Vertex RAG, Gemini, ElevenLabs) por resultado final.",
+    labels=("upstream", "op", "outcome"),
+)
+UPSTREAM_RETRIES = _metric(
+    "counter",
+    "dunder_upstream_retries_total",
+    "Novas tentativas após erro transitório (timeout, conexão, 429/5xx).",
+    labels=("upstream", "op"),
+)
+UPSTREAM_RETRIES_SKIPPED = _metric(
+    "counter",
+    "dunder_upstream_retries_skipped_total",
+    "Timeouts com o pool sem thread livre: o retry esperou vagar uma thread e a tentativa em curso seguiu valendo.",
+    labels=("upstream", "op"),
+)
+UPSTREAM_HEDGES = _metric(
+    "counter",
+    "dunder_upstream_hedges_total",
+    "Hedges por resultado: disparadas após o p95, vencedoras e puladas (pool sem thread livre).",
+    labels=("upstream", "op", "outcome"),
+)
+CIRCUIT_STATE = _metric(
+    "gauge",
+    "dunder_upstream_circuit_state",
+    "Estado do circuit breaker por upstream (0 fechado, 1 meio-aberto, 2 aberto).",
+    labels=("upstream",),
+    multiprocess_mode="max",
+)
+COMPLIANCE_POLICY_MODE = _metric(
+    "counter",
+    "dunder_compliance_policy_mode_total",
+    "Consultas de compliance com a política inteira no prompt (context) ou via retrieval, com o motivo.",
+    labels=("mode", "reason"),
+)
+BLOB_DOWNLOAD_BYTES = _metric(
+    "counter",
+    "dunder_blob_download_bytes_total",
+    "Bytes baixados do GCS para o cache local de blobs (agentPandas/blob_cache.py).",
+)
+PREFETCH = _metric(
+    "counter",
+    "dunder_prefetch_total",
+    "Alvos do prefetch especulativo do orquestrador por resultado (done, error, cancelled).",
+    labels=("target", "outcome"),
+)
+PLAN_RUNS = _metric(
+    "counter",
+    "dunder_plan_runs_total",
+    "Planos do orquestrador gravados (record) e repetidos sem planejamento (replay).",
+    labels=("mode", "status"),
+)
+MODEL_ESCALATIONS = _metric(
+    "counter",
+    "dunder_model_escalations_total",
+    "Execuções refeitas num modelo mais forte (JSON inválido, confiança baixa).",
+    labels=("agent", "reason"),
+)
+ROUTER_DECISIONS = _metric(
+    "counter",
+    "dunder_router_decisions_total",
+    "Decisões do roteador local de intenção (rota rápida ou LLM do orquestrador).",
+    labels=("intent", "path"),
+)
+JOBS = _metric(
+    "counter",
+    "dunder_jobs_total",
+    "Transições de estado dos jobs assíncronos (queued, succeeded, failed, cancelled; stale = tentativa antiga descartada).",
+    labels=("kind", "status"),
+)
+JOB_DURATION = _metric(
+    "histogram",
+    "dunder_job_duration_seconds",
+    "Duração da execução de cada job (do worker pegar o job até terminar).",
+    labels=("kind", "status"),
+    buckets=_LATENCY_BUCKETS + (600, 900),
+)
+JOBS_BY_STATUS = _metric(
+    "gauge",
+    "dunder_jobs_by_status",
+    "Jobs na tabela por estado (fila compartilhada: mesmo valor em todos os processos).",
+    labels=("status",),
+    multiprocess_mode="max",
+)
+BATCH_ITEMS = _metric(
+    "counter",
+    "dunder_batch_items_total",
+    "Perguntas executadas via /api/batch, por agente e resultado.",
+    labels=("agent", "status"),
+)
+DATAFRAME_RELOADS = _metric(
+    "counter",
+    "dunder_dataframe_reloads_total",
+    "Recargas completas do DataFrame de transações.",
+)
+DATAFRAME_LOAD_DURATION = _metric(
+    "histogram",
+    "dunder_dataframe_load_duration_seconds",
+    "Tempo de download + parse do CSV de transações.",
+    buckets=_REMOTE_BUCKETS,
+)
+TTS_BYTES = _metric(
+    "counter",
+    "dunder_tts_bytes_total",
+    "Bytes de áudio gerados pela ElevenLabs.",
+)
+TTS_DURATION = _metric(
+    "histogram",
+    "dunder_tts_duration_seconds",
+    "Latência da conversão texto-para-voz.",
+    buckets=_REMOTE_BUCKETS,
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def render() -> Tuple[bytes, str]:
+    """Serializa as métricas no formato de exposição do Prometheus."""
+    if not PROMETHEUS_AVAILABLE:
+        raise RuntimeError("prometheus_client não instalado")
+
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(), CONTENT_TYPE_LATEST
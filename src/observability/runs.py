@@ -0,0 +1,99 @@
+"""
+AgentRun: acompanha UMA execução do Runner do ADK (turnos, tool calls, tokens).
+
+Uso:
+    with AgentRun(agent.name, entrypoint="run_finance_tool") as run:
+        async for event in runner.run_async(...):
+            run.observe(event)
+"""
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from . import metrics
+from .tracing import set_attributes, span
+
+# Totais da requisição HTTP corrente (somados por todos os AgentRun aninhados).
+_request_totals: ContextVar[Optional[Dict[str, int]]] = ContextVar(
+    "dunder_request_totals", default=None
+)
+
+
+def begin_request():
+    """Abre o acumulador de turnos/tool calls da requisição. Retorna o token."""
+    return _request_totals.set({"llm_turns": 0, "tool_calls": 0})
+
+
+def end_request(token) -> Dict[str, int]:
+    totals = _request_totals.get() or {"llm_turns": 0, "tool_calls": 0}
+    _request_totals.reset(token)
+    return totals
+
+
+class AgentRun:
+    def __init__(self, agent_name: str, **attributes: Any):
+        self.agent_name = agent_name
+        self.attributes = attributes
+        self.llm_turns = 0
+        self.tool_calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.total_tokens = 0
+        self.budget_exceeded: Optional[str] = None
+        self._span_cm = None
+        self.span = None
+        self._start = 0.0
+
+    def __enter__(self) -> "AgentRun":
+        self._start = time.perf_counter()
+        metrics.AGENT_INFLIGHT.labels(agent=self.agent_name).inc()
+        self._span_cm = span(
+            f"agent.run {self.agent_name}",
+            **{"agent.name": self.agent_name},
+            **{f"agent.{k}": v for k, v in self.attributes.items()},
+        )
+        self.span = self._span_cm.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        metrics.AGENT_INFLIGHT.labels(agent=self.agent_name).dec()
+        metrics.AGENT_RUN_DURATION.labels(agent=self.agent_name).observe(
+            time.perf_counter() - self._start
+        )
+        metrics.LLM_TOKENS.labels(agent=self.agent_name, kind="prompt").inc(self.prompt_tokens)
+        metrics.LLM_TOKENS.labels(agent=self.agent_name, kind="output").inc(self.output_tokens)
+
+        totals = _request_totals.get()
+        if totals is not None:
+            totals["llm_turns"] += self.llm_turns
+            totals["tool_calls"] += self.tool_calls
+
+        set_attributes(
+            self.span,
+            **{
+                "agent.llm_turns": self.llm_turns,
+                "agent.tool_calls": self.tool_calls,
+                "llm.tokens.prompt": self.prompt_tokens,
+                "llm.tokens.output": self.output_tokens,
+                "llm.tokens.total": self.total_tokens,
+            },
+        )
+        return self._span_cm.__exit__(exc_type, exc, tb)
+
+    def observe(self, event) -> None:
+        """Contabiliza um Event do ADK (resposta do modelo ou tool response)."""
+        content = getattr(event, "content", None)
+        if content is not None and content.role == "model" and not event.partial:
+            self.llm_turns += 1
+
+        calls = event.get_function_calls() if content is not None else []
+        if calls:
+            self.tool_calls += len(calls)
+            for call in calls:
+                self.span.add_event("tool_call", {"tool.name": call.name or ""})
+
+        usage = getattr(event, "usage_metadata", None)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_token_count or 0
+            self.output_tokens += usage.candidates_token_count or 0
+            self.total_tokens += usage.total_token_count or 0
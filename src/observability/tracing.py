@@ -0,0 +1,219 @@
+"""
+Tracing estruturado (OpenTelemetry) da Dunder AI.
+
+Hierarquia dos spans de uma requisição:
+    request  ->  agent.run  ->  call_llm / execute_tool (emitidos pelo ADK)  ->  remoto
+                                                       (rag.retrieval, dataframe.load, tts.convert)
+
+Variáveis de ambiente:
+    TRACING_ENABLED=1                  liga o exportador (desligado = spans no-op)
+    TRACE_EXPORT_PATH=cache/traces.jsonl   arquivo JSON Lines (um span por linha)
+    OTEL_EXPORTER_OTLP_ENDPOINT=...    exporta também via OTLP/HTTP, se instalado
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        SpanExporter,
+        SpanExportResult,
+    )
+
+    _OTEL_AVAILABLE = True
+except ImportError:
+    _OTEL_AVAILABLE = False
+    SpanExporter = object
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
+
+DEFAULT_EXPORT_PATH = os.path.join(project_root, "cache", "traces.jsonl")
+
+_setup_lock = threading.Lock()
+_configured = False
+
+
+class JsonFileSpanExporter(SpanExporter):
+    """Exporta spans finalizados como JSON Lines num arquivo local."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans) -> "SpanExportResult":
+        lines = [json.dumps(_span_to_dict(s), ensure_ascii=False) for s in spans]
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            print(f"⚠️ [Tracing] Falha ao exportar spans: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def _span_to_dict(s) -> Dict[str, Any]:
+    ctx = s.get_span_context()
+    return {
+        "trace_id": format(ctx.trace_id, "032x"),
+        "span_id": format(ctx.span_id, "016x"),
+        "parent_id": format(s.parent.span_id, "016x") if s.parent else None,
+        "name": s.name,
+        "start_ns": s.start_time,
+        "end_ns": s.end_time,
+        "duration_ms": (s.end_time - s.start_time) / 1e6 if s.end_time else None,
+        "status": s.status.status_code.name,
+        "attributes": dict(s.attributes or {}),
+        "events": [
+            {"name": e.name, "attributes": dict(e.attributes or {})} for e in s.events
+        ],
+    }
+
+
+def setup_tracing(service_name: str = "dunder-ai") -> bool:
+    """
+    Configura o TracerProvider global (idempotente).
+
+    Os spans do próprio ADK (invocation, invoke_agent, call_llm, execute_tool)
+    passam a ser exportados junto com os nossos.
+    """
+    global _configured
+
+    if not _OTEL_AVAILABLE or os.getenv("TRACING_ENABLED", "0") != "1":
+        return False
+
+    with _setup_lock:
+        if _configured:
+            return True
+
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": service_name})
+        )
+        path = os.getenv("TRACE_EXPORT_PATH", DEFAULT_EXPORT_PATH)
+        provider.add_span_processor(BatchSpanProcessor(JsonFileSpanExporter(path)))
+
+        if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+            try:
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+                    OTLPSpanExporter,
+                )
+
+                provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            except ImportError:
+                print("⚠️ [Tracing] Exportador OTLP não instalado, usando só JSON.")
+
+        trace.set_tracer_provider(provider)
+        _configured = True
+        print(f"🧭 [Tracing] Spans exportados para {path}")
+        return True
+
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _clean(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    """OTel só aceita str/bool/int/float (ou listas deles) como atributo."""
+    cleaned = {}
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, (str, bool, int, float)):
+            cleaned[key] = value
+        elif isinstance(value, (list, tuple)):
+            cleaned[key] = [str(v) for v in value]
+        else:
+            cleaned[key] = str(value)
+    return cleaned
+
+
+def _tracer():
+    return trace.get_tracer("dunderai")
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Abre um span filho do span corrente. Use `span.set_attribute` dentro."""
+    if not _OTEL_AVAILABLE:
+        yield _NOOP_SPAN
+        return
+    with _tracer().start_as_current_span(name, attributes=_clean(attributes)) as s:
+        yield s
+
+
+def traced(name: Optional[str] = None, **attributes):
+    """Decorator (sync ou async) que envolve a função num span."""
+
+    def decorator(func):
+        span_name = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, **attributes):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def start_span(name: str, **attributes):
+    """
+    Abre um span e o torna corrente sem `with` (para hooks before/after do Flask).
+
+    Retorna (span, token); feche com `end_span`.
+    """
+    if not _OTEL_AVAILABLE:
+        return _NOOP_SPAN, None
+    s = _tracer().start_span(name, attributes=_clean(attributes))
+    token = otel_context.attach(trace.set_span_in_context(s))
+    return s, token
+
+
+def end_span(s, token, **attributes) -> None:
+    s.set_attributes(_clean(attributes))
+    s.end()
+    if token is not None:
+        otel_context.detach(token)
+
+
+def set_attributes(s, **attributes) -> None:
+    s.set_attributes(_clean(attributes))
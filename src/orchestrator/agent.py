@@ -14,16 +14,24 @@ if parent_dir not in sys.path:
 try:
     from RAGEmails.agent import run_investigation_tool
     from agentCompliance.agent import run_compliance_tool
+    from agentCompliance.rules import scan_compliance_violations
+    from RAGEmails.linkage import link_email_evidence
     from agentPandas.agent import run_finance_tool, detect_fraud_patterns
     
 except ImportError as e:
     raise ImportError(f"❌ O Orquestrador não achou os agentes irmãos. Erro: {e}")
 
+from runtime import model_for, rate_limit_after_model, rate_limit_before_model, resilient_model
+from orchestrator.plans import plan_turn_started, record_plan_tool_call
+
 root_agent = Agent(
-    model="gemini-2.5-flash",
+    model=resilient_model(model_for("michael_orchestrator")),
     name="michael_orchestrator",
+    before_model_callback=[rate_limit_before_model, plan_turn_started],
+    after_model_callback=rate_limit_after_model,
+    before_tool_callback=record_plan_tool_call,
     description="Orquestrador Central",
-    tools=[run_investigation_tool, run_compliance_tool, run_finance_tool, detect_fraud_patterns],
+    tools=[run_investigation_tool, run_compliance_tool, run_finance_tool, detect_fraud_patterns, scan_compliance_violations, link_email_evidence],
     
     instruction="""
 <system_instructions>
@@ -48,7 +56,7 @@ root_agent = Agent(
     </anti_hallucination_policy>
 
     <available_tools>
-        You have access to 4 specialist tools:
+        You have access to 6 specialist tools:
 
         1. **`run_investigation_tool(foco: str)`** -> *THE DETECTIVE*
            - Scans emails for intent/plans. `foco` = "SOCIAL" or "FINANCEIRO".
@@ -62,6 +70,14 @@ root_agent = Agent(
 
         4. **`run_compliance_tool(query: str)`** -> *THE LAWYER*
            - Checks if an action is allowed.
+
+        5. **`scan_compliance_violations(max_results: int)`** -> *THE BULK AUDITOR*
+           - Checks EVERY transaction against the compiled policy rules (category limits, receipts, split purchases, approvals, prohibited items) in one pass.
+           - Each violation comes with the policy citation. Prefer this over calling `run_compliance_tool` once per transaction.
+
+        6. **`link_email_evidence(employee: str)`** -> *THE EVIDENCE LINKER*
+           - Deterministically joins emails (sender, people mentioned, dates, dollar amounts) with bank transactions (`funcionario`, `data`, `valor`).
+           - Returns matched email/transaction pairs with a score and which fields matched. `employee` is optional.
     </available_tools>
 
     <orchestration_logic>
@@ -70,15 +86,14 @@ root_agent = Agent(
         ### FLOW 1: COMPLEX FRAUD AUDIT (The "Fraud Triangle")
         *Trigger:* User asks to investigate embezzlement, "schemes", hidden fraud, or "financial plotting".
         
-        1. **Step A (The Intent):** Call `run_investigation_tool(foco="FINANCEIRO")`.
-           - *Goal:* Discover IF someone planned something and WHEN.
-           - *Input:* The output will be a JSON. Read the `evidence` field carefully.
+        1. **Step A (Intent + Fact in one call):** Call `link_email_evidence()` (pass `employee` if the user named someone).
+           - *Goal:* Get the pairs "[Person] wrote about $X on date D" <-> "transaction of $X by [Person] on date D'".
+           - Pairs with `matched_on` containing "valor" and "funcionario" are strong evidence. Ignore pairs with score below 0.6.
         
-        2. **Step B (The Fact):** If Step A returns suspicious dates, names, or items, use this data to call `run_finance_tool`.
-           - *Dynamic Prompting:* "Check if [NAME FOUND IN EMAIL] spent money on [ITEM] or around date [DATE FOUND IN EMAIL]."
-           - *Constraint:* If Step A finds nothing, skip Step B and report no evidence found.
+        2. **Step B (Fallback only):** If Step A returns no strong pair, call `run_investigation_tool(foco="FINANCEIRO")` and, for suspicious names/dates/items it finds, `run_finance_tool`.
+           - *Constraint:* If both find nothing, report no evidence found.
         
-        3. **Step C (The Judgment):** With the real values from Step B, call `run_compliance_tool`.
+        3. **Step C (The Judgment):** With the real values from the matched transactions, call `run_compliance_tool`.
            - *Dynamic Prompting:* "Does the policy allow [ACTUAL ACTION] in the amount of [ACTUAL VALUE]?"
         
         4. **Step D (The Verdict):** Answer the user by triangulating the 3 points: "[Person] planned X (Email), executed Y (Bank), which violates rule Z (Compliance)."
@@ -96,9 +111,9 @@ root_agent = Agent(
         
         ### FLOW 4: GENERAL AUDIT
         *Trigger:* User asks "Are there any anomalies?" or "Scan for fraud".
-        1. Call `detect_fraud_patterns()`.
+        1. Call `detect_fraud_patterns()` and `scan_compliance_violations()`.
         2. If patterns are found, use `run_investigation_tool` to see if emails explain them.
-        3. Report findings.
+        3. Report findings, citing the policy rule for each violation.
     </orchestration_logic>
 
     <response_guidelines>
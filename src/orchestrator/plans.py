@@ -0,0 +1,333 @@
+"""
+Planos de ferramentas do orquestrador: gravar uma vez, repetir sem planejar.
+
+Auditorias recorrentes (a mesma varredura de fraude toda manhã) fazem o
+`michael_orchestrator` redescobrir a mesma sequência de tool calls a cada
+execução. Uma execução do orquestrador pode ser GRAVADA como template:
+
+    {"name": "varredura_diaria",
+     "query": "Investigue os gastos de {{employee}}",
+     "params": {"employee": "Ryan Howard"},
+     "steps": [[{"tool": "link_email_evidence", "args": {"employee": "{{employee}}"}}],
+               [{"tool": "run_compliance_tool", "args": {"query": "..."}}]]}
+
+Cada passo é um turno do LLM (as chamadas do mesmo turno rodam em paralelo).
+Valores de `params` encontrados na pergunta e nos argumentos viram
+`{{nome}}`. No REPLAY as ferramentas rodam direto, passo a passo, e o LLM é
+chamado uma única vez, para a síntese final (`plan_synthesizer`). Argumentos
+que o LLM derivou de resultados anteriores ficam fixos como foram gravados.
+
+Os planos ficam em PLANS_DIR (default <raiz>/cache/plans/<nome>.json).
+"""
+import asyncio
+import copy
+import inspect
+import json
+import os
+import re
+import sys
+import time
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from google.adk.agents.llm_agent import Agent
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_root = os.path.dirname(parent_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from observability import metrics, span
+from runtime import model_for, rate_limit_after_model, rate_limit_before_model, request_scope, resilient_model, usable_answer
+
+PLANS_DIR = os.getenv("PLANS_DIR", os.path.join(project_root, "cache", "plans"))
+PLAN_RESULT_MAX_CHARS = int(os.getenv("PLAN_RESULT_MAX_CHARS", "6000"))
+
+_NAME_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+_PLACEHOLDER_RE = re.compile(r"\{\{(\w+)\}\}")
+
+RunSession = Callable[[Agent, str, str], Awaitable[str]]
+
+
+@dataclass
+class Plan:
+    name: str
+    query: str
+    steps: List[List[Dict[str, Any]]]
+    params: Dict[str, Any] = field(default_factory=dict)
+    created_at: float = 0.0
+    recorded_llm_turns: int = 0
+
+    @property
+    def tool_calls(self) -> int:
+        return sum(len(step) for step in self.steps)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "query": self.query,
+            "params": self.params,
+            "steps": len(self.steps),
+            "tool_calls": self.tool_calls,
+            "created_at": self.created_at,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Persistência
+# ---------------------------------------------------------------------------
+
+
+def _plan_path(name: str) -> str:
+    if not _NAME_RE.match(name or ""):
+        raise ValueError("Nome de plano inválido (use a-z, 0-9, '_' e '-', até 64 caracteres)")
+    return os.path.join(PLANS_DIR, f"{name}.json")
+
+
+def save_plan(plan: Plan) -> str:
+    path = _plan_path(plan.name)
+    os.makedirs(PLANS_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(asdict(plan), f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_plan(name: str) -> Optional[Plan]:
+    try:
+        with open(_plan_path(name), "r", encoding="utf-8") as f:
+            return Plan(**json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def list_plans() -> List[Plan]:
+    if not os.path.isdir(PLANS_DIR):
+        return []
+    names = sorted(f[:-5] for f in os.listdir(PLANS_DIR) if f.endswith(".json"))
+    return [plan for plan in (load_plan(n) for n in names if _NAME_RE.match(n)) if plan]
+
+
+def delete_plan(name: str) -> bool:
+    try:
+        os.remove(_plan_path(name))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+# ---------------------------------------------------------------------------
+# Parâmetros ({{nome}})
+# ---------------------------------------------------------------------------
+
+
+def parameterize(value: Any, params: Dict[str, Any]) -> Any:
+    """Troca os valores de `params` encontrados em `value` por {{nome}} (palavra inteira: "Ryan" não casa em "Bryant")."""
+    if isinstance(value, dict):
+        return {k: parameterize(v, params) for k, v in value.items()}
+    if isinstance(value, list):
+        return [parameterize(v, params) for v in value]
+    for name, raw in params.items():
+        if isinstance(raw, bool) or raw in (None, ""):
+            continue
+        if value == raw:
+            return f"{{{{{name}}}}}"
+        if isinstance(value, str) and isinstance(raw, str):
+            value = re.sub(rf"(?<!\w){re.escape(raw)}(?!\w)", f"{{{{{name}}}}}", value, flags=re.IGNORECASE)
+    return value
+
+
+def fill(value: Any, params: Dict[str, Any]) -> Any:
+    """Inverso de parameterize: `{{nome}}` sozinho mantém o tipo do parâmetro."""
+    if isinstance(value, dict):
+        return {k: fill(v, params) for k, v in value.items()}
+    if isinstance(value, list):
+        return [fill(v, params) for v in value]
+    if not isinstance(value, str):
+        return value
+    missing = [m for m in _PLACEHOLDER_RE.findall(value) if m not in params]
+    if missing:
+        raise ValueError(f"Parâmetro(s) sem valor: {', '.join(sorted(set(missing)))}")
+    whole = _PLACEHOLDER_RE.fullmatch(value)
+    if whole:
+        return params[whole.group(1)]
+    return _PLACEHOLDER_RE.sub(lambda m: str(params[m.group(1)]), value)
+
+
+# ---------------------------------------------------------------------------
+# Gravação (callbacks do michael_orchestrator)
+# ---------------------------------------------------------------------------
+
+
+class _Recorder:
+    def __init__(self):
+        self.turn = 0
+        self.calls: List[Tuple[int, str, Dict[str, Any]]] = []
+
+    def steps(self) -> List[List[Dict[str, Any]]]:
+        steps: Dict[int, List[Dict[str, Any]]] = {}
+        for turn, tool, args in self.calls:
+            steps.setdefault(turn, []).append({"tool": tool, "args": args})
+        return [steps[turn] for turn in sorted(steps)]
+
+
+_recorder: ContextVar[Optional[_Recorder]] = ContextVar("dunder_plan_recorder", default=None)
+
+
+def plan_turn_started(callback_context, llm_request):
+    """before_model_callback do orquestrador: cada turno do LLM abre um passo."""
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.turn += 1
+    return None
+
+
+def record_plan_tool_call(tool, args, tool_context):
+    """before_tool_callback do orquestrador: anota a chamada se há gravação ativa."""
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.calls.append((recorder.turn, tool.name, copy.deepcopy(dict(args))))
+    return None
+
+
+async def record_plan(
+    name: str, message: str, params: Dict[str, Any], run_session: RunSession
+) -> Tuple[Plan, str]:
+    """Roda o orquestrador (LLM completo) e grava as tool calls como template."""
+    from orchestrator.agent import root_agent
+
+    _plan_path(name)  # valida o nome antes de gastar turnos de LLM
+    recorder = _Recorder()
+    token = _recorder.set(recorder)
+    try:
+        with span("plan.record", **{"plan.name": name}):
+            response = await run_session(root_agent, message, "plan")
+    finally:
+        _recorder.reset(token)
+
+    if not recorder.calls:
+        metrics.PLAN_RUNS.labels(mode="record", status="empty").inc()
+        raise ValueError("O orquestrador respondeu sem chamar ferramentas; não há plano para gravar")
+    if not usable_answer(response):
+        # Execução com erro ou cortada por orçamento: o plano repetiria um caminho incompleto.
+        metrics.PLAN_RUNS.labels(mode="record", status="failed").inc()
+        first = response.strip().splitlines()[0][:300] if isinstance(response, str) and response.strip() else "resposta vazia"
+        raise ValueError(f"A execução gravada não terminou bem; plano não salvo: {first}")
+
+    plan = Plan(
+        name=name,
+        query=parameterize(message, params),
+        steps=parameterize(recorder.steps(), params),
+        params=params,
+        created_at=time.time(),
+        recorded_llm_turns=recorder.turn,
+    )
+    path = save_plan(plan)
+    metrics.PLAN_RUNS.labels(mode="record", status="ok").inc()
+    print(f"📝 [Plans] '{name}' gravado em {path}: {len(plan.steps)} passo(s), {plan.tool_calls} tool call(s).")
+    return plan, response
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+SYNTHESIS_PROMPT = """
+<system_instructions>
+    <role>
+        You are the **Chief Auditor (Orchestrator)** of Dunder Mifflin.
+        The specialist tools of a pre-approved audit plan were ALREADY executed. You receive the user's request
+        and the raw output of every tool call. Write the final audit answer. Do not plan further steps.
+    </role>
+
+    <language_rules>
+        Answer in the language of the user's request (Portuguese or English).
+    </language_rules>
+
+    <anti_hallucination_policy>
+        **ZERO TOLERANCE FOR FABRICATION.**
+        - Use ONLY facts present in the tool outputs. If a tool returned no data or an error, say so.
+        - Always cite the source of each conclusion (email, bank statement, policy rule).
+        - If the tool outputs conflict, report the conflict.
+    </anti_hallucination_policy>
+
+    <response_guidelines>
+        - **Be Executive:** Speak like a Senior Auditor.
+        - **Evidence Based:** "The investigation revealed [Evidence A], which was confirmed by financial record [Evidence B]..."
+        - **Transparency:** If a tool fails or finds nothing, state it clearly. Do not guess.
+    </response_guidelines>
+</system_instructions>
+"""
+
+plan_synthesizer = Agent(
+    model=resilient_model(model_for("plan_synthesizer")),
+    name="plan_synthesizer",
+    before_model_callback=rate_limit_before_model,
+    after_model_callback=rate_limit_after_model,
+    description="Redige a resposta final de um plano de auditoria já executado",
+    instruction=SYNTHESIS_PROMPT,
+)
+
+
+def _tool_registry() -> Dict[str, Callable[..., Any]]:
+    from orchestrator.agent import root_agent
+
+    return {getattr(t, "name", None) or t.__name__: t for t in root_agent.tools}
+
+
+async def _call_tool(tools: Dict[str, Callable[..., Any]], name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    call: Dict[str, Any] = {"tool": name, "args": args}
+    with span("plan.tool", **{"plan.tool": name}):
+        try:
+            if name not in tools:
+                raise LookupError(f"ferramenta '{name}' não existe mais no orquestrador")
+            result = tools[name](**args)
+            call["result"] = await result if inspect.isawaitable(result) else result
+        except Exception as e:
+            call["error"] = f"{type(e).__name__}: {e}"
+    call["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return call
+
+
+def _synthesis_message(query: str, calls: List[Dict[str, Any]]) -> str:
+    blocks = []
+    for i, call in enumerate(calls, 1):
+        output = call.get("result", {"error": call.get("error")})
+        text = output if isinstance(output, str) else json.dumps(output, ensure_ascii=False, default=str)
+        if len(text) > PLAN_RESULT_MAX_CHARS:
+            text = text[:PLAN_RESULT_MAX_CHARS] + " …[truncado]"
+        args = json.dumps(call["args"], ensure_ascii=False, default=str)
+        blocks.append(f"### {i}. {call['tool']}({args})\n{text}")
+    return f"<user_request>\n{query}\n</user_request>\n\n<tool_results>\n" + "\n\n".join(blocks) + "\n</tool_results>"
+
+
+async def replay_plan(plan: Plan, params: Optional[Dict[str, Any]], run_session: RunSession) -> Dict[str, Any]:
+    """Executa as tool calls do plano (sem turnos de planejamento) e sintetiza com UMA chamada ao LLM."""
+    values = {**plan.params, **(params or {})}
+    query = fill(plan.query, values)
+    steps = [[(c["tool"], fill(c["args"], values)) for c in step] for step in plan.steps]
+    tools = _tool_registry()
+
+    start = time.perf_counter()
+    calls: List[Dict[str, Any]] = []
+    with request_scope(), span("plan.replay", **{"plan.name": plan.name, "plan.steps": len(steps)}):
+        for step in steps:
+            calls += await asyncio.gather(*(_call_tool(tools, name, args) for name, args in step))
+        tools_ms = round((time.perf_counter() - start) * 1000, 1)
+        response = await run_session(plan_synthesizer, _synthesis_message(query, calls), "plan_replay")
+
+    failed = sum("error" in c for c in calls)
+    metrics.PLAN_RUNS.labels(mode="replay", status="partial" if failed else "ok").inc()
+    print(f"▶️ [Plans] '{plan.name}': {len(calls)} tool call(s) em {tools_ms} ms ({failed} com erro) + síntese.")
+    return {
+        "plan": plan.name,
+        "query": query,
+        "response": response,
+        "calls": [{k: v for k, v in c.items() if k != "result"} for c in calls],
+        "tools_ms": tools_ms,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
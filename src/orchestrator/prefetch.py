@@ -0,0 +1,153 @@
+"""
+Prefetch especulativo no início de uma auditoria do orquestrador.
+
+O `michael_orchestrator` só chama as ferramentas depois do primeiro turno do
+LLM (segundos). Enquanto esse turno roda, o pedido é classificado pelo
+roteador local (orchestrator/router.py) e os dados que a intenção costuma
+usar já começam a carregar em paralelo:
+
+  - dataframe:        extrato (load_dataframe_async, single-flight);
+  - fraud_patterns:   detect_fraud_patterns() no escopo da requisição;
+  - email_evidence:   link_email_evidence() (corpus + índices do extrato);
+  - email_retrieval:  ids do emails.txt no Vertex RAG + índice local de e-mails;
+  - compliance:       política (load_policy) e, se o compliance for por
+                      retrieval, ids + BM25 de politica_compliance.txt.
+
+Ferramentas rodam dentro do `request_scope()` da requisição: a tool call real
+com os mesmos argumentos reaproveita o resultado (ou aguarda o que está em
+andamento). Nada aqui chama o LLM. O que não terminou quando o orquestrador
+responde é cancelado.
+
+Configuração via env:
+    PREFETCH_ENABLED=1
+    PREFETCH_MIN_CONFIDENCE=0.5   (abaixo disso só dataframe + compliance)
+"""
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from observability import metrics, span
+from orchestrator.router import ROUTER_ENABLED, get_router
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1").lower() in ("1", "true", "yes")
+PREFETCH_MIN_CONFIDENCE = float(os.getenv("PREFETCH_MIN_CONFIDENCE", "0.5"))
+
+COMPLIANCE_FILES = ["politica_compliance.txt"]
+EMAIL_FILES = ["emails.txt"]
+
+
+async def _dataframe() -> None:
+    from agentPandas.tools import _get_gs_path, load_dataframe_async
+
+    await load_dataframe_async(_get_gs_path())
+
+
+async def _fraud_patterns() -> None:
+    from agentPandas.tools import detect_fraud_patterns
+
+    await detect_fraud_patterns()
+
+
+async def _email_evidence() -> None:
+    from RAGEmails.linkage import link_email_evidence
+
+    await link_email_evidence()
+
+
+async def _email_retrieval() -> None:
+    from RAGEmails.index import load_index
+    from rag.embedding import resolver_ids_async
+
+    await asyncio.gather(resolver_ids_async(EMAIL_FILES), load_index())
+
+
+async def _compliance() -> None:
+    from agentCompliance.policy import policy_for_context
+
+    policy, _ = await policy_for_context()
+    if policy is None:
+        from rag.embedding import resolver_ids_async
+        from rag.hybrid import preload_lexical
+
+        await asyncio.gather(resolver_ids_async(COMPLIANCE_FILES), preload_lexical(COMPLIANCE_FILES))
+
+
+TARGETS: Dict[str, Callable[[], Awaitable[None]]] = {
+    "dataframe": _dataframe,
+    "fraud_patterns": _fraud_patterns,
+    "email_evidence": _email_evidence,
+    "email_retrieval": _email_retrieval,
+    "compliance": _compliance,
+}
+
+# Intenção (orchestrator/intents.json) -> o que as tool calls dela costumam ler.
+PREFETCH_BY_INTENT: Dict[str, List[str]] = {
+    "fraud_triangle": ["dataframe", "email_evidence", "fraud_patterns", "compliance"],
+    "social": ["email_retrieval", "compliance"],
+    "rule_check": ["compliance"],
+    "general_audit": ["dataframe", "fraud_patterns", "email_retrieval", "compliance"],
+}
+FALLBACK_TARGETS = ["dataframe", "compliance"]
+
+
+def plan_prefetch(query: str) -> List[str]:
+    """Alvos do prefetch para `query` (classificação local, ~0.1 ms)."""
+    if not PREFETCH_ENABLED or not ROUTER_ENABLED or not query:
+        return []
+    route = get_router().classify(query)
+    if route.confidence < PREFETCH_MIN_CONFIDENCE:
+        return list(FALLBACK_TARGETS)
+    return list(PREFETCH_BY_INTENT.get(route.intent, FALLBACK_TARGETS))
+
+
+async def _run_target(name: str) -> float:
+    start = time.perf_counter()
+    try:
+        with span("prefetch.target", **{"prefetch.target": name}):
+            await TARGETS[name]()
+    except asyncio.CancelledError:
+        metrics.PREFETCH.labels(target=name, outcome="cancelled").inc()
+        raise
+    except Exception as e:
+        # Especulativo: a tool call real tenta de novo e reporta o erro.
+        metrics.PREFETCH.labels(target=name, outcome="error").inc()
+        print(f"⚠️ [Prefetch] {name} falhou ({type(e).__name__}: {e}); seguindo sem.")
+        raise
+    metrics.PREFETCH.labels(target=name, outcome="done").inc()
+    return time.perf_counter() - start
+
+
+@asynccontextmanager
+async def speculative_prefetch(query: str):
+    """
+    Dispara o prefetch de `query` e cancela o que sobrar na saída.
+
+    Use dentro do mesmo `request_scope()` do agente para que as tool calls
+    reaproveitem os resultados.
+    """
+    targets = plan_prefetch(query)
+    tasks = {name: asyncio.create_task(_run_target(name)) for name in targets}
+    if tasks:
+        print(f"🔮 [Prefetch] Aquecendo em paralelo ao 1º turno do LLM: {', '.join(targets)}")
+    try:
+        yield targets
+    finally:
+        pending = [t for t in tasks.values() if not t.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        ready = [
+            f"{name} {task.result() * 1000:.0f} ms"
+            for name, task in tasks.items()
+            if not task.cancelled() and task.exception() is None
+        ]
+        if tasks:
+            print(f"🔮 [Prefetch] Prontos: {', '.join(ready) or '-'}; cancelados: {len(pending)}")
@@ -0,0 +1,322 @@
+"""
+Roteador local de intenção, antes do LLM do orquestrador.
+
+Classifica o pedido em um dos FLOWs (orchestrator/intents.json) com
+palavras-chave + Naive Bayes multinomial treinado nos exemplos rotulados.
+Pedidos claros de FLOW 3 (regra) e FLOW 4 (varredura geral) vão direto para
+o especialista, sem o turno de decisão do `michael_orchestrator`; o resto
+(ou qualquer dúvida) segue para o LLM. A resposta sai em texto, no idioma da
+pergunta: o veredito JSON do compliance vira sim/não com a base na política, e
+a varredura manda os padrões encontrados ao profiler (FLOW 4, passo 2).
+
+Configuração via env:
+    ROUTER_ENABLED=1
+    ROUTER_FAST_INTENTS=rule_check,general_audit
+    ROUTER_MIN_CONFIDENCE=0.85
+"""
+import asyncio
+import json
+import math
+import os
+import re
+import sys
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from observability import metrics, span
+from runtime import usable_answer
+
+INTENTS_PATH = os.getenv("ROUTER_INTENTS_PATH", os.path.join(current_dir, "intents.json"))
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "1").lower() in ("1", "true", "yes")
+ROUTER_FAST_INTENTS = {
+    i.strip() for i in os.getenv("ROUTER_FAST_INTENTS", "rule_check,general_audit").split(",") if i.strip()
+}
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.85"))
+# Palavra-chave do intent multiplica a probabilidade do modelo por este fator.
+KEYWORD_BOOST = 4.0
+
+_PT_HINTS = {"posso", "de", "que", "nao", "uma", "para", "com", "existe", "faca", "quais", "tem", "sem"}
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().casefold()
+
+
+def _features(text: str) -> List[str]:
+    """Palavras + bigramas (sem remover stopwords: "posso"/"can i" são o sinal)."""
+    words = re.findall(r"[a-z0-9$]+", _normalize(text))
+    words = ["<num>" if re.fullmatch(r"\$?\d+", w) else w for w in words]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def detect_language(text: str) -> str:
+    words = set(re.findall(r"[a-z]+", _normalize(text)))
+    return "pt" if words & _PT_HINTS or re.search(r"[ãõçéêáíóú]", text.lower()) else "en"
+
+
+@dataclass
+class Route:
+    intent: str
+    confidence: float
+    fast_path: bool
+    keywords: List[str] = field(default_factory=list)
+    scores: Dict[str, float] = field(default_factory=dict)
+    reason: str = ""
+
+
+class IntentRouter:
+    """Naive Bayes multinomial (suavização de Laplace) + reforço por palavra-chave."""
+
+    def __init__(self, intents: Dict[str, Dict[str, Any]], min_confidence: float = ROUTER_MIN_CONFIDENCE,
+                 fast_intents=ROUTER_FAST_INTENTS):
+        self.intents = intents
+        self.min_confidence = min_confidence
+        self.fast_intents = set(fast_intents)
+        self.keywords = {
+            name: [re.compile(rf"\b{kw}\b") for kw in spec.get("keywords", [])]
+            for name, spec in intents.items()
+        }
+
+        counts = {name: Counter(f for ex in spec["examples"] for f in _features(ex)) for name, spec in intents.items()}
+        self.vocab = set().union(*counts.values())
+        total_examples = sum(len(spec["examples"]) for spec in intents.values())
+        self.log_prior = {name: math.log(len(spec["examples"]) / total_examples) for name, spec in intents.items()}
+        self.log_likelihood: Dict[str, Dict[str, float]] = {}
+        self.log_unseen: Dict[str, float] = {}
+        for name, counter in counts.items():
+            denom = sum(counter.values()) + len(self.vocab)
+            self.log_likelihood[name] = {f: math.log((c + 1) / denom) for f, c in counter.items()}
+            self.log_unseen[name] = math.log(1 / denom)
+
+    @classmethod
+    def from_file(cls, path: str = INTENTS_PATH, **kwargs) -> "IntentRouter":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["intents"], **kwargs)
+
+    def keyword_hits(self, text: str) -> Dict[str, List[str]]:
+        normalized = _normalize(text)
+        hits = {}
+        for name, patterns in self.keywords.items():
+            found = sorted({m.group(0) for p in patterns for m in [p.search(normalized)] if m})
+            if found:
+                hits[name] = found
+        return hits
+
+    def probabilities(self, text: str) -> Dict[str, float]:
+        features = [f for f in _features(text) if f in self.vocab]
+        log_scores = {
+            name: self.log_prior[name] + sum(self.log_likelihood[name].get(f, self.log_unseen[name]) for f in features)
+            for name in self.intents
+        }
+        top = max(log_scores.values())
+        exp = {name: math.exp(s - top) for name, s in log_scores.items()}
+        total = sum(exp.values())
+        return {name: v / total for name, v in exp.items()}
+
+    def classify(self, text: str) -> Route:
+        probs = self.probabilities(text)
+        hits = self.keyword_hits(text)
+        for name in hits:
+            probs[name] *= KEYWORD_BOOST
+        total = sum(probs.values())
+        probs = {name: p / total for name, p in probs.items()}
+
+        intent = max(probs, key=probs.get)
+        confidence = probs[intent]
+        rival_keywords = [name for name in hits if name != intent]
+
+        if intent not in self.fast_intents:
+            reason = "intent sem rota rápida"
+        elif confidence < self.min_confidence:
+            reason = "confiança baixa"
+        elif rival_keywords:
+            reason = f"pedido misto ({', '.join(rival_keywords)})"
+        else:
+            reason = ""
+        return Route(
+            intent=intent,
+            confidence=round(confidence, 4),
+            fast_path=not reason,
+            keywords=hits.get(intent, []),
+            scores={k: round(v, 4) for k, v in probs.items()},
+            reason=reason,
+        )
+
+
+_router: Optional[IntentRouter] = None
+
+
+def get_router() -> IntentRouter:
+    global _router
+    if _router is None:
+        _router = IntentRouter.from_file()
+    return _router
+
+
+# ---------------------------------------------------------------------------
+# Rotas rápidas
+# ---------------------------------------------------------------------------
+
+
+def _format_verdict(verdict: Dict[str, Any], lang: str) -> str:
+    """Veredito STRICT JSON do compliance como resposta em texto (como o orquestrador responderia)."""
+    pt = lang == "pt"
+    if verdict["following_compliance"]:
+        head = "**Sim.** Segundo a política de compliance, isso é permitido." if pt else \
+            "**Yes.** According to the compliance policy, this is allowed."
+    else:
+        head = "**Não.** Segundo a política de compliance, isso não é permitido." if pt else \
+            "**No.** According to the compliance policy, this is not allowed."
+    evidences = [e for e in verdict.get("evidences") or [] if isinstance(e, dict) and e.get("subject")]
+    if not evidences:
+        return head + ("\n\nA política não trouxe um trecho específico para citar." if pt else
+                       "\n\nThe policy did not provide a specific passage to cite.")
+    lines = [head, "", "Base na política:" if pt else "Policy basis:"]
+    lines += [f"- \"{e['subject']}\" ({e.get('source') or 'politica_compliance.txt'})" for e in evidences]
+    return "\n".join(lines)
+
+
+async def _rule_check(query: str) -> str:
+    from agentCompliance.agent import parse_verdict, run_compliance_tool
+
+    answer = await run_compliance_tool(query)
+    verdict = parse_verdict(answer)
+    # Erro/orçamento estourado seguem como vieram (o app reconhece e não cacheia).
+    return _format_verdict(verdict, detect_language(query)) if verdict else answer
+
+
+def _investigation_focus(patterns: Dict[str, Any]) -> Optional[str]:
+    """Foco FINANCEIRO para o profiler com as transações suspeitas (None = nada a explicar)."""
+    items = [
+        f"{r.get('funcionario')} ${r.get('valor')} ({r.get('data')})"
+        for r in patterns.get("repeated_high_values") or []
+    ]
+    for p in (patterns.get("near_duplicate_claims") or {}).get("pairs", [])[:5]:
+        t = p["transactions"][0]
+        items.append(f"{t.get('funcionario')} ${t.get('valor')} ({t.get('descricao', t.get('data'))})")
+    if not items:
+        return None
+    return "FINANCEIRO: os e-mails explicam estas transações suspeitas? " + "; ".join(dict.fromkeys(items))
+
+
+def _format_audit(patterns: Dict[str, Any], scan: Dict[str, Any], lang: str,
+                  investigation: Optional[str] = None) -> str:
+    pt = lang == "pt"
+    lines = ["**Varredura geral do extrato**" if pt else "**General audit of the bank statement**", ""]
+
+    near = patterns.get("near_duplicate_claims")
+    if "error" in patterns:
+        lines.append(("- Padrões: falha na análise - " if pt else "- Patterns: analysis failed - ") + patterns["error"])
+    elif patterns.get("repeated_high_values"):
+        rows = patterns["repeated_high_values"]
+        lines.append(
+            f"- {'Valores altos repetidos (possível duplicidade)' if pt else 'Repeated high values (possible duplicates)'}: "
+            + "; ".join(f"{r.get('id_transacao')} {r.get('funcionario')} ${r.get('valor')} ({r.get('data')})" for r in rows)
+        )
+    elif not near:
+        lines.append("- " + ("Nenhum padrão óbvio detectado." if pt else "No obvious pattern detected."))
+    if near:
+        lines.append(
+            f"- {'Possíveis reapresentações (descrição/valor quase iguais)' if pt else 'Possible resubmissions (near-identical description/amount)'}: "
+            + "; ".join(
+                " ≈ ".join(f"{t.get('id_transacao')} ${t.get('valor')} ({t.get('data')})" for t in p["transactions"])
+                + f" {p['transactions'][0].get('funcionario')}"
+                for p in near["pairs"][:5]
+            )
+        )
+
+    if "error" in scan:
+        lines.append(("- Compliance: falha na varredura - " if pt else "- Compliance: scan failed - ") + scan["error"])
+    else:
+        lines.append(
+            f"- {'Transações com violação' if pt else 'Transactions with violations'}: "
+            f"{scan['flagged_transactions']}/{scan['total_transactions']} "
+            f"({', '.join(f'{rule}: {n}' for rule, n in scan['by_rule'].items()) or '-'})"
+        )
+        for v in scan["violations"][:5]:
+            lines.append(
+                f"  - [{v['severity']}] {v['id_transacao']} {v['funcionario']} ${v['valor']} ({v['data']}): "
+                f"{v['detail']} — \"{v['citation']}\""
+            )
+
+    if investigation is None:
+        return "\n".join(lines)
+    lines += ["", "**O que os e-mails dizem sobre os padrões**" if pt else "**What the emails say about the patterns**"]
+    lines += _format_investigation(investigation, pt)
+    return "\n".join(lines)
+
+
+def _format_investigation(text: str, pt: bool) -> List[str]:
+    """Relatório JSON do profiler (analise_resumo + evidencias) em linhas de texto."""
+    if not usable_answer(text):
+        text = (text or "").strip()
+        return [("- Investigação nos e-mails não concluída - " if pt else "- Email investigation did not finish - ")
+                + (text.splitlines()[0] if text else "sem resposta")]
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    try:
+        report = json.loads(match.group(0)) if match else None
+    except json.JSONDecodeError:
+        report = None
+    if not isinstance(report, dict) or "analise_resumo" not in report:
+        return [text.strip()]
+    lines = [str(report["analise_resumo"])]
+    for e in report.get("evidencias") or []:
+        if isinstance(e, dict) and e.get("trecho_chave"):
+            lines.append(f"- {e.get('data', '?')} {e.get('autor', '?')}: \"{e['trecho_chave']}\""
+                         + (f" — {e['interpretacao']}" if e.get("interpretacao") else ""))
+    return lines
+
+
+async def _general_audit(query: str) -> str:
+    from agentCompliance.rules import scan_compliance_violations
+    from agentPandas.tools import detect_fraud_patterns
+
+    patterns, scan = await asyncio.gather(detect_fraud_patterns(), scan_compliance_violations(max_results=20))
+    # FLOW 4, passo 2: padrões encontrados vão para o profiler ver se os e-mails os explicam.
+    investigation = None
+    focus = _investigation_focus(patterns)
+    if focus:
+        from RAGEmails.agent import run_investigation_tool
+
+        investigation = await run_investigation_tool(focus)
+    return _format_audit(patterns, scan, detect_language(query), investigation)
+
+
+FAST_PATHS = {
+    "rule_check": _rule_check,
+    "general_audit": _general_audit,
+}
+
+
+async def route_fast_path(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Resolve o pedido sem o LLM do orquestrador quando a intenção é clara.
+
+    Retorna {"intent", "confidence", "response"} ou None (segue para o LLM).
+    """
+    if not ROUTER_ENABLED or not query:
+        return None
+
+    with span("router.classify") as s:
+        route = get_router().classify(query)
+        s.set_attribute("router.intent", route.intent)
+        s.set_attribute("router.confidence", route.confidence)
+        s.set_attribute("router.fast_path", route.fast_path)
+
+    handler = FAST_PATHS.get(route.intent) if route.fast_path else None
+    metrics.ROUTER_DECISIONS.labels(intent=route.intent, path="fast" if handler else "llm").inc()
+    if handler is None:
+        print(f"🧭 [Router] {route.intent} ({route.confidence:.2f}) -> orquestrador LLM: {route.reason or 'sem handler'}")
+        return None
+
+    print(f"🧭 [Router] {route.intent} ({route.confidence:.2f}) -> rota rápida")
+    with span("router.fast_path", **{"router.intent": route.intent}):
+        response = await handler(query)
+    return {"intent": route.intent, "confidence": route.confidence, "response": response}
@@ -1,8 +1,28 @@
 from rag.config import rag, rag_corpus
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+import asyncio
+import os
+import time
+
+from observability import metrics, span
+from rag.hybrid import hybrid_search
+from runtime import blocking_pool, request_memoized, upstream
+
+# Chamadas ao Vertex RAG são síncronas: rodam num pool limitado, fora do event loop.
+_RAG_POOL = blocking_pool("rag", default_workers=8)
+# Prazo por tentativa, retries, hedge e circuit breaker (runtime/resilience.py).
+_VERTEX_RAG = upstream("vertex_rag")
+RAG_TIMEOUT_S = float(os.getenv("RAG_TIMEOUT_S", "20"))
+RAG_VECTOR_DISTANCE_THRESHOLD = float(os.getenv("RAG_VECTOR_DISTANCE_THRESHOLD", "0.5"))
+RAG_FILE_IDS_TTL_S = float(os.getenv("RAG_FILE_IDS_TTL_S", "300"))
+
+# (corpus, nomes) -> (expira_em, ids). Evita um list_files por consulta.
+_file_ids_cache: Dict[Tuple[str, Tuple[str, ...]], Tuple[float, List[str]]] = {}
+
 
 def resolver_ids_por_nome(nomes_desejados):
-    files = rag.list_files(rag_corpus.name)
+    with span("rag.list_files", **{"rag.corpus": rag_corpus.name}):
+        files = rag.list_files(rag_corpus.name)
 
     ids = []
     for f in files:
@@ -10,43 +30,67 @@ def resolver_ids_por_nome(nomes_desejados):
             rag_file_id_curto = f.name.split("/ragFiles/")[-1]
             ids.append(f"{rag_file_id_curto}")
 
-    if not ids:
-        raise ValueError("Nenhum dos arquivos solicitados foi encontrado no corpus.")
-
     return ids
 
 
-def make_embedding(text: str, files: List[str]) -> Dict[str, Any]:
+async def resolver_ids_async(nomes_desejados: List[str]) -> List[str]:
     """
-    Retrieve relevant compliance document chunks from the RAG corpus.
+    resolver_ids_por_nome fora do loop, com cache por TTL (compliance e e-mails).
 
-    Args:
-        text: User query.
-
-    Returns:
-        Dict with retrieved chunks, relevance score and sources.
+    Só resultados não vazios ficam em cache: um arquivo recém-ingerido aparece
+    na consulta seguinte, não depois do TTL.
     """
+    key = (rag_corpus.name, tuple(sorted(nomes_desejados)))
+    cached = _file_ids_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        metrics.record_cache("rag_file_ids", hit=True)
+        return cached[1]
+
+    metrics.record_cache("rag_file_ids", hit=False)
+    ids = await _VERTEX_RAG.call(lambda: _RAG_POOL.run(resolver_ids_por_nome, nomes_desejados), op="list_files", pool=_RAG_POOL)
+    if ids:
+        _file_ids_cache[key] = (time.monotonic() + RAG_FILE_IDS_TTL_S, ids)
+    return ids
 
-    print("Segue aqui os arquivos selecionados para compliance: ", files)
 
-    ids = resolver_ids_por_nome(files)
+async def _vector_search(text: str, files: List[str], top_k: int) -> List[Dict[str, Any]]:
+    """Braço vetorial (Vertex RAG), fora do event loop e com timeout."""
+    ids = await resolver_ids_async(files)
+    if not ids:
+        raise ValueError("Nenhum dos arquivos solicitados foi encontrado no corpus.")
 
     rag_retrieval_config = rag.RagRetrievalConfig(
-        top_k=3,  # Optional
-        filter=rag.Filter(vector_distance_threshold=0.5),  # Optional
+        top_k=top_k,  # Optional
+        filter=rag.Filter(vector_distance_threshold=RAG_VECTOR_DISTANCE_THRESHOLD),  # Optional
     )
 
-    response = rag.retrieval_query(
-        rag_resources=[
-            rag.RagResource(
-                rag_corpus=rag_corpus.name,
-                # Optional: supply IDs from `rag.list_files()`.
-                # rag_file_ids=["rag-file-1", "rag-file-2", ...],
-                rag_file_ids=ids,
+    start = time.perf_counter()
+    with span("rag.retrieval", **{"rag.top_k": top_k, "rag.files": files}) as s:
+        try:
+            response = await _VERTEX_RAG.call(
+                lambda: _RAG_POOL.run(
+                    rag.retrieval_query,
+                    rag_resources=[
+                        rag.RagResource(
+                            rag_corpus=rag_corpus.name,
+                            # Optional: supply IDs from `rag.list_files()`.
+                            # rag_file_ids=["rag-file-1", "rag-file-2", ...],
+                            rag_file_ids=ids,
+                        )
+                    ],
+                    text=text,
+                    rag_retrieval_config=rag_retrieval_config,
+                ),
+                op="retrieval",
+                pool=_RAG_POOL,
             )
-        ],
-        text=text,
-        rag_retrieval_config=rag_retrieval_config,
+        except asyncio.TimeoutError:
+            s.set_attribute("rag.timeout", True)
+            print(f"⏱️ [RAG] retrieval_query excedeu {_VERTEX_RAG.policy.total_deadline_s:.0f}s.")
+            raise
+        s.set_attribute("rag.chunks", len(response.contexts.contexts))
+    metrics.RAG_RETRIEVAL_DURATION.labels(source="compliance").observe(
+        time.perf_counter() - start
     )
 
     results: List[Dict[str, Any]] = []
@@ -60,10 +104,39 @@ def make_embedding(text: str, files: List[str]) -> Dict[str, Any]:
         })
 
     results.sort(key=lambda x: x["score"], reverse=True)
+    return results
+
+
+@request_memoized
+async def make_embedding(text: str, files: List[str]) -> Dict[str, Any]:
+    """
+    Retrieve relevant compliance document chunks from the RAG corpus.
+
+    Hybrid search: vector (Vertex RAG) + local BM25, fused by RRF and reranked.
+
+    Args:
+        text: User query.
+
+    Returns:
+        Dict with retrieved chunks, relevance score and sources.
+    """
+
+    print("Segue aqui os arquivos selecionados para compliance: ", files)
+
+    try:
+        result = await hybrid_search(
+            text,
+            files,
+            vector_search=lambda n: _vector_search(text, files, n),
+            top_k=3,
+            timeout=RAG_TIMEOUT_S,
+        )
+    except RuntimeError as e:
+        return {"query": text, "chunks": [], "error": str(e)}
 
     return {
         "query": text,
-        "chunks": results
+        "chunks": result["chunks"]
     }
 
-# make_embedding("A política permite $400 em 'Outros'?", ["politica_compliance.txt"])
\ No newline at end of file
+# asyncio.run(make_embedding("A política permite $400 em 'Outros'?", ["politica_compliance.txt"]))
@@ -0,0 +1,254 @@
+"""
+Retrieval híbrido: BM25 local + vetorial (Vertex RAG), fundidos por RRF.
+
+A busca vetorial sozinha perde termos exatos (valores em dólar, nomes,
+"Toby"). Aqui as duas listas rodam em paralelo, são fundidas por
+Reciprocal Rank Fusion e, opcionalmente, reordenadas por um reranker local:
+
+    HYBRID_RERANKER=lexical        (default) cobertura dos termos + valores/nomes exatos
+    HYBRID_RERANKER=cross-encoder  sentence-transformers (HYBRID_RERANKER_MODEL)
+    HYBRID_RERANKER=none
+
+Os documentos do BM25 vêm do mesmo arquivo ingerido no corpus
+(RAG_SOURCE_PREFIX + nome do arquivo), quebrado em parágrafos.
+Este módulo não importa rag.config: pode ser usado offline.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import fsspec
+import numpy as np
+
+from observability import metrics, span
+from runtime import blocking_pool
+
+RAG_SOURCE_PREFIX = os.getenv("RAG_SOURCE_PREFIX", "gs://dunder-data/data/")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+HYBRID_RERANKER = os.getenv("HYBRID_RERANKER", "lexical").lower()
+HYBRID_RERANKER_MODEL = os.getenv("HYBRID_RERANKER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RRF_K = 60
+
+_BM25_K1, _BM25_B = 1.5, 0.75
+
+_STOPWORDS = set("""
+a o as os um uma uns umas de da do das dos em no na nos nas por para pra com sem que se e ou
+ao aos à às é ser foi vai vou sao estou esta isso esse essa este nao mas mais muito
+ja tem ter como quem qual quando onde sobre ate meu minha seu sua eles elas ele ela voce
+posso pode podem algum alguma existe ha
+the an of to in on for and or is are was be it this that with at by from what who did can
+""".split())
+
+_GCS_POOL = blocking_pool("gcs", default_workers=4)
+
+HYBRID_LEXICAL_TTL_S = float(os.getenv("HYBRID_LEXICAL_TTL_S", "300"))
+
+# path -> (expira_em, índice BM25 dos parágrafos). Relê o arquivo só após o TTL.
+_lexical_cache: Dict[str, tuple] = {}
+
+
+def tokenize(text: str) -> List[str]:
+    normalized = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().casefold()
+    return [t for t in re.findall(r"[a-z0-9$]+", normalized) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def _chunk_key(text: str) -> str:
+    """Identidade de um trecho entre as duas fontes (espaços normalizados)."""
+    return hashlib.sha1(" ".join(text.split()).casefold().encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# BM25 em memória
+# ---------------------------------------------------------------------------
+
+
+class BM25Index:
+    """BM25 simples sobre uma lista de trechos {"text", "source", ...}."""
+
+    def __init__(self, chunks: List[Dict[str, Any]]):
+        self.chunks = chunks
+        docs = [tokenize(c["text"]) for c in chunks]
+        self.doc_len = np.array([len(d) for d in docs], dtype=np.float64)
+        self.avgdl = float(self.doc_len.mean()) if len(docs) else 0.0
+        self.postings: Dict[str, Dict[int, int]] = {}
+        for doc_id, tokens in enumerate(docs):
+            for token in tokens:
+                bucket = self.postings.setdefault(token, {})
+                bucket[doc_id] = bucket.get(doc_id, 0) + 1
+
+    def scores(self, query: str) -> np.ndarray:
+        n_docs = len(self.chunks)
+        scores = np.zeros(n_docs, dtype=np.float64)
+        if not n_docs:
+            return scores
+        norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * self.doc_len / max(self.avgdl, 1e-9))
+        for term in set(tokenize(query)):
+            bucket = self.postings.get(term)
+            if not bucket:
+                continue
+            docs = np.fromiter(bucket.keys(), dtype=np.int64)
+            tf = np.fromiter(bucket.values(), dtype=np.float64)
+            idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (_BM25_K1 + 1) / (tf + norm[docs])
+        return scores
+
+    def search(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        scores = self.scores(query)
+        hits = np.flatnonzero(scores > 0)
+        order = hits[np.argsort(-scores[hits], kind="stable")][:top_k]
+        return [{**self.chunks[i], "score": float(scores[i])} for i in order]
+
+
+def split_paragraphs(text: str, source: str, max_chars: int = 1200) -> List[Dict[str, Any]]:
+    chunks = []
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        if not block:
+            continue
+        parts = [block] if len(block) <= max_chars else [l for l in block.splitlines() if l.strip()]
+        chunks.extend({"text": p, "source": source, "uri": ""} for p in parts)
+    return chunks
+
+
+def _load_lexical_sync(display_name: str) -> BM25Index:
+    path = f"{RAG_SOURCE_PREFIX}{display_name}"
+    cached = _lexical_cache.get(path)
+    if cached and cached[0] > time.monotonic():
+        metrics.record_cache("bm25_index", hit=True)
+        return cached[1]
+
+    metrics.record_cache("bm25_index", hit=False)
+    with span("rag.bm25.build", **{"rag.source": path}):
+        with fsspec.open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        index = BM25Index(split_paragraphs(text, display_name))
+    _lexical_cache[path] = (time.monotonic() + HYBRID_LEXICAL_TTL_S, index)
+    return index
+
+
+async def preload_lexical(files: Sequence[str], timeout: Optional[float] = None) -> None:
+    """Monta (ou reaproveita) os índices BM25 de `files` sem consultar."""
+    await asyncio.gather(*(_GCS_POOL.run(_load_lexical_sync, name, timeout=timeout) for name in files))
+
+
+async def lexical_search(query: str, files: Sequence[str], top_k: int, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """BM25 sobre os arquivos do corpus (lidos de RAG_SOURCE_PREFIX)."""
+    results: List[Dict[str, Any]] = []
+    for name in files:
+        index = await _GCS_POOL.run(_load_lexical_sync, name, timeout=timeout)
+        results.extend(index.search(query, top_k))
+    results.sort(key=lambda c: c["score"], reverse=True)
+    return results[:top_k]
+
+
+# ---------------------------------------------------------------------------
+# Fusão e rerank
+# ---------------------------------------------------------------------------
+
+
+def rrf_fuse(ranked_lists: Dict[str, List[Dict[str, Any]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """Reciprocal Rank Fusion: score = soma de 1 / (k + posição) em cada lista."""
+    fused: Dict[str, Dict[str, Any]] = {}
+    for arm, chunks in ranked_lists.items():
+        for rank, chunk in enumerate(chunks, start=1):
+            key = _chunk_key(chunk["text"])
+            entry = fused.setdefault(key, {**chunk, "rrf": 0.0, "arms": {}})
+            entry["rrf"] += 1.0 / (k + rank)
+            entry["arms"][arm] = rank
+    return sorted(fused.values(), key=lambda c: c["rrf"], reverse=True)
+
+
+_AMOUNT_RE = re.compile(r"\$\s?\d[\d.,]*")
+_CAPITALIZED_RE = re.compile(r"\b[A-ZÀ-Ý][a-zà-ÿ]{2,}\b")
+
+
+def _lexical_rerank(query: str, chunks: List[Dict[str, Any]]) -> List[float]:
+    """Cobertura dos termos da pergunta + bônus por valores e nomes próprios exatos."""
+    q_terms = set(tokenize(query))
+    exact = {_norm_amount(a) for a in _AMOUNT_RE.findall(query)}
+    names = {n.casefold() for n in _CAPITALIZED_RE.findall(query)}
+    scores = []
+    for chunk in chunks:
+        c_terms = set(tokenize(chunk["text"]))
+        coverage = len(q_terms & c_terms) / max(1, len(q_terms))
+        amount_hit = bool(exact & {_norm_amount(a) for a in _AMOUNT_RE.findall(chunk["text"])})
+        name_hit = sum(1 for n in names if n in chunk["text"].casefold()) / max(1, len(names)) if names else 0.0
+        scores.append(coverage + 0.5 * amount_hit + 0.3 * name_hit + chunk.get("rrf", 0.0))
+    return scores
+
+
+def _norm_amount(raw: str) -> str:
+    return re.sub(r"[^\d]", "", raw).lstrip("0")
+
+
+_cross_encoder = None
+
+
+def _cross_encoder_rerank(query: str, chunks: List[Dict[str, Any]]) -> List[float]:
+    global _cross_encoder
+    if _cross_encoder is None:
+        from sentence_transformers import CrossEncoder  # dependência opcional
+
+        _cross_encoder = CrossEncoder(HYBRID_RERANKER_MODEL)
+    return [float(s) for s in _cross_encoder.predict([(query, c["text"]) for c in chunks])]
+
+
+def rerank(query: str, chunks: List[Dict[str, Any]], mode: str = HYBRID_RERANKER) -> List[Dict[str, Any]]:
+    if mode == "none" or len(chunks) < 2:
+        return chunks
+    if mode == "cross-encoder":
+        try:
+            scores = _cross_encoder_rerank(query, chunks)
+        except ImportError:
+            print("⚠️ [Hybrid] sentence-transformers não instalado; usando reranker lexical.")
+            scores = _lexical_rerank(query, chunks)
+    else:
+        scores = _lexical_rerank(query, chunks)
+    for chunk, score in zip(chunks, scores):
+        chunk["rerank"] = round(score, 4)
+    return [c for _, c in sorted(zip(scores, chunks), key=lambda x: x[0], reverse=True)]
+
+
+async def hybrid_search(
+    query: str,
+    files: Sequence[str],
+    vector_search: Callable[[int], Awaitable[List[Dict[str, Any]]]],
+    top_k: int,
+    lexical: Optional[Callable[[str, int], Awaitable[List[Dict[str, Any]]]]] = None,
+    timeout: Optional[float] = None,
+    reranker: str = HYBRID_RERANKER,
+) -> Dict[str, Any]:
+    """
+    Roda vetorial + BM25 em paralelo, funde por RRF e reordena.
+
+    `vector_search(n)` devolve até n trechos do Vertex; `lexical(query, n)`
+    substitui o BM25 por parágrafos (ex: índice de e-mails). Se um dos lados
+    falhar, o outro segue sozinho.
+    """
+    candidates = max(HYBRID_CANDIDATES, top_k)
+    lexical = lexical or (lambda q, n: lexical_search(q, files, n, timeout=timeout))
+
+    with span("rag.hybrid", **{"rag.top_k": top_k, "rag.candidates": candidates, "rag.reranker": reranker}) as s:
+        vector_res, lexical_res = await asyncio.gather(
+            vector_search(candidates), lexical(query, candidates), return_exceptions=True
+        )
+        lists: Dict[str, List[Dict[str, Any]]] = {}
+        errors = {}
+        for arm, res in (("vector", vector_res), ("bm25", lexical_res)):
+            if isinstance(res, BaseException):
+                errors[arm] = f"{type(res).__name__}: {res}"
+                print(f"⚠️ [Hybrid] Braço {arm} falhou: {errors[arm]}")
+            else:
+                lists[arm] = res
+        if not lists:
+            raise RuntimeError(f"Retrieval híbrido sem resultados: {errors}")
+
+        fused = rerank(query, rrf_fuse(lists)[: candidates], reranker)[:top_k]
+        s.set_attribute("rag.vector_hits", len(lists.get("vector", [])))
+        s.set_attribute("rag.bm25_hits", len(lists.get("bm25", [])))
+
+    return {"chunks": fused, "errors": errors}
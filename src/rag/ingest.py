@@ -1,22 +1,327 @@
-from config import rag, rag_corpus
+"""
+Ingestão incremental do corpus do Vertex RAG.
 
-paths = ["gs://dunder-data/data/politica_compliance.txt"]
+Lê um manifesto (rag/manifest.json) com as fontes a indexar - caminhos ou
+globs do GCS - e compara o hash do conteúdo de cada arquivo com o que já foi
+ingerido (cache/rag_ingest_<corpus>.json):
 
+    novo       -> importa
+    alterado   -> importa de novo e só então apaga o RagFile antigo
+    inalterado -> pula
+    órfão      -> (com --prune) apaga do corpus
 
-def make_ingest():
-    # Import Files to the RagCorpus
-    rag.import_files(
-        rag_corpus.name,
-        paths,
-        # Optional
+Arquivos do corpus e do manifesto são casados pela URI de origem completa
+(gs://bucket/caminho), não pelo nome: o mesmo nome em buckets ou prefixos
+diferentes são documentos diferentes.
+
+As importações rodam em lotes paralelos dividindo entre si o limite
+`max_embedding_requests_per_min` do manifesto, com progresso e throughput
+por lote. Re-ingerir o arquivo de e-mails custa só o que mudou.
+
+Uso (a partir de src/):
+    python -m rag.ingest                          # rag/manifest.json
+    python -m rag.ingest --dry-run                # só mostra o plano
+    python -m rag.ingest --manifest outro.json --workers 4 --batch-size 10
+    python -m rag.ingest --adopt                  # registra o que já está no corpus sem reimportar
+    python -m rag.ingest --prune                  # remove do corpus o que saiu do manifesto
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import fsspec
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+project_root = os.path.abspath(os.path.join(src_dir, ".."))
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+DEFAULT_MANIFEST = os.path.join(current_dir, "manifest.json")
+INGEST_STATE_DIR = os.getenv("RAG_INGEST_STATE_DIR", os.path.join(project_root, "cache"))
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "4"))
+# Limite de URIs por chamada do import_files.
+INGEST_BATCH_SIZE = int(os.getenv("RAG_INGEST_BATCH_SIZE", "25"))
+
+
+# ---------------------------------------------------------------------------
+# Manifesto e hashes
+# ---------------------------------------------------------------------------
+
+
+def load_manifest(path: str = DEFAULT_MANIFEST) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest.setdefault("chunk_size", 512)
+    manifest.setdefault("chunk_overlap", 100)
+    manifest.setdefault("max_embedding_requests_per_min", 1000)
+    if not manifest.get("sources"):
+        raise ValueError(f"Manifesto sem fontes: {path}")
+    return manifest
+
+
+def expand_sources(sources: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Caminho completo -> info do arquivo (globs expandidos)."""
+    files: Dict[str, Dict[str, Any]] = {}
+    for source in sources:
+        fs, _, paths = fsspec.get_fs_token_paths(source)
+        if not paths:
+            print(f"⚠️ [Ingest] Nenhum arquivo para '{source}'.")
+        for path in paths:
+            info = fs.info(path)
+            if info.get("type") == "directory":
+                continue
+            files[fs.unstrip_protocol(path)] = info
+    return files
+
+
+def content_hash(path: str, info: Dict[str, Any]) -> str:
+    """Hash do conteúdo: o md5/crc32c que o GCS já calcula, ou sha256 em streaming."""
+    for key in ("md5Hash", "crc32c"):
+        if info.get(key):
+            return f"{key}:{info[key]}"
+
+    digest = hashlib.sha256()
+    with fsspec.open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return f"sha256:{digest.hexdigest()}"
+
+
+# ---------------------------------------------------------------------------
+# Estado da ingestão
+# ---------------------------------------------------------------------------
+
+
+def _state_path(corpus_name: str) -> str:
+    corpus_id = corpus_name.rsplit("/", 1)[-1]
+    return os.path.join(INGEST_STATE_DIR, f"rag_ingest_{corpus_id}.json")
+
+
+def load_state(corpus_name: str) -> Dict[str, Any]:
+    path = _state_path(corpus_name)
+    if not os.path.exists(path):
+        return {"corpus": corpus_name, "files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state: Dict[str, Any]) -> None:
+    path = _state_path(state["corpus"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _source_uri(rag_file) -> str:
+    """URI de origem do RagFile (display_name para o que não veio do GCS, ex: upload direto)."""
+    uris = list(getattr(getattr(rag_file, "gcs_source", None), "uris", None) or [])
+    return uris[0] if uris else rag_file.display_name
+
+
+def corpus_files(rag, corpus_name: str) -> Dict[str, List[str]]:
+    """URI de origem -> nomes dos RagFiles no corpus."""
+    files: Dict[str, List[str]] = {}
+    for f in rag.list_files(corpus_name):
+        files.setdefault(_source_uri(f), []).append(f.name)
+    return files
+
+
+def plan_ingest(
+    files: Dict[str, Dict[str, Any]],
+    hashes: Dict[str, str],
+    state: Dict[str, Any],
+    existing: Dict[str, List[str]],
+    adopt: bool = False,
+) -> Dict[str, List[str]]:
+    plan: Dict[str, List[str]] = {"new": [], "changed": [], "unchanged": [], "adopted": [], "orphans": []}
+    for path in sorted(files):
+        known = state["files"].get(path)
+        in_corpus = path in existing
+        if in_corpus and known and known["hash"] == hashes[path]:
+            plan["unchanged"].append(path)
+        elif in_corpus and adopt and not known:
+            plan["adopted"].append(path)
+        elif in_corpus:
+            plan["changed"].append(path)
+        else:
+            plan["new"].append(path)
+
+    plan["orphans"] = sorted(uri for uri in existing if uri not in files)
+    return plan
+
+
+# ---------------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------------
+
+
+def _import_batch(rag, corpus_name: str, batch: List[str], manifest: Dict[str, Any], rpm: int):
+    return rag.import_files(
+        corpus_name,
+        batch,
         transformation_config=rag.TransformationConfig(
             chunking_config=rag.ChunkingConfig(
-                chunk_size=512,
-                chunk_overlap=100,
+                chunk_size=manifest["chunk_size"],
+                chunk_overlap=manifest["chunk_overlap"],
             ),
         ),
-        max_embedding_requests_per_min=1000,  # Optional
+        max_embedding_requests_per_min=rpm,
+    )
+
+
+def _delete_files(rag, corpus_name: str, names: List[str], workers: int, summary: Dict[str, Any]) -> None:
+    if not names:
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dunder-ingest-del") as pool:
+        list(pool.map(lambda name: rag.delete_file(name=name, corpus_name=corpus_name), names))
+    summary["deleted"] += len(names)
+    print(f"🗑️ [Ingest] {len(names)} RagFiles antigos removidos.")
+
+
+def make_ingest(
+    manifest_path: str = DEFAULT_MANIFEST,
+    workers: int = INGEST_WORKERS,
+    batch_size: int = INGEST_BATCH_SIZE,
+    dry_run: bool = False,
+    adopt: bool = False,
+    prune: bool = False,
+    force: bool = False,
+) -> Dict[str, Any]:
+    """Sincroniza o corpus com o manifesto. Retorna o resumo da execução."""
+    from rag.config import rag, rag_corpus
+
+    manifest = load_manifest(manifest_path)
+    corpus_name = rag_corpus.name
+    state = load_state(corpus_name)
+
+    start = time.perf_counter()
+    files = expand_sources(manifest["sources"])
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dunder-ingest-hash") as pool:
+        hashes = dict(zip(files, pool.map(lambda p: content_hash(p, files[p]), files)))
+    existing = corpus_files(rag, corpus_name)
+    plan = plan_ingest(files, hashes, state, existing, adopt=adopt)
+    if force:
+        plan["changed"] += plan["unchanged"]
+        plan["unchanged"] = []
+
+    print(
+        f"🗂️ [Ingest] {len(files)} arquivos no manifesto ({time.perf_counter() - start:.1f}s para hash): "
+        f"{len(plan['new'])} novos, {len(plan['changed'])} alterados, {len(plan['unchanged'])} inalterados"
+        + (f", {len(plan['adopted'])} adotados" if plan["adopted"] else "")
+        + (f", {len(plan['orphans'])} órfãos" if plan["orphans"] else "")
+    )
+    summary: Dict[str, Any] = {"plan": plan, "imported": 0, "failed": 0, "deleted": 0}
+    if dry_run:
+        for kind in ("new", "changed", "adopted", "orphans"):
+            for item in plan[kind]:
+                print(f"   {kind:>9}: {item}")
+        return summary
+
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    for path in plan["adopted"]:
+        state["files"][path] = {"hash": hashes[path], "size": files[path].get("size"), "ingested_at": now}
+
+    if prune and plan["orphans"]:
+        _delete_files(rag, corpus_name, [name for uri in plan["orphans"] for name in existing[uri]], workers, summary)
+        orphans = set(plan["orphans"])
+        state["files"] = {p: v for p, v in state["files"].items() if p not in orphans}
+
+    pending = plan["new"] + plan["changed"]
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    if batches:
+        # Os lotes em paralelo dividem a cota de embeddings por minuto.
+        parallel = max(1, min(workers, len(batches)))
+        rpm = max(1, manifest["max_embedding_requests_per_min"] // parallel)
+        total_bytes = sum(files[p].get("size") or 0 for p in pending)
+        import_start = time.perf_counter()
+        done_files, done_bytes = 0, 0
+        replaced: List[str] = []
+
+        with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="dunder-ingest") as pool:
+            futures = {
+                pool.submit(_import_batch, rag, corpus_name, batch, manifest, rpm): batch for batch in batches
+            }
+            for n, future in enumerate(as_completed(futures), start=1):
+                batch = futures[future]
+                try:
+                    response = future.result()
+                    imported = response.imported_rag_files_count
+                    failed = response.failed_rag_files_count
+                except Exception as e:
+                    imported, failed = 0, len(batch)
+                    print(f"❌ [Ingest] Lote falhou ({batch[0]}...): {e}")
+
+                summary["imported"] += imported
+                summary["failed"] += failed
+                if not failed:
+                    replaced += [path for path in batch if path in existing]
+                    for path in batch:
+                        state["files"][path] = {
+                            "hash": hashes[path], "size": files[path].get("size"), "ingested_at": now,
+                        }
+                    save_state(state)  # progresso sobrevive a uma interrupção
+
+                done_files += len(batch)
+                done_bytes += sum(files[p].get("size") or 0 for p in batch)
+                elapsed = time.perf_counter() - import_start
+                print(
+                    f"📦 [Ingest] lote {n}/{len(batches)}: {imported} importados, {failed} falhas | "
+                    f"{done_files}/{len(pending)} arquivos, {done_bytes / 1e6:.1f}/{total_bytes / 1e6:.1f} MB | "
+                    f"{done_files / elapsed:.2f} arq/s, {done_bytes / 1e6 / elapsed:.2f} MB/s"
+                )
+
+        # Versões antigas saem só depois que a nova entrou: lote que falhou deixa
+        # o documento antigo no corpus (e no estado, para a próxima execução).
+        if replaced:
+            after = corpus_files(rag, corpus_name)
+            stale = []
+            for path in replaced:
+                old = existing[path]
+                # Sem RagFile novo para a URI, o Vertex atualizou (ou manteve) o mesmo: nada a apagar.
+                if any(name not in old for name in after.get(path, [])):
+                    stale += old
+            _delete_files(rag, corpus_name, stale, workers, summary)
+
+    save_state(state)
+    summary["elapsed_s"] = round(time.perf_counter() - start, 2)
+    print(
+        f"✅ [Ingest] {summary['imported']} importados, {summary['failed']} falhas, "
+        f"{len(plan['unchanged'])} pulados, {summary['deleted']} removidos em {summary['elapsed_s']}s."
+    )
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="lotes importados em paralelo")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="arquivos por import_files")
+    parser.add_argument("--dry-run", action="store_true", help="só mostra o plano")
+    parser.add_argument("--adopt", action="store_true", help="registra arquivos já presentes no corpus sem reimportar")
+    parser.add_argument("--prune", action="store_true", help="apaga do corpus o que não está no manifesto")
+    parser.add_argument("--force", action="store_true", help="reimporta mesmo o que não mudou")
+    args = parser.parse_args(argv)
+
+    summary = make_ingest(
+        args.manifest,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        dry_run=args.dry_run,
+        adopt=args.adopt,
+        prune=args.prune,
+        force=args.force,
     )
+    return 1 if summary["failed"] else 0
 
 
-make_ingest()
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
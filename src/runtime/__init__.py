@@ -0,0 +1,35 @@
+from .budget import RunBudget, budget_for, run_with_budget, usable_answer
+from .memo import request_memoized, request_scope
+from .models import ModelPolicy, model_for, policy_for, run_escalating
+from .offload import BlockingPool, blocking_pool
+from .ratelimit import limiter_for, llm_priority, rate_limit_after_model, rate_limit_before_model
+from .resilience import CircuitOpenError, is_retryable, resilient_model, upstream
+from .semantic_cache import SemanticCache, data_version, semantic_cache
+from .sources import file_fingerprint
+
+__all__ = [
+    "BlockingPool",
+    "blocking_pool",
+    "RunBudget",
+    "budget_for",
+    "run_with_budget",
+    "usable_answer",
+    "request_memoized",
+    "request_scope",
+    "ModelPolicy",
+    "model_for",
+    "policy_for",
+    "run_escalating",
+    "limiter_for",
+    "llm_priority",
+    "rate_limit_after_model",
+    "rate_limit_before_model",
+    "CircuitOpenError",
+    "is_retryable",
+    "resilient_model",
+    "upstream",
+    "SemanticCache",
+    "data_version",
+    "semantic_cache",
+    "file_fingerprint",
+]
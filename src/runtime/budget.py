@@ -0,0 +1,154 @@
+"""
+Orçamento por execução de agente (turnos de LLM, tool calls, tokens, prazo).
+
+Quando o orçamento estoura, o Runner é encerrado antes do próximo turno/ferramenta
+e o chamador recebe uma resposta parcial com o motivo.
+
+Configuração por agente via env (valores omitidos mantêm o default):
+    AGENT_BUDGET_FINANCE_AGENT="llm_turns=6,tool_calls=5,tokens=80000,deadline=60"
+"""
+import asyncio
+import os
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+from observability import metrics
+from observability.runs import AgentRun
+
+
+@dataclass(frozen=True)
+class RunBudget:
+    max_llm_turns: Optional[int] = None
+    max_tool_calls: Optional[int] = None
+    max_tokens: Optional[int] = None
+    deadline_s: Optional[float] = None
+
+    def check(self, run: AgentRun, event) -> Optional[str]:
+        """Retorna o motivo do estouro (ou None) depois de observar `event`."""
+        pending_tools = bool(event.content and event.get_function_calls())
+
+        if self.max_tool_calls is not None and run.tool_calls > self.max_tool_calls:
+            return "max_tool_calls"
+        # Turnos e tokens só importam se o agente ainda quer continuar.
+        if pending_tools and self.max_llm_turns is not None and run.llm_turns >= self.max_llm_turns:
+            return "max_llm_turns"
+        if pending_tools and self.max_tokens is not None and run.total_tokens >= self.max_tokens:
+            return "max_tokens"
+        return None
+
+
+DEFAULT_BUDGETS: Dict[str, RunBudget] = {
+    "michael_orchestrator": RunBudget(max_llm_turns=12, max_tool_calls=10, max_tokens=250_000, deadline_s=240),
+    "finance_agent": RunBudget(max_llm_turns=8, max_tool_calls=8, max_tokens=150_000, deadline_s=90),
+    "profiler_agent": RunBudget(max_llm_turns=5, max_tool_calls=4, max_tokens=80_000, deadline_s=60),
+    "agent_compliance": RunBudget(max_llm_turns=4, max_tool_calls=3, max_tokens=40_000, deadline_s=45),
+    "compliance_rule_extractor": RunBudget(max_llm_turns=1, max_tool_calls=0, max_tokens=60_000, deadline_s=120),
+    "michael_scott_persona": RunBudget(max_llm_turns=2, max_tool_calls=0, max_tokens=20_000, deadline_s=30),
+    "plan_synthesizer": RunBudget(max_llm_turns=1, max_tool_calls=0, max_tokens=120_000, deadline_s=120),
+}
+
+_ENV_KEYS = {
+    "llm_turns": ("max_llm_turns", int),
+    "tool_calls": ("max_tool_calls", int),
+    "tokens": ("max_tokens", int),
+    "deadline": ("deadline_s", float),
+}
+
+
+def budget_for(agent_name: str) -> RunBudget:
+    """Budget default do agente, sobrescrito por AGENT_BUDGET_<NOME>."""
+    budget = DEFAULT_BUDGETS.get(agent_name, RunBudget())
+    raw = os.getenv(f"AGENT_BUDGET_{agent_name.upper()}", "")
+
+    overrides = {}
+    for item in filter(None, (p.strip() for p in raw.split(","))):
+        key, _, value = item.partition("=")
+        if key.strip() not in _ENV_KEYS:
+            print(f"⚠️ [Budget] Chave desconhecida em AGENT_BUDGET_{agent_name.upper()}: {key}")
+            continue
+        field, cast = _ENV_KEYS[key.strip()]
+        overrides[field] = None if value.strip().lower() in ("", "none", "off") else cast(value)
+
+    return replace(budget, **overrides) if overrides else budget
+
+
+def _event_text(event) -> Optional[str]:
+    if event.content and event.content.parts:
+        return event.content.parts[0].text
+    return None
+
+
+def _last_tool_output(event) -> Optional[str]:
+    responses = event.get_function_responses() if event.content else []
+    if not responses:
+        return None
+    return str(responses[-1].response)[:2000]
+
+
+async def run_with_budget(
+    run: AgentRun, stream, budget: RunBudget, default_text: str = ""
+) -> str:
+    """
+    Consome os eventos do `runner.run_async(...)` respeitando o orçamento.
+
+    Retorna o último texto do modelo; se o orçamento estourar, uma resposta
+    parcial explicando o motivo (também gravado no span e nas métricas).
+    """
+    last_text: Optional[str] = None
+    last_tool: Optional[str] = None
+    reason: Optional[str] = None
+
+    timeout_cm = (
+        asyncio.timeout(budget.deadline_s)
+        if budget.deadline_s is not None and hasattr(asyncio, "timeout")
+        else nullcontext()
+    )
+    deadline = time.monotonic() + budget.deadline_s if budget.deadline_s else None
+
+    try:
+        async with timeout_cm:
+            async for event in stream:
+                run.observe(event)
+                text = _event_text(event)
+                if text:
+                    last_text = text
+                last_tool = _last_tool_output(event) or last_tool
+
+                reason = budget.check(run, event)
+                if reason is None and deadline is not None and time.monotonic() > deadline:
+                    reason = "deadline"
+                if reason:
+                    break
+    except TimeoutError:
+        reason = "deadline"
+    finally:
+        await stream.aclose()
+
+    if reason is None:
+        return last_text or default_text
+
+    run.budget_exceeded = reason
+    run.span.set_attribute("agent.budget_exceeded", reason)
+    metrics.BUDGET_EXCEEDED.labels(agent=run.agent_name, reason=reason).inc()
+    print(
+        f"⚠️ [Budget] {run.agent_name} interrompido ({reason}) após "
+        f"{run.llm_turns} turnos, {run.tool_calls} tool calls, {run.total_tokens} tokens."
+    )
+
+    partial = last_text or last_tool or "nenhum resultado obtido até o limite."
+    return (
+        f"⚠️ Execução interrompida por limite de orçamento ({reason}) após "
+        f"{run.llm_turns} turnos e {run.tool_calls} chamadas de ferramenta. "
+        f"Resposta parcial: {partial}"
+    )
+
+
+def usable_answer(answer: Any) -> bool:
+    """
+    Resposta de agente aproveitável: texto não vazio, sem erro ("Erro", "❌") nem
+    aviso de orçamento/indisponibilidade/limite ("⚠️"). Critério único do cache
+    semântico, da memo por requisição, dos jobs, do lote e dos planos.
+    """
+    return isinstance(answer, str) and bool(answer.strip()) and not answer.startswith(("⚠️", "❌", "Erro"))
@@ -0,0 +1,154 @@
+"""
+Memoização de ferramentas com escopo de requisição (single-flight).
+
+Dentro de `request_scope()`, chamadas idênticas (mesma função + mesmos
+argumentos) a uma ferramenta decorada com `@request_memoized`:
+  - em paralelo: só a primeira executa, as outras aguardam o mesmo resultado;
+  - em sequência: recebem o resultado já calculado.
+
+Fora de um escopo a ferramenta roda normalmente. Resultados de erro, vazios
+ou truncados por orçamento ("⚠️ ...") não ficam em cache (a próxima chamada
+tenta de novo), o mesmo critério do cache semântico e dos jobs.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from observability import metrics
+from .budget import usable_answer
+
+
+class RequestMemo:
+    def __init__(self):
+        self.entries: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+
+_current: ContextVar[Optional[RequestMemo]] = ContextVar("dunder_request_memo", default=None)
+
+
+@contextmanager
+def request_scope():
+    """Abre o escopo de memoização (reaproveita o externo se já houver um)."""
+    existing = _current.get()
+    if existing is not None:
+        yield existing
+        return
+
+    memo = RequestMemo()
+    token = _current.set(memo)
+    try:
+        yield memo
+    finally:
+        _current.reset(token)
+        if memo.hits:
+            print(f"♻️ [Memo] {memo.hits} chamada(s) de ferramenta reaproveitada(s) na requisição.")
+
+
+def _is_error(result: Any) -> bool:
+    if isinstance(result, dict):
+        return "error" in result or result.get("success") is False
+    if isinstance(result, str):
+        return not usable_answer(result)
+    return False
+
+
+def _make_key(func: Callable, signature: inspect.Signature, args, kwargs) -> str:
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    payload = json.dumps(bound.arguments, sort_keys=True, default=str, ensure_ascii=False)
+    return f"{func.__module__}.{func.__qualname__}:{payload}"
+
+
+def request_memoized(func: Callable) -> Callable:
+    """Decorator para ferramentas (sync ou async) do ADK; preserva a assinatura."""
+    signature = inspect.signature(func)
+    name = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            memo = _current.get()
+            if memo is None:
+                return await func(*args, **kwargs)
+
+            key = _make_key(func, signature, args, kwargs)
+            with memo.lock:
+                future = memo.entries.get(key)
+                owner = future is None
+                if owner:
+                    future = asyncio.get_running_loop().create_future()
+                    memo.entries[key] = future
+                    memo.misses += 1
+                else:
+                    memo.hits += 1
+            metrics.record_cache(f"tool:{name}", hit=not owner)
+
+            if not owner:
+                return await asyncio.shield(future)
+
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException as e:
+                with memo.lock:
+                    memo.entries.pop(key, None)
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    future.exception()  # evita "exception was never retrieved"
+                raise
+
+            future.set_result(result)
+            if _is_error(result):
+                with memo.lock:
+                    memo.entries.pop(key, None)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        memo = _current.get()
+        if memo is None:
+            return func(*args, **kwargs)
+
+        key = _make_key(func, signature, args, kwargs)
+        with memo.lock:
+            future = memo.entries.get(key)
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                memo.entries[key] = future
+                memo.misses += 1
+            else:
+                memo.hits += 1
+        metrics.record_cache(f"tool:{name}", hit=not owner)
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            with memo.lock:
+                memo.entries.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        future.set_result(result)
+        if _is_error(result):
+            with memo.lock:
+                memo.entries.pop(key, None)
+        return result
+
+    return wrapper
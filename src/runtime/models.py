@@ -0,0 +1,114 @@
+"""
+Seleção de modelo por agente (tiers) com escalonamento automático.
+
+Cada agente começa num tier e, quando a resposta não passa na verificação
+do chamador (JSON inválido, confiança baixa), é executado de novo UMA vez
+no tier de escalonamento:
+
+    lite      gemini-2.5-flash-lite   (persona do Michael, consultas simples de compliance)
+    standard  gemini-2.5-flash
+    strong    gemini-2.5-pro
+
+Os modelos de cada tier vêm de MODEL_TIER_LITE / MODEL_TIER_STANDARD /
+MODEL_TIER_STRONG. A política por agente pode ser sobrescrita via env
+(valores omitidos mantêm o default; `tier` também aceita um id de modelo):
+    AGENT_MODEL_AGENT_COMPLIANCE="tier=standard,escalate=strong"
+    AGENT_MODEL_MICHAEL_SCOTT_PERSONA="tier=gemini-2.0-flash,escalate=none"
+"""
+import os
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from observability import metrics
+
+TIER_MODELS: Dict[str, str] = {
+    "lite": os.getenv("MODEL_TIER_LITE", "gemini-2.5-flash-lite"),
+    "standard": os.getenv("MODEL_TIER_STANDARD", "gemini-2.5-flash"),
+    "strong": os.getenv("MODEL_TIER_STRONG", "gemini-2.5-pro"),
+}
+
+
+@dataclass(frozen=True)
+class ModelPolicy:
+    tier: str = "standard"
+    escalate_to: Optional[str] = None
+
+    @property
+    def model(self) -> str:
+        return TIER_MODELS.get(self.tier, self.tier)
+
+    @property
+    def escalation_model(self) -> Optional[str]:
+        if not self.escalate_to:
+            return None
+        model = TIER_MODELS.get(self.escalate_to, self.escalate_to)
+        return model if model != self.model else None
+
+
+DEFAULT_POLICIES: Dict[str, ModelPolicy] = {
+    "michael_orchestrator": ModelPolicy("standard"),
+    "finance_agent": ModelPolicy("standard"),
+    "profiler_agent": ModelPolicy("standard"),
+    "agent_compliance": ModelPolicy("lite", escalate_to="standard"),
+    "compliance_rule_extractor": ModelPolicy("standard", escalate_to="strong"),
+    "michael_scott_persona": ModelPolicy("lite"),
+    "plan_synthesizer": ModelPolicy("standard"),
+}
+
+
+def policy_for(agent_name: str) -> ModelPolicy:
+    """Política default do agente, sobrescrita por AGENT_MODEL_<NOME>."""
+    policy = DEFAULT_POLICIES.get(agent_name, ModelPolicy())
+    raw = os.getenv(f"AGENT_MODEL_{agent_name.upper()}", "")
+    overrides: Dict[str, Any] = {}
+    for item in filter(None, (p.strip() for p in raw.split(","))):
+        key, _, value = item.partition("=")
+        key, value = key.strip(), value.strip()
+        if key == "tier" and value:
+            overrides["tier"] = value
+        elif key == "escalate":
+            overrides["escalate_to"] = None if value.lower() in ("", "none", "off") else value
+        else:
+            print(f"⚠️ [Models] Chave ignorada em AGENT_MODEL_{agent_name.upper()}: '{item}'")
+    return replace(policy, **overrides) if overrides else policy
+
+
+def model_for(agent_name: str) -> str:
+    """Id do modelo inicial do agente (usado na definição do Agent)."""
+    return policy_for(agent_name).model
+
+
+_escalated: Dict[Tuple[int, str], Any] = {}
+
+
+def with_model(agent, model: str):
+    """Cópia do Agent com outro modelo (preserva wrappers de LLM, ex: replay do bench)."""
+    key = (id(agent), model)
+    if key not in _escalated:
+        current = agent.model
+        new_model = model if isinstance(current, str) else current.model_copy(update={"model": model})
+        _escalated[key] = agent.model_copy(update={"model": new_model})
+    return _escalated[key]
+
+
+T = TypeVar("T")
+
+
+async def run_escalating(
+    agent,
+    run_once: Callable[[Any], Awaitable[T]],
+    accept: Callable[[T], Optional[str]],
+) -> T:
+    """
+    Roda `run_once(agent)`; se `accept(resultado)` devolver um motivo de
+    recusa, roda de novo com o modelo de escalonamento da política do agente.
+    """
+    result = await run_once(agent)
+    reason = accept(result)
+    target = policy_for(agent.name).escalation_model
+    if reason is None or target is None:
+        return result
+
+    print(f"⬆️ [Models] {agent.name}: escalando para {target} ({reason})")
+    metrics.MODEL_ESCALATIONS.labels(agent=agent.name, reason=reason).inc()
+    return await run_once(with_model(agent, target))
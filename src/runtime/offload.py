@@ -0,0 +1,89 @@
+"""
+Execução de chamadas bloqueantes (SDKs síncronos do Vertex/GCS) fora do event loop.
+
+Cada recurso remoto tem seu próprio pool limitado, para que uma dependência
+lenta não esgote as threads das outras:
+
+    RAG = blocking_pool("rag", default_workers=8)
+    response = await RAG.run(rag.retrieval_query, text=..., timeout=20)
+
+O contexto (spans de tracing, memo da requisição) é propagado para a thread.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class BlockingPool:
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"dunder-{name}"
+        )
+        # Tarefas submetidas que ainda não terminaram (na fila ou rodando),
+        # inclusive as abandonadas por timeout.
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+
+    @property
+    def busy(self) -> int:
+        return self._busy
+
+    @property
+    def available(self) -> int:
+        """Threads livres agora: uma tarefa nova começa sem esperar na fila."""
+        return max(0, self.max_workers - self._busy)
+
+    def _tracked(self, ctx: contextvars.Context, func: Callable[..., Any], *args, **kwargs) -> Any:
+        try:
+            return ctx.run(func, *args, **kwargs)
+        finally:
+            with self._busy_lock:
+                self._busy -= 1
+
+    def _enter(self) -> None:
+        with self._busy_lock:
+            self._busy += 1
+
+    async def run(
+        self, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs
+    ) -> Any:
+        """
+        Roda `func` numa thread do pool e aguarda sem bloquear o loop.
+
+        Em timeout levanta asyncio.TimeoutError; a thread termina sozinha depois,
+        mas o chamador é liberado imediatamente.
+        """
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        self._enter()
+        future = loop.run_in_executor(
+            self._executor, functools.partial(self._tracked, ctx, func, *args, **kwargs)
+        )
+        if timeout is None:
+            return await future
+        return await asyncio.wait_for(future, timeout)
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs):
+        """Versão sem event loop (retorna concurrent.futures.Future)."""
+        ctx = contextvars.copy_context()
+        self._enter()
+        return self._executor.submit(self._tracked, ctx, func, *args, **kwargs)
+
+
+_pools: Dict[str, BlockingPool] = {}
+_pools_lock = threading.Lock()
+
+
+def blocking_pool(name: str, default_workers: int = 8) -> BlockingPool:
+    """Pool compartilhado por nome; tamanho via env <NOME>_MAX_CONCURRENCY."""
+    with _pools_lock:
+        if name not in _pools:
+            workers = int(os.getenv(f"{name.upper()}_MAX_CONCURRENCY", default_workers))
+            _pools[name] = BlockingPool(name, max(1, workers))
+        return _pools[name]
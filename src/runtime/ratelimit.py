@@ -0,0 +1,399 @@
+"""
+Limite global de chamadas ao Gemini (requisições e tokens por minuto) com
+classes de prioridade.
+
+Todos os agentes passam pelo mesmo par de token buckets por modelo antes de
+cada turno de LLM (`before_model_callback`), inclusive os aninhados
+(orquestrador -> financeiro -> execute_pandas_code...). Quem espera entra numa
+fila por prioridade: `interactive` (chat, rotas da API) sempre passa na frente
+de `batch` (/api/batch, jobs) e `background`. Em vez de estourar a cota e
+derrubar todo mundo com 429, o lote espera e o chat segue com latência estável.
+
+    with llm_priority("batch"):
+        await run_agent_session(...)
+
+Os tokens de cada turno são estimados pelo tamanho do prompt (~4 caracteres
+por token) e acertados com o `usage_metadata` real no `after_model_callback`.
+Turno que termina sem resposta do modelo (erro, cancelamento, "indisponível")
+devolve a reserva de tokens (`ResilientLlm`, runtime/resilience.py); retries
+e hedges do mesmo turno pagam requisição e tokens de novo
+(`acquire_extra_attempt`). Se a espera passar do máximo da classe, o turno
+devolve uma resposta de "limite atingido" em vez de chamar o modelo.
+
+Com vários processos, RATE_LIMIT_SHARED_PATH aponta para um arquivo de estado
+(com lock) que faz os buckets valerem para a máquina toda; a ordem por
+prioridade continua valendo dentro de cada processo.
+
+Configuração via env:
+    LLM_RPM=300
+    LLM_TPM=1000000
+    LLM_RATE_<MODELO>="rpm=60,tpm=250000"   (ex: LLM_RATE_GEMINI_2_5_PRO; 0 = sem limite)
+    RATE_LIMIT_MAX_WAIT_INTERACTIVE=30 / _BATCH=300 / _BACKGROUND=600
+    RATE_LIMIT_SHARED_PATH=<raiz>/cache/llm_ratelimit.json
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem estado compartilhado entre processos
+    fcntl = None
+
+from observability import metrics
+
+PRIORITIES = {"interactive": 0, "batch": 1, "background": 2}
+DEFAULT_MAX_WAIT_S = {"interactive": 30.0, "batch": 300.0, "background": 600.0}
+CHARS_PER_TOKEN = 4
+_POLL_S = 0.25
+
+RATE_LIMIT_SHARED_PATH = os.getenv("RATE_LIMIT_SHARED_PATH", "")
+
+_priority: ContextVar[str] = ContextVar("dunder_llm_priority", default="interactive")
+
+
+@contextmanager
+def llm_priority(priority: str):
+    """Classe de prioridade das chamadas ao LLM feitas dentro do bloco."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"prioridade desconhecida: '{priority}' (use {', '.join(PRIORITIES)})")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def max_wait_for(priority: str) -> float:
+    return float(os.getenv(f"RATE_LIMIT_MAX_WAIT_{priority.upper()}", DEFAULT_MAX_WAIT_S[priority]))
+
+
+# ---------------------------------------------------------------------------
+# Limites
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+
+
+def limit_for(model: str) -> RateLimit:
+    """Limite default (LLM_RPM / LLM_TPM), sobrescrito por LLM_RATE_<MODELO>."""
+    base = RateLimit(
+        rpm=float(os.getenv("LLM_RPM", "300")) or None,
+        tpm=float(os.getenv("LLM_TPM", "1000000")) or None,
+    )
+    env_name = "LLM_RATE_" + re.sub(r"[^A-Z0-9]", "_", model.upper())
+    overrides = {}
+    for item in filter(None, (p.strip() for p in os.getenv(env_name, "").split(","))):
+        key, _, value = item.partition("=")
+        if key.strip() not in ("rpm", "tpm"):
+            print(f"⚠️ [RateLimit] Chave desconhecida em {env_name}: {key}")
+            continue
+        overrides[key.strip()] = float(value) or None
+    return replace(base, **overrides) if overrides else base
+
+
+# ---------------------------------------------------------------------------
+# Token buckets (estado local ou em arquivo compartilhado)
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class _Bucket:
+    per_minute: float
+    level: float = field(default=0.0)
+    updated: float = field(default_factory=time.time)
+
+    def __post_init__(self):
+        self.level = self.per_minute
+
+    def refill(self, now: float) -> None:
+        rate = self.per_minute / 60.0
+        self.level = min(self.per_minute, self.level + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Segundos até ter `amount` disponível (0 = já tem)."""
+        missing = amount - self.level
+        return 0.0 if missing <= 0 else missing / (self.per_minute / 60.0)
+
+
+class _SharedState:
+    """Níveis dos buckets num arquivo JSON com flock (vale entre processos)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @contextmanager
+    def locked(self):
+        with open(self.path, "a+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                state = json.loads(raw) if raw.strip() else {}
+                yield state
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class RateLimiter:
+    """Buckets de requisições e tokens de UM modelo, com fila por prioridade."""
+
+    def __init__(self, name: str, limit: RateLimit, shared_path: str = ""):
+        self.name = name
+        self.limit = limit
+        self.buckets: Dict[str, _Bucket] = {}
+        if limit.rpm:
+            self.buckets["rpm"] = _Bucket(limit.rpm)
+        if limit.tpm:
+            self.buckets["tpm"] = _Bucket(limit.tpm)
+        self.shared = _SharedState(shared_path) if shared_path and fcntl is not None else None
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, int]] = []
+        self._abandoned: set = set()
+        self._seq = itertools.count()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.buckets)
+
+    def _costs(self, tokens: float) -> Dict[str, float]:
+        costs = {"rpm": 1.0, "tpm": float(tokens)}
+        # Um prompt maior que o bucket inteiro nunca passaria: limita ao tamanho do bucket.
+        return {k: min(costs[k], b.per_minute) for k, b in self.buckets.items()}
+
+    def _try_take(self, costs: Dict[str, float]) -> Tuple[float, Optional[str]]:
+        """Consome os custos se todos os buckets tiverem saldo; senão (espera, bucket)."""
+        now = time.time()
+
+        def attempt(levels: Optional[Dict[str, Any]]) -> Tuple[float, Optional[str]]:
+            for key, bucket in self.buckets.items():
+                if levels is not None and key in levels:
+                    bucket.level, bucket.updated = levels[key]
+                bucket.refill(now)
+            waits = {k: self.buckets[k].wait_for(c) for k, c in costs.items()}
+            blocking = max(waits, key=waits.get) if waits else None
+            if blocking is None or waits[blocking] == 0:
+                for key, cost in costs.items():
+                    self.buckets[key].level -= cost
+                blocking = None
+            if levels is not None:
+                levels.update({k: (b.level, b.updated) for k, b in self.buckets.items()})
+            return (waits[blocking] if blocking else 0.0), blocking
+
+        if self.shared is None:
+            return attempt(None)
+        with self.shared.locked() as state:
+            return attempt(state.setdefault(self.name, {}))
+
+    def adjust_tokens(self, delta: float) -> None:
+        """Acerta o bucket de tokens com o consumo real (delta > 0 = gastou mais que o estimado)."""
+        if "tpm" not in self.buckets or not delta:
+            return
+        with self._lock:
+            if self.shared is None:
+                self.buckets["tpm"].level -= delta
+                return
+            with self.shared.locked() as state:
+                levels = state.setdefault(self.name, {})
+                level, updated = levels.get("tpm", (self.buckets["tpm"].level, time.time()))
+                levels["tpm"] = (level - delta, updated)
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._queue) - len(self._abandoned)
+
+    async def acquire(self, tokens: float, priority: str = "interactive", max_wait: Optional[float] = None) -> float:
+        """
+        Aguarda a vez (prioridade, depois ordem de chegada) e o saldo dos buckets.
+
+        Retorna os segundos esperados; levanta asyncio.TimeoutError após `max_wait`.
+        """
+        if not self.enabled:
+            return 0.0
+        costs = self._costs(tokens)
+        ticket = (PRIORITIES[priority], next(self._seq))
+        start = time.monotonic()
+        deadline = start + (max_wait if max_wait is not None else max_wait_for(priority))
+        waiting = metrics.RATE_LIMIT_WAITING.labels(model=self.name, priority=priority)
+
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        waiting.inc()
+        reason = blocked_by = None
+        try:
+            while True:
+                with self._lock:
+                    while self._queue and self._queue[0] in self._abandoned:
+                        self._abandoned.discard(heapq.heappop(self._queue))
+                    if self._queue[0] == ticket:
+                        wait, reason = self._try_take(costs)
+                        blocked_by = reason or blocked_by
+                        if wait == 0:
+                            heapq.heappop(self._queue)
+                            break
+                    else:
+                        wait = _POLL_S
+                if time.monotonic() + min(wait, _POLL_S) > deadline:
+                    metrics.RATE_LIMIT_THROTTLED.labels(model=self.name, priority=priority, reason="timeout").inc()
+                    raise asyncio.TimeoutError(f"limite de {blocked_by or 'fila'} do modelo {self.name}")
+                await asyncio.sleep(min(wait, _POLL_S))
+        except BaseException:
+            with self._lock:
+                if ticket in self._queue:
+                    self._abandoned.add(ticket)
+            raise
+        finally:
+            waiting.dec()
+
+        waited = time.monotonic() - start
+        metrics.RATE_LIMIT_WAIT.labels(model=self.name, priority=priority).observe(waited)
+        if blocked_by:
+            metrics.RATE_LIMIT_THROTTLED.labels(model=self.name, priority=priority, reason=blocked_by).inc()
+        return waited
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(model: str) -> RateLimiter:
+    with _limiters_lock:
+        if model not in _limiters:
+            _limiters[model] = RateLimiter(model, limit_for(model), RATE_LIMIT_SHARED_PATH)
+        return _limiters[model]
+
+
+# ---------------------------------------------------------------------------
+# Callbacks do ADK
+# ---------------------------------------------------------------------------
+
+
+class RateLimitExceeded(RuntimeError):
+    """Espera no limitador passou do máximo da classe de prioridade."""
+
+
+@dataclass
+class Reservation:
+    """Tokens estimados e já descontados para o turno em curso."""
+
+    model: str
+    tokens: float
+    settled: bool = False
+
+    def settle(self, actual_tokens: Optional[float]) -> None:
+        """Acerta com o consumo real; sem consumo (sem resposta do modelo) devolve a reserva."""
+        if self.settled:
+            return
+        self.settled = True
+        limiter_for(self.model).adjust_tokens((actual_tokens or 0) - self.tokens)
+
+    def release(self) -> None:
+        self.settle(None)
+
+
+# Reserva do turno atual: o before_model_callback, a chamada ao modelo e o
+# after_model_callback do mesmo turno rodam na mesma task.
+_reservation: ContextVar[Optional[Reservation]] = ContextVar("dunder_llm_reservation", default=None)
+
+
+def current_reservation() -> Optional[Reservation]:
+    return _reservation.get()
+
+
+def limited_response():
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+
+    return LlmResponse(
+        content=types.Content(role="model", parts=[types.Part(text=(
+            "⚠️ Limite de requisições ao modelo atingido; a análise foi interrompida. Tente novamente em instantes."
+        ))])
+    )
+
+
+def estimate_tokens(llm_request) -> int:
+    chars = len(str(getattr(llm_request.config, "system_instruction", "") or ""))
+    for content in llm_request.contents or []:
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            elif part.function_call:
+                chars += len(json.dumps(part.function_call.args or {}, default=str))
+            elif part.function_response:
+                chars += len(json.dumps(part.function_response.response or {}, default=str))
+    return max(1, chars // CHARS_PER_TOKEN)
+
+
+def _model_name(callback_context, llm_request) -> str:
+    model = llm_request.model or getattr(callback_context._invocation_context.agent, "model", "")
+    return str(getattr(model, "model", model) or "default")
+
+
+async def rate_limit_before_model(callback_context, llm_request):
+    """before_model_callback: espera a vez no limitador do modelo."""
+    _reservation.set(None)
+    model = _model_name(callback_context, llm_request)
+    limiter = limiter_for(model)
+    if not limiter.enabled:
+        return None
+
+    priority = current_priority()
+    tokens = estimate_tokens(llm_request)
+    try:
+        waited = await limiter.acquire(tokens, priority)
+    except asyncio.TimeoutError as e:
+        print(f"🚦 [RateLimit] {callback_context.agent_name} ({priority}) desistiu após a espera máxima: {e}")
+        return limited_response()
+    if waited > 1:
+        print(f"🚦 [RateLimit] {callback_context.agent_name} ({priority}) esperou {waited:.1f}s por {model}.")
+    _reservation.set(Reservation(model, tokens))
+    return None
+
+
+def rate_limit_after_model(callback_context, llm_response):
+    """after_model_callback: troca a estimativa de tokens pelo consumo real."""
+    reservation = _reservation.get()
+    usage = getattr(llm_response, "usage_metadata", None)
+    # Sem usage (ex: "indisponível"), quem devolve a reserva é o ResilientLlm ao fim do turno.
+    if reservation is not None and usage and usage.total_token_count:
+        reservation.settle(usage.total_token_count)
+    return None
+
+
+async def acquire_extra_attempt(model: str, llm_request) -> None:
+    """
+    Retry ou hedge de um turno já admitido: paga requisição e tokens de novo.
+
+    Levanta RateLimitExceeded (não retryable) se a espera passar do máximo.
+    """
+    limiter = limiter_for(model)
+    if not limiter.enabled:
+        return
+    priority = current_priority()
+    try:
+        await limiter.acquire(estimate_tokens(llm_request), priority)
+    except asyncio.TimeoutError as e:
+        raise RateLimitExceeded(str(e)) from None
@@ -0,0 +1,463 @@
+"""
+Prazos, retries, hedge e circuit breaker para chamadas remotas
+(Vertex RAG, Gemini, ElevenLabs).
+
+Cada upstream tem uma política:
+
+  - prazo por tentativa (`timeout`) e prazo total da chamada (`deadline`);
+  - retries com backoff exponencial e jitter em erros transitórios
+    (timeout, conexão, HTTP 408/429/5xx); erro de requisição sobe na hora;
+  - hedge (só para chamadas idempotentes, ex: retrieval): se a tentativa
+    passar do p95 recente, uma cópia é disparada e vale a que responder
+    primeiro; a outra é cancelada;
+  - com `pool=` (o BlockingPool onde a chamada roda), hedge e retry por
+    timeout só saem se houver thread livre. Uma tentativa abandonada segue
+    ocupando a thread dela, e a nova ficaria na fila gastando o próprio
+    prazo (e inflando o p95). Sem thread livre, a tentativa em curso
+    continua valendo até vagar uma thread (ou até o prazo total). Sem
+    `pool=`, cada chamada pode ocupar até (retries + 1) x 2 threads;
+  - circuit breaker: depois de `failures` falhas transitórias seguidas o
+    upstream fica aberto por `reset` segundos e as chamadas falham na hora
+    com CircuitOpenError; depois disso uma chamada de teste decide se fecha.
+
+    RAG = upstream("vertex_rag")
+    response = await RAG.call(lambda: POOL.run(rag.retrieval_query, ...), op="retrieval", pool=POOL)
+
+Nos agentes, `resilient_model(model_for(...))` passa cada turno do Gemini
+pelo upstream "gemini"; se o modelo não responder, o turno vira uma resposta
+"⚠️ ... indisponível" em vez de derrubar a requisição. A primeira tentativa
+do turno já passou pelo limitador global (runtime/ratelimit.py); retries e
+hedges passam de novo, e um turno sem resposta devolve a reserva de tokens.
+
+Política por upstream via env (valores omitidos mantêm o default):
+    RESILIENCE_VERTEX_RAG="timeout=8,deadline=20,retries=2,hedge=1,failures=5,reset=30"
+    RESILIENCE_GEMINI="timeout=90,retries=1"
+    RESILIENCE_ELEVENLABS="timeout=30,retries=0"
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+try:
+    import httpx
+
+    _TRANSPORT_ERRORS: tuple = (httpx.TransportError,)
+except ImportError:
+    _TRANSPORT_ERRORS = ()
+
+try:
+    from google.adk.models.base_llm import BaseLlm
+
+    ADK_AVAILABLE = True
+except ImportError:
+    ADK_AVAILABLE = False
+
+from observability import metrics
+from .offload import BlockingPool
+from .ratelimit import RateLimitExceeded, acquire_extra_attempt, current_reservation, limited_response
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+_LATENCY_WINDOW = 200
+_POOL_POLL_S = 0.02
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    """Upstream com circuito aberto: a chamada falhou sem ir à rede."""
+
+
+@dataclass(frozen=True)
+class ResiliencePolicy:
+    timeout_s: float = 30.0
+    deadline_s: Optional[float] = None  # None = timeout * (retries + 1)
+    retries: int = 2
+    backoff_s: float = 0.2
+    backoff_max_s: float = 5.0
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20
+    failures: int = 5
+    reset_s: float = 30.0
+
+    @property
+    def total_deadline_s(self) -> float:
+        return self.deadline_s or self.timeout_s * (self.retries + 1)
+
+
+DEFAULT_POLICIES: Dict[str, ResiliencePolicy] = {
+    "vertex_rag": ResiliencePolicy(
+        timeout_s=8, deadline_s=float(os.getenv("RAG_TIMEOUT_S", "20")), retries=2, hedge=True
+    ),
+    "gemini": ResiliencePolicy(timeout_s=90, deadline_s=240, retries=2, backoff_s=1.0, backoff_max_s=20),
+    "elevenlabs": ResiliencePolicy(timeout_s=30, deadline_s=60, retries=1, backoff_s=0.5),
+}
+
+_ENV_KEYS = {
+    "timeout": ("timeout_s", float),
+    "deadline": ("deadline_s", float),
+    "retries": ("retries", int),
+    "backoff": ("backoff_s", float),
+    "backoff_max": ("backoff_max_s", float),
+    "hedge": ("hedge", lambda v: v.lower() in ("1", "true", "yes", "on")),
+    "hedge_quantile": ("hedge_quantile", float),
+    "failures": ("failures", int),
+    "reset": ("reset_s", float),
+}
+
+
+def resilience_policy(name: str) -> ResiliencePolicy:
+    """Política default do upstream, sobrescrita por RESILIENCE_<NOME>."""
+    policy = DEFAULT_POLICIES.get(name, ResiliencePolicy())
+    env_name = f"RESILIENCE_{name.upper()}"
+    overrides: Dict[str, Any] = {}
+    for item in filter(None, (p.strip() for p in os.getenv(env_name, "").split(","))):
+        key, _, value = item.partition("=")
+        if key.strip() not in _ENV_KEYS:
+            print(f"⚠️ [Resilience] Chave ignorada em {env_name}: '{item}'")
+            continue
+        field_name, parse = _ENV_KEYS[key.strip()]
+        overrides[field_name] = parse(value.strip())
+    return replace(policy, **overrides) if overrides else policy
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Erro transitório (vale tentar de novo): timeout, conexão, HTTP 408/429/5xx."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError, *_TRANSPORT_ERRORS)):
+        return True
+    # urllib.error.URLError guarda a causa em .reason
+    if isinstance(getattr(error, "reason", None), (TimeoutError, ConnectionError)):
+        return True
+    # google.api_core / google.genai (.code), ElevenLabs (.status_code), urllib (.code)
+    for status in (
+        getattr(error, "code", None),
+        getattr(error, "status_code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+    ):
+        if isinstance(status, int) and status in RETRYABLE_STATUS:
+            return True
+    return False
+
+
+class CircuitBreaker:
+    """Fechado -> aberto após N falhas seguidas -> meio-aberto (1 teste) -> fechado."""
+
+    def __init__(self, name: str, failures: int, reset_s: float):
+        self.name = name
+        self.failures = max(1, failures)
+        self.reset_s = reset_s
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _set(self, state: str) -> None:
+        if state == self.state:
+            return
+        icon = {"open": "🔴", "half_open": "🟡", "closed": "🟢"}[state]
+        print(f"{icon} [Resilience] Circuito de {self.name}: {self.state} -> {state}")
+        self.state = state
+        metrics.CIRCUIT_STATE.labels(upstream=self.name).set(_STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_s:
+                    return False
+                self._set("half_open")
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._probing = False
+            self._set("closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            self._probing = False
+            if self.state == "half_open" or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+                self._set("open")
+
+    def release(self) -> None:
+        """Tentativa cancelada sem veredito: libera o teste do meio-aberto."""
+        with self._lock:
+            self._probing = False
+
+
+class _LatencyWindow:
+    def __init__(self):
+        self._samples: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int) -> Optional[float]:
+        if len(self._samples) < min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Upstream:
+    def __init__(self, name: str, policy: ResiliencePolicy):
+        self.name = name
+        self.policy = policy
+        self.breaker = CircuitBreaker(name, policy.failures, policy.reset_s)
+        self._latency: Dict[str, _LatencyWindow] = {}
+
+    def _admit(self, op: str) -> None:
+        if not self.breaker.allow():
+            metrics.UPSTREAM_CALLS.labels(upstream=self.name, op=op, outcome="rejected").inc()
+            raise CircuitOpenError(f"{self.name} indisponível (circuito aberto)")
+
+    def _finish(self, op: str, outcome: str) -> None:
+        metrics.UPSTREAM_CALLS.labels(upstream=self.name, op=op, outcome=outcome).inc()
+
+    def _backoff(self, error: Exception, op: str, attempt: int, deadline: float) -> float:
+        """Registra a falha e devolve a espera até a próxima tentativa; relança se não houver."""
+        if not is_retryable(error):
+            # O upstream respondeu; o erro é da requisição.
+            self.breaker.record_success()
+            self._finish(op, "error")
+            raise error
+        self.breaker.record_failure()
+        delay = random.uniform(0, min(self.policy.backoff_max_s, self.policy.backoff_s * 2 ** attempt))
+        exhausted = attempt >= self.policy.retries or time.monotonic() + delay >= deadline
+        if exhausted or self.breaker.state == "open":
+            self._finish(op, "timeout" if isinstance(error, (asyncio.TimeoutError, TimeoutError)) else "error")
+            raise error
+        metrics.UPSTREAM_RETRIES.labels(upstream=self.name, op=op).inc()
+        print(
+            f"🔁 [Resilience] {self.name}.{op}: {type(error).__name__} — "
+            f"tentativa {attempt + 2}/{self.policy.retries + 1} em {delay:.2f}s"
+        )
+        return delay
+
+    def hedge_delay(self, op: str) -> Optional[float]:
+        window = self._latency.get(op)
+        if window is None:
+            return None
+        return window.quantile(self.policy.hedge_quantile, self.policy.hedge_min_samples)
+
+    async def call(
+        self,
+        factory: Callable[[], Awaitable[T]],
+        op: str = "call",
+        hedge: Optional[bool] = None,
+        pool: Optional[BlockingPool] = None,
+    ) -> T:
+        """
+        Roda `factory()` (uma corrotina nova por tentativa) com prazo, retries,
+        hedge e circuit breaker. Estourado o prazo total, levanta asyncio.TimeoutError.
+
+        `pool`: o BlockingPool em que `factory()` roda. Sem thread livre nele,
+        não sai hedge e um timeout só vira retry quando vagar uma thread;
+        até lá a tentativa em curso continua valendo.
+        """
+        hedge = self.policy.hedge if hedge is None else hedge
+        window = self._latency.setdefault(op, _LatencyWindow())
+        deadline = time.monotonic() + self.policy.total_deadline_s
+        attempt = 0
+        while True:
+            self._admit(op)
+            timeout = max(0.001, min(self.policy.timeout_s, deadline - time.monotonic()))
+            start = time.perf_counter()
+            try:
+                hedge_after = self.hedge_delay(op) if hedge else None
+                if hedge_after is not None and hedge_after < timeout:
+                    result = await self._attempt(self._hedged(factory, op, hedge_after, pool), op, timeout, deadline, pool)
+                else:
+                    result = await self._attempt(factory(), op, timeout, deadline, pool)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                await asyncio.sleep(self._backoff(e, op, attempt, deadline))
+                attempt += 1
+                continue
+            window.add(time.perf_counter() - start)
+            self.breaker.record_success()
+            self._finish(op, "ok")
+            return result
+
+    async def _attempt(
+        self, coro: Awaitable[T], op: str, timeout: float, deadline: float, pool: Optional[BlockingPool]
+    ) -> T:
+        if pool is None:
+            return await asyncio.wait_for(coro, timeout)
+        task = asyncio.ensure_future(coro)
+        try:
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if not done and pool.available == 0 and deadline > time.monotonic():
+                # O retry entraria na fila: segue esperando esta tentativa até
+                # vagar uma thread para ele (ou até o prazo total).
+                metrics.UPSTREAM_RETRIES_SKIPPED.labels(upstream=self.name, op=op).inc()
+                while not done and pool.available == 0 and deadline > time.monotonic():
+                    done, _ = await asyncio.wait(
+                        {task}, timeout=min(_POOL_POLL_S, deadline - time.monotonic())
+                    )
+            if not done:
+                raise asyncio.TimeoutError()
+            return task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def _hedged(
+        self, factory: Callable[[], Awaitable[T]], op: str, delay: float, pool: Optional[BlockingPool] = None
+    ) -> T:
+        primary = asyncio.ensure_future(factory())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        if pool is not None and pool.available == 0:
+            # A cópia ficaria na fila do pool e só começaria depois da original.
+            metrics.UPSTREAM_HEDGES.labels(upstream=self.name, op=op, outcome="skipped").inc()
+            try:
+                return await primary
+            finally:
+                primary.cancel()
+
+        metrics.UPSTREAM_HEDGES.labels(upstream=self.name, op=op, outcome="fired").inc()
+        backup = asyncio.ensure_future(factory())
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            metrics.UPSTREAM_HEDGES.labels(upstream=self.name, op=op, outcome="won").inc()
+                        return task.result()
+            return primary.result()  # as duas falharam: vale o erro da original
+        finally:
+            for task in (primary, backup):
+                if not task.done():
+                    task.cancel()
+
+    def call_sync(self, func: Callable[[float], T], op: str = "call") -> T:
+        """
+        Versão bloqueante (SDKs síncronos): `func(timeout)` recebe o prazo da
+        tentativa e deve repassá-lo ao cliente HTTP. Sem hedge.
+        """
+        deadline = time.monotonic() + self.policy.total_deadline_s
+        attempt = 0
+        while True:
+            self._admit(op)
+            timeout = max(0.001, min(self.policy.timeout_s, deadline - time.monotonic()))
+            try:
+                result = func(timeout)
+            except Exception as e:
+                time.sleep(self._backoff(e, op, attempt, deadline))
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            self._finish(op, "ok")
+            return result
+
+
+_upstreams: Dict[str, Upstream] = {}
+_upstreams_lock = threading.Lock()
+
+
+def upstream(name: str) -> Upstream:
+    """Upstream compartilhado por nome (um circuit breaker por processo)."""
+    with _upstreams_lock:
+        if name not in _upstreams:
+            _upstreams[name] = Upstream(name, resilience_policy(name))
+        return _upstreams[name]
+
+
+# ---------------------------------------------------------------------------
+# Gemini (modelo do ADK)
+# ---------------------------------------------------------------------------
+
+
+def _unavailable_response(model: str, error: Exception):
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+
+    reason = "está indisponível no momento" if isinstance(error, CircuitOpenError) else "não respondeu a tempo"
+    return LlmResponse(
+        content=types.Content(role="model", parts=[types.Part(text=(
+            f"⚠️ O modelo {model} {reason}; a análise foi interrompida. Tente novamente em instantes."
+        ))])
+    )
+
+
+_llms: Dict[str, Any] = {}
+
+if ADK_AVAILABLE:
+
+    class ResilientLlm(BaseLlm):
+        """Modelo do ADK que passa cada turno pelo upstream `gemini` (prazo, retries, circuito)."""
+
+        upstream_name: str = "gemini"
+
+        def _inner(self) -> BaseLlm:
+            # Resolvido pelo id atual: with_model() troca só o campo `model`.
+            if self.model not in _llms:
+                from google.adk.models.registry import LLMRegistry
+
+                _llms[self.model] = LLMRegistry.new_llm(self.model)
+            return _llms[self.model]
+
+        async def generate_content_async(self, llm_request, stream: bool = False):
+            inner = self._inner()
+            reservation = current_reservation()
+            attempts = 0
+
+            async def turn():
+                nonlocal attempts
+                attempts += 1
+                if attempts > 1:
+                    # Retry/hedge: o before_model_callback só cobrou a primeira tentativa.
+                    await acquire_extra_attempt(llm_request.model or self.model, llm_request)
+                # A API não usa streaming; com stream=True os parciais chegam juntos no fim do turno.
+                return [r async for r in inner.generate_content_async(llm_request, stream=stream)]
+
+            try:
+                try:
+                    responses = await upstream(self.upstream_name).call(turn, op=self.model)
+                except RateLimitExceeded as e:
+                    print(f"🚦 [Resilience] {self.model}: nova tentativa desistiu no limitador: {e}")
+                    yield limited_response()
+                    return
+                except Exception as e:
+                    if not isinstance(e, CircuitOpenError) and not is_retryable(e):
+                        raise
+                    print(f"⚠️ [Resilience] {self.model} sem resposta: {type(e).__name__}: {e}")
+                    yield _unavailable_response(self.model, e)
+                    return
+                for response in responses:
+                    yield response
+            finally:
+                # Erro, cancelamento ou resposta sem usage: o after_model_callback não
+                # acertou a reserva, então os tokens voltam ao bucket.
+                if reservation is not None:
+                    reservation.release()
+
+
+def resilient_model(model: str):
+    """Id do modelo -> ResilientLlm (ou o próprio id se o ADK não estiver instalado)."""
+    return ResilientLlm(model=model) if ADK_AVAILABLE else model
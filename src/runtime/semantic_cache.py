@@ -0,0 +1,270 @@
+"""
+Cache semântico de respostas dos agentes.
+
+A pergunta é convertida em embedding e comparada (cosseno) com as perguntas já
+respondidas pelo MESMO agente sobre a MESMA versão dos dados; acima do limiar
+a resposta anterior é devolvida sem rodar o agente:
+
+    cache = semantic_cache()
+    hit = await cache.lookup(scope, "Posso gastar $1000 sem recibo?")
+    ...
+    await cache.store(scope, pergunta, resposta)
+
+Valores numéricos da pergunta precisam bater exatamente ($1000 != $100), por
+mais parecidos que sejam os embeddings. Entradas expiram por TTL e as menos
+usadas saem quando o cache enche (LRU). O cache é por processo.
+
+Configuração via env:
+    SEMANTIC_CACHE_ENABLED=1
+    SEMANTIC_CACHE_EMBEDDER=genai | hashing   (hashing: offline, só mesma língua)
+    SEMANTIC_CACHE_MODEL=gemini-embedding-001
+    SEMANTIC_CACHE_THRESHOLD=0.92
+    SEMANTIC_CACHE_TTL_S=3600
+    SEMANTIC_CACHE_MAX_ENTRIES=1000
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from observability import metrics, span
+from .offload import blocking_pool
+from .sources import file_fingerprint
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_EMBEDDER = os.getenv("SEMANTIC_CACHE_EMBEDDER", "genai").lower()
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "gemini-embedding-001")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL_S = float(os.getenv("SEMANTIC_CACHE_TTL_S", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+SEMANTIC_CACHE_DIMENSIONS = int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", "256"))
+DATA_VERSION_TTL_S = float(os.getenv("SEMANTIC_CACHE_DATA_VERSION_TTL_S", "60"))
+
+_GCS_POOL = blocking_pool("gcs", default_workers=4)
+_EMBED_POOL = blocking_pool("embeddings", default_workers=4)
+
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+# ---------------------------------------------------------------------------
+# Embeddings
+# ---------------------------------------------------------------------------
+
+
+class HashingEmbedder:
+    """Trigramas de caracteres em um vetor fixo (sem rede; não cruza idiomas)."""
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    async def embed(self, text: str) -> np.ndarray:
+        normalized = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().casefold()
+        normalized = f"  {' '.join(re.findall(r'[a-z0-9$]+', normalized))}  "
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for i in range(len(normalized) - 2):
+            digest = hashlib.blake2b(normalized[i:i + 3].encode(), digest_size=4).digest()
+            vector[int.from_bytes(digest, "little") % self.dimensions] += 1.0
+        return vector
+
+
+class GenAIEmbedder:
+    """Embeddings multilíngues do Gemini (mesmas credenciais dos agentes)."""
+
+    def __init__(self, model: str = SEMANTIC_CACHE_MODEL, dimensions: int = SEMANTIC_CACHE_DIMENSIONS):
+        from google import genai
+        from google.genai import types
+
+        self.client = genai.Client()
+        self.model = model
+        self.config = types.EmbedContentConfig(task_type="SEMANTIC_SIMILARITY", output_dimensionality=dimensions)
+
+    async def embed(self, text: str) -> np.ndarray:
+        # Cliente síncrono no pool: o Flask cria um event loop por requisição.
+        response = await _EMBED_POOL.run(
+            self.client.models.embed_content, model=self.model, contents=text, config=self.config, timeout=10
+        )
+        return np.asarray(response.embeddings[0].values, dtype=np.float32)
+
+
+def _make_embedder(kind: str):
+    if kind == "hashing":
+        return HashingEmbedder()
+    try:
+        return GenAIEmbedder()
+    except Exception as e:
+        print(f"⚠️ [SemanticCache] Embedder '{kind}' indisponível ({e}); usando hashing local.")
+        return HashingEmbedder()
+
+
+def _amount(token: str) -> Decimal:
+    """
+    Valor de um número escrito em pt ou en.
+
+    Com '.' e ',' o último é o decimal ('1,000.00', '1.000,50'). Com um só tipo
+    de separador: repetido ou seguido de exatamente 3 dígitos é milhar ('1.000',
+    '1,000,000'); senão é decimal ('1.5', '1,50').
+    """
+    if "." in token and "," in token:
+        decimal_sep = "." if token.rfind(".") > token.rfind(",") else ","
+        whole, _, frac = token.rpartition(decimal_sep)
+        return Decimal(re.sub(r"[.,]", "", whole) + "." + frac)
+    seps = re.findall(r"[.,]", token)
+    if not seps:
+        return Decimal(token)
+    whole, _, frac = token.rpartition(seps[0])
+    if len(seps) > 1 or len(frac) == 3:
+        return Decimal(re.sub(r"[.,]", "", token))
+    return Decimal(whole + "." + frac)
+
+
+def _numbers(text: str) -> Tuple[str, ...]:
+    """Valores citados, normalizados ('$1.000' == '1000' == '1,000.00'; '1,50' != '150')."""
+    return tuple(sorted({format(_amount(n).normalize(), "f") for n in _NUMBER_RE.findall(text)}))
+
+
+# ---------------------------------------------------------------------------
+# Versão dos dados
+# ---------------------------------------------------------------------------
+
+
+_data_version_cache: Dict[Tuple[str, ...], Tuple[float, str]] = {}
+
+
+def data_version_sync(paths: Iterable[str]) -> str:
+    """Hash curto dos metadados (tamanho, md5/etag/mtime) das fontes de dados."""
+    key = tuple(sorted(p for p in paths if p))
+    override = os.getenv("SEMANTIC_CACHE_DATA_VERSION")
+    if override:
+        return override
+
+    cached = _data_version_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    payload = "|".join(file_fingerprint(p) for p in key)
+    version = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+    _data_version_cache[key] = (time.monotonic() + DATA_VERSION_TTL_S, version)
+    return version
+
+
+async def data_version(paths: Iterable[str]) -> str:
+    return await _GCS_POOL.run(data_version_sync, list(paths))
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class CacheEntry:
+    question: str
+    answer: Any
+    vector: np.ndarray
+    numbers: Tuple[str, ...]
+    created_at: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+
+@dataclass
+class CacheHit:
+    answer: Any
+    similarity: float
+    question: str
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        embedder=None,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_s: float = SEMANTIC_CACHE_TTL_S,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+    ):
+        self.embedder = embedder or _make_embedder(SEMANTIC_CACHE_EMBEDDER)
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        # (escopo, id) -> entrada, na ordem de uso (LRU)
+        self._entries: "OrderedDict[Tuple[Tuple[str, ...], int], CacheEntry]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    async def _vector(self, question: str) -> np.ndarray:
+        vector = await self.embedder.embed(question.strip())
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float) -> None:
+        expired = [k for k, e in self._entries.items() if now - e.created_at > self.ttl_s]
+        for key in expired:
+            del self._entries[key]
+
+    async def lookup(self, scope: Tuple[str, ...], question: str) -> Optional[CacheHit]:
+        with span("semantic_cache.lookup", **{"cache.scope": "/".join(scope)}) as s:
+            vector = await self._vector(question)
+            numbers = _numbers(question)
+            with self._lock:
+                self._expire(time.monotonic())
+                candidates = [
+                    (key, entry) for key, entry in self._entries.items()
+                    if key[0] == scope and entry.numbers == numbers
+                ]
+                best_key, best_sim = None, -1.0
+                if candidates:
+                    sims = np.stack([e.vector for _, e in candidates]) @ vector
+                    i = int(np.argmax(sims))
+                    best_key, best_sim = candidates[i][0], float(sims[i])
+
+                hit = best_key is not None and best_sim >= self.threshold
+                s.set_attribute("cache.similarity", round(best_sim, 4))
+                s.set_attribute("cache.hit", hit)
+                metrics.record_cache("semantic_answer", hit=hit)
+                if not hit:
+                    return None
+                entry = self._entries[best_key]
+                entry.hits += 1
+                self._entries.move_to_end(best_key)
+                return CacheHit(answer=entry.answer, similarity=best_sim, question=entry.question)
+
+    async def store(self, scope: Tuple[str, ...], question: str, answer: Any) -> None:
+        vector = await self._vector(question)
+        numbers = _numbers(question)
+        with self._lock:
+            # Mesma pergunta (ex: após X-Cache-Bypass) substitui a resposta antiga.
+            for key, entry in list(self._entries.items()):
+                if key[0] == scope and entry.numbers == numbers and float(entry.vector @ vector) >= 0.999:
+                    del self._entries[key]
+            self._entries[(scope, self._next_id)] = CacheEntry(question, answer, vector, numbers)
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache: Optional[SemanticCache] = None
+_cache_lock = threading.Lock()
+
+
+def semantic_cache() -> Optional[SemanticCache]:
+    """Cache compartilhado do processo (None se SEMANTIC_CACHE_ENABLED=0)."""
+    global _cache
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticCache()
+        return _cache
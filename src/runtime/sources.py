@@ -0,0 +1,23 @@
+"""
+Identidade de arquivos de origem (GCS ou locais) pelos metadados.
+
+    file_fingerprint("gs://dunder-data/data/politica_compliance.txt")
+    # 'gs://...:4096:<md5/generation/etag/mtime>'
+
+Só consulta metadados (sem baixar o conteúdo). Muda quando o arquivo é
+trocado; origem inacessível vira "<path>:?". Usado pelo cache semântico, pela
+política de compliance e pelo cache local do extrato para saber se a cópia
+que têm ainda vale.
+"""
+import fsspec
+
+
+def file_fingerprint(path: str) -> str:
+    """"<path>:<tamanho>:<md5Hash|generation|etag|mtime|updated>" (ou "<path>:?")."""
+    try:
+        fs, _, (resolved,) = fsspec.get_fs_token_paths(path)
+        info = fs.info(resolved)
+    except Exception:
+        return f"{path}:?"
+    stamp = next((info[k] for k in ("md5Hash", "generation", "etag", "mtime", "updated") if info.get(k)), "")
+    return f"{path}:{info.get('size')}:{stamp}"